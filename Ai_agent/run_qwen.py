@@ -3,6 +3,7 @@ import grpc
 import os
 import sys
 import json
+import uuid
 from pathlib import Path
 from dotenv import load_dotenv
 from google.protobuf import empty_pb2
@@ -20,6 +21,7 @@ import requests
 # --- gRPC Code Import ---
 import order_api_pb2
 import order_api_pb2_grpc
+import tracing
 print(f"DEBUG: Successfully imported _grpc.py from: {order_api_pb2_grpc.__file__}")
 
 # --- .env File Loading ---
@@ -30,6 +32,7 @@ load_dotenv(dotenv_path=env_path)
 # --- Configuration ---
 API_SERVER_ADDRESS = 'localhost:50051'
 OLLAMA_API_URL = "http://localhost:11434/api/chat"
+TRACE_FILE = os.path.join(root_dir, tracing.TRACE_FILE)  # next to the server's, when it runs from the repo root
 print("DEBUG: Running in manual Ollama (local) mode. No API key needed.")
 
 # --- Tool Definitions ---
@@ -161,8 +164,11 @@ class APIClient:
         self.product_stub = None
         self.order_stub = None
         self.jwt_token = None
+        self.pending_orders = {}  # (user_id, items) -> idempotency key, until the server confirms the order
         try:
-            self.channel = grpc.insecure_channel(address)
+            # Every RPC gets a client span, and the server continues its trace.
+            self.channel = grpc.intercept_channel(grpc.insecure_channel(address),
+                                                  tracing.ClientTracingInterceptor())
             grpc.channel_ready_future(self.channel).result(timeout=1)
             self.auth_stub = order_api_pb2_grpc.AuthServiceStub(self.channel)
             self.product_stub = order_api_pb2_grpc.ProductServiceStub(self.channel)
@@ -207,17 +213,14 @@ class APIClient:
     # --- Product Methods ---
     def list_products(self):
         print("[Agent is calling ListProducts API (Streaming)...]")
-        response_stream = self.product_stub.ListProducts(empty_pb2.Empty())
-        
-        products_list = []
-        count = 0
         limit_for_ai = 20 # ⬇️ [Can Adjust] Set Limit for small AI only 20 
         
         try:
-            for product in response_stream:
-                if count < limit_for_ai:
-                    products_list.append(self._message_to_dict(product))
-                count += 1
+            # Only stream the page the AI will actually see; the total comes from CountProducts.
+            request = order_api_pb2.ListProductsRequest(page_size=limit_for_ai)
+            batches = self.product_stub.ListProductsBatched(request)
+            products_list = [self._message_to_dict(p) for batch in batches for p in batch.products]
+            count = self.product_stub.CountProducts(empty_pb2.Empty()).count
             
             if count > limit_for_ai:
                 summary_message = f"Found {count} total products, but only showing the first {limit_for_ai}."
@@ -245,13 +248,13 @@ class APIClient:
                 limit=int(limit) # AI อาจส่ง 5.0 มา, เราจึงต้องแปลงเป็น int
             )
             
-            # 2. เรียก gRPC Stub และรับ "ท่อ" (Stream) กลับมา
-            response_stream = self.product_stub.SearchProducts(request)
+            # 2. เรียก gRPC Stub และรับ "ท่อ" (Stream) กลับมา (หลายสินค้าต่อหนึ่ง message)
+            response_stream = self.product_stub.SearchProductsBatched(request)
             
             products_list = []
-            # 3. วน Loop ดึงข้อมูลจาก "ท่อ" ทีละชิ้น
-            for product in response_stream:
-                products_list.append(self._message_to_dict(product))
+            # 3. วน Loop ดึงข้อมูลจาก "ท่อ" ทีละ batch
+            for batch in response_stream:
+                products_list.extend(self._message_to_dict(product) for product in batch.products)
             
             # 4. คืนค่า List (ที่ตอนนี้มีขนาดเล็ก) กลับไปให้ AI
             return products_list
@@ -279,7 +282,7 @@ class APIClient:
             description=description,
             price=price
         )
-        response = self.product_stub.CreateProduct(request)
+        response = self.product_stub.CreateProduct(request, metadata=self._get_auth_metadata())
         return self._message_to_dict(response)
 
     def delete_product(self, product_id):
@@ -306,32 +309,38 @@ class APIClient:
         response = self.order_stub.CountOrders(empty_pb2.Empty())
         return self._message_to_dict(response)
 
+    def _pending_order_key(self, user_id, order_items):
+        """
+        The idempotency key for this order. It is kept until CreateOrder
+        succeeds, so retrying an order whose response was lost (even in a
+        later turn) returns it instead of ordering twice.
+        """
+        order = (user_id, tuple(sorted((item.product_id, item.quantity) for item in order_items)))
+        return order, self.pending_orders.setdefault(order, uuid.uuid4().hex)
+
     def create_order(self, user_id, items):
         print(f"[Agent is calling CreateOrder API for user: {user_id}...]") 
         order_items = []
         for item in items:
             try:
-                product = self.get_product(item['product_id'])
-                if product.product_id:
-                    order_items.append(
-                        order_api_pb2.Order.Item(
-                            product_id=item['product_id'],
-                            quantity=int(item['quantity']),
-                            price_per_item=product.price
-                        )
-                    )
-                else:
-                    print(f"  Warning: Could not find product with ID {item['product_id']}. Skipping.", file=sys.stderr)
-            except grpc.RpcError as e:
-                print(f"  Warning: RPC Error finding {item['product_id']}: {e.details()}. Skipping.", file=sys.stderr)
-            except (KeyError, TypeError) as e:
+                # The server prices each item and rejects unknown product IDs.
+                order_items.append(
+                    order_api_pb2.Order.Item(product_id=item['product_id'], quantity=int(item['quantity']))
+                )
+            except (KeyError, TypeError, ValueError) as e:
                 print(f"  Warning: Malformed item from AI {item}. Skipping. Error: {e}", file=sys.stderr)
         
         if not order_items:
-            return "Error: Could not create order. No valid products were found or all were out of stock."
+            return "Error: Could not create order. No valid items were given."
             
-        request = order_api_pb2.CreateOrderRequest(user_id=user_id, items=order_items)
-        response = self.order_stub.CreateOrder(request)
+        order, idempotency_key = self._pending_order_key(user_id, order_items)
+        request = order_api_pb2.CreateOrderRequest(
+            user_id=user_id, items=order_items, idempotency_key=idempotency_key)
+        try:
+            response = self.order_stub.CreateOrder(request, metadata=self._get_auth_metadata())
+        except grpc.RpcError as e:
+            return f"Error: {e.details()}"
+        del self.pending_orders[order]
         return self._message_to_dict(response)
 
 
@@ -490,7 +499,8 @@ Now, begin the conversation.
         func = self.tool_functions[func_name]
         try:
             # Call the function (e.g., api_client.list_products())
-            result = func(**args)
+            with tracing.start_span(f"tool {func_name}"):
+                result = func(**args)
             return result
         except Exception as e:
             print(f"Error executing tool '{func_name}': {e}", file=sys.stderr)
@@ -507,76 +517,80 @@ Now, begin the conversation.
                 if user_prompt.lower() == 'exit':
                     break
 
-                # 1. Add user message to history
-                self.chat_history.append({"role": "user", "content": user_prompt})
+                # One trace per turn: both Ollama calls, the tool and the RPCs it makes.
+                with tracing.start_span("agent.turn", attributes={"model": self.model_name}):
+                    # 1. Add user message to history
+                    self.chat_history.append({"role": "user", "content": user_prompt})
 
-                print("🤖 AI is thinking...")
+                    print("🤖 AI is thinking...")
                 
-                # 2. Call Ollama API
-                # We ask for JSON format, which forces the model to obey our system prompt
-                payload = {
-                    "model": self.model_name, 
-                    "messages": self.chat_history,
-                    "stream": False,
-                    "format": "json"  
-                }
+                    # 2. Call Ollama API
+                    # We ask for JSON format, which forces the model to obey our system prompt
+                    payload = {
+                        "model": self.model_name, 
+                        "messages": self.chat_history,
+                        "stream": False,
+                        "format": "json"  
+                    }
                 
-                response = requests.post(OLLAMA_API_URL, json=payload)
-                response.raise_for_status() # Check for HTTP errors
+                    with tracing.start_span("ollama.chat", tracing.CLIENT, {"model": self.model_name}):
+                        response = requests.post(OLLAMA_API_URL, json=payload)
+                    response.raise_for_status() # Check for HTTP errors
                 
-                # 3. Parse the AI's JSON response
-                response_json_str = response.json()['message']['content']
-                self.chat_history.append({"role": "assistant", "content": response_json_str})
+                    # 3. Parse the AI's JSON response
+                    response_json_str = response.json()['message']['content']
+                    self.chat_history.append({"role": "assistant", "content": response_json_str})
                 
-                try:
-                    ai_response = json.loads(response_json_str)
-                except json.JSONDecodeError:
-                    print(f"🤖 AI: (Sent invalid JSON, retrying) {response_json_str}")
-                    self.chat_history.pop() # Remove the bad response
-                    continue
-
-                # 4. Check if it's a tool call or a text answer
-                if "tool_call" in ai_response:
-                    # 4a. It's a TOOL CALL
-                    tool_call_data = ai_response['tool_call']
+                    try:
+                        ai_response = json.loads(response_json_str)
+                    except json.JSONDecodeError:
+                        print(f"🤖 AI: (Sent invalid JSON, retrying) {response_json_str}")
+                        self.chat_history.pop() # Remove the bad response
+                        continue
+
+                    # 4. Check if it's a tool call or a text answer
+                    if "tool_call" in ai_response:
+                        # 4a. It's a TOOL CALL
+                        tool_call_data = ai_response['tool_call']
                     
-                    # 5. Execute the tool
-                    tool_result = self.handle_function_call(tool_call_data)
+                        # 5. Execute the tool
+                        tool_result = self.handle_function_call(tool_call_data)
                     
-                    # 6. Create the tool response message and add to history
-                    tool_response_msg = {
-                        "tool_response": {
-                            "name": tool_call_data.get("name"),
-                            "result": str(tool_result) # Convert result to string
+                        # 6. Create the tool response message and add to history
+                        tool_response_msg = {
+                            "tool_response": {
+                                "name": tool_call_data.get("name"),
+                                "result": str(tool_result) # Convert result to string
+                            }
+                        }
+                        self.chat_history.append({"role": "user", "content": json.dumps(tool_response_msg)})
+
+                        # 7. Call Ollama AGAIN to get a final summary
+                        print("🤖 AI is summarizing tool results...")
+                        summary_payload = {
+                            "model": self.model_name, # <-- *** MODIFIED: Use class variable ***
+                            "messages": self.chat_history,
+                            "stream": False,
+                            "format": "json" # Ask for JSON again
                         }
-                    }
-                    self.chat_history.append({"role": "user", "content": json.dumps(tool_response_msg)})
-
-                    # 7. Call Ollama AGAIN to get a final summary
-                    print("🤖 AI is summarizing tool results...")
-                    summary_payload = {
-                        "model": self.model_name, # <-- *** MODIFIED: Use class variable ***
-                        "messages": self.chat_history,
-                        "stream": False,
-                        "format": "json" # Ask for JSON again
-                    }
                     
-                    summary_response = requests.post(OLLAMA_API_URL, json=summary_payload)
-                    summary_json_str = summary_response.json()['message']['content']
-                    self.chat_history.append({"role": "assistant", "content": summary_json_str})
+                        with tracing.start_span("ollama.chat", tracing.CLIENT, {"model": self.model_name}):
+                            summary_response = requests.post(OLLAMA_API_URL, json=summary_payload)
+                        summary_json_str = summary_response.json()['message']['content']
+                        self.chat_history.append({"role": "assistant", "content": summary_json_str})
                     
-                    try:
-                        final_answer = json.loads(summary_json_str)
-                        print(f"🤖 AI: {final_answer.get('response', 'Got tool result.')}")
-                    except json.JSONDecodeError:
-                        print(f"🤖 AI: (Sent invalid summary JSON) {summary_json_str}")
+                        try:
+                            final_answer = json.loads(summary_json_str)
+                            print(f"🤖 AI: {final_answer.get('response', 'Got tool result.')}")
+                        except json.JSONDecodeError:
+                            print(f"🤖 AI: (Sent invalid summary JSON) {summary_json_str}")
                 
-                elif "response" in ai_response:
-                    # 4b. It's a plain TEXT ANSWER
-                    print(f"🤖 AI: {ai_response['response']}")
+                    elif "response" in ai_response:
+                        # 4b. It's a plain TEXT ANSWER
+                        print(f"🤖 AI: {ai_response['response']}")
                 
-                else:
-                    print(f"🤖 AI: (Sent unexpected JSON) {ai_response}")
+                    else:
+                        print(f"🤖 AI: (Sent unexpected JSON) {ai_response}")
 
             except KeyboardInterrupt:
                 break
@@ -592,6 +606,8 @@ Now, begin the conversation.
 # --- Main Execution Block (UNCHANGED) ---
 
 def main():
+    # Export this agent's spans; the server adds its own to the same traces.
+    tracing.configure_tracing("order-agent", TRACE_FILE)
     # Create an instance of the API client.
     api_client = APIClient(API_SERVER_ADDRESS)
     # Check if the connection was successful before continuing.
@@ -0,0 +1,81 @@
+"""
+Benchmark for Database.iter_export_orders().
+
+Seeds a temporary database with increasing numbers of orders and times a full
+export at each size. The export is linear if the time per order stays flat as
+the table grows.
+
+    python bench/export_orders_bench.py --sizes 10000 20000 40000 80000
+"""
+import argparse
+import json
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+from contextlib import closing
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import server
+
+
+def seed_orders(db_path, num_orders, items_per_order):
+    conn = sqlite3.connect(db_path)
+    with conn:
+        conn.executemany(
+            "INSERT INTO orders (order_id, user_id, status, total_amount) VALUES (?, ?, ?, ?)",
+            ((f"order-{n:010d}", f"user-{n % 100}", 1, 10.0 * items_per_order) for n in range(num_orders)),
+        )
+        # Items are inserted interleaved across orders, as they are in a live system.
+        conn.executemany(
+            "INSERT INTO order_items (order_id, product_id, quantity, price_per_item) VALUES (?, ?, ?, ?)",
+            ((f"order-{n:010d}", f"prod-{i}", 1, 10.0)
+             for i in range(items_per_order) for n in range(num_orders)),
+        )
+    conn.close()
+
+
+def time_export(num_orders, items_per_order):
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_path = os.path.join(tmp_dir, "bench.db")
+        db = server.Database(db_path)
+        try:
+            seed_orders(db_path, num_orders, items_per_order)
+            started = time.perf_counter()
+            with closing(db.iter_export_orders()) as orders:
+                exported = sum(1 for _ in orders)
+            elapsed = time.perf_counter() - started
+        finally:
+            db.close()
+    assert exported == num_orders, (exported, num_orders)
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time Database.iter_export_orders() at growing table sizes.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 20000, 40000, 80000],
+                        help="Order counts to benchmark")
+    parser.add_argument("--items-per-order", type=int, default=3)
+    args = parser.parse_args()
+
+    results = []
+    for num_orders in args.sizes:
+        elapsed = time_export(num_orders, args.items_per_order)
+        results.append({
+            "orders": num_orders,
+            "items": num_orders * args.items_per_order,
+            "seconds": round(elapsed, 4),
+            "us_per_order": round(elapsed / num_orders * 1e6, 2),
+        })
+        print(f"{num_orders:>10} orders: {elapsed:8.3f}s  ({results[-1]['us_per_order']} us/order)", file=sys.stderr)
+
+    # Linear scaling keeps us_per_order roughly constant; quadratic grows it with table size.
+    growth = results[-1]["us_per_order"] / results[0]["us_per_order"]
+    print(json.dumps({"benchmark": "export_orders", "results": results,
+                      "us_per_order_growth": round(growth, 2)}, indent=2))
+
+
+if __name__ == '__main__':
+    main()
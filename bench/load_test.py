@@ -0,0 +1,281 @@
+"""
+Load test for the gRPC gateway.
+
+Starts the thread-pool server (server.create_server(), as serve() does) on a
+temporary database seeded with --products products and --orders orders, then
+runs each workload in turn: --processes client processes with --threads
+threads each call it back to back for --duration seconds, after a --warmup
+period whose calls are not counted. Clients run in their own processes so
+they don't compete with the server for its GIL.
+
+    python bench/load_test.py --products 20000 --orders 20000 --duration 10
+    python bench/load_test.py --workloads GetProduct CreateOrder --processes 4 --threads 16
+
+Prints one JSON document with throughput, p50/p99/p999 latency and error
+counts per workload, for comparing runs against each other. Latencies cover
+successful calls only. Login is run without the per-client rate limit, but
+beyond LOGIN_MAX_CONCURRENT concurrent hashes the server still refuses
+logins with RESOURCE_EXHAUSTED, which shows up in its error counts.
+"""
+import argparse
+import json
+import math
+import multiprocessing
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import grpc
+from google.protobuf import empty_pb2
+
+import ids
+import order_api_pb2
+import order_api_pb2_grpc
+import server
+
+BENCH_ADDRESS = "127.0.0.1:50151"
+SEARCH_TERMS = ["widget", "gadget", "gizmo", "sprocket", "bolt", "gear"]
+ADMIN_USERNAME, ADMIN_PASSWORD = "admin", "admin123"
+
+
+# --- Seeding ---
+
+def seed(db, db_path, num_products, num_orders, items_per_order):
+    """Fills the database; returns the product IDs."""
+    rows = [(n, f"{SEARCH_TERMS[n % len(SEARCH_TERMS)]} {n}", f"bench product {n}", 1.0 + n % 100)
+            for n in range(num_products)]
+    for start in range(0, len(rows), server.IMPORT_BATCH_SIZE):
+        db.import_products(rows[start:start + server.IMPORT_BATCH_SIZE])
+    conn = sqlite3.connect(db_path)
+    product_ids = [row[0] for row in conn.execute("SELECT product_id FROM products")]
+    order_ids = [ids.new_id("order") for _ in range(num_orders)]
+    with conn:
+        conn.executemany(
+            "INSERT INTO orders (order_id, user_id, status, total_amount) VALUES (?, ?, ?, ?)",
+            ((order_id, f"user-{n % 100}", order_api_pb2.Order.PENDING, 10.0 * items_per_order)
+             for n, order_id in enumerate(order_ids)))
+        conn.executemany(
+            "INSERT INTO order_items (order_id, product_id, quantity, price_per_item) VALUES (?, ?, ?, ?)",
+            ((order_id, random.choice(product_ids), 1, 10.0)
+             for order_id in order_ids for _ in range(items_per_order)))
+    conn.close()
+    return product_ids
+
+
+# --- Workloads ---
+# Each takes (stubs, state) and makes one call; streaming ones drain the
+# stream and return how many messages it carried.
+
+def _get_product(stubs, state):
+    stubs["product"].GetProduct(order_api_pb2.GetProductRequest(product_id=random.choice(state["product_ids"])))
+    return 1
+
+
+def _create_order(stubs, state):
+    items = [order_api_pb2.Order.Item(product_id=random.choice(state["product_ids"]), quantity=random.randint(1, 3))
+             for _ in range(state["items_per_order"])]
+    stubs["order"].CreateOrder(order_api_pb2.CreateOrderRequest(user_id="bench-user", items=items),
+                               metadata=state["metadata"])
+    return 1
+
+
+def _login(stubs, state):
+    stubs["auth"].Login(order_api_pb2.LoginRequest(username=ADMIN_USERNAME, password=ADMIN_PASSWORD))
+    return 1
+
+
+def _list_products(stubs, state):
+    request = order_api_pb2.ListProductsRequest(page_size=state["page_size"])
+    return sum(1 for _ in stubs["product"].ListProducts(request))
+
+
+def _search_products(stubs, state):
+    request = order_api_pb2.SearchProductsRequest(search_query=random.choice(SEARCH_TERMS), limit=100)
+    return sum(1 for _ in stubs["product"].SearchProducts(request))
+
+
+def _export_products(stubs, state):
+    return sum(chunk.records for chunk in stubs["product"].ExportProductsStream(empty_pb2.Empty()))
+
+
+def _export_orders(stubs, state):
+    return sum(chunk.records for chunk in stubs["order"].ExportOrdersStream(empty_pb2.Empty()))
+
+
+WORKLOADS = {
+    "GetProduct": _get_product,
+    "CreateOrder": _create_order,
+    "Login": _login,
+    "ListProducts": _list_products,
+    "SearchProducts": _search_products,
+    "ExportProductsStream": _export_products,
+    "ExportOrdersStream": _export_orders,
+}
+
+
+# --- Clients ---
+
+def _client_thread(workload, stubs, state, warmup_until, stop_at, results):
+    call = WORKLOADS[workload]
+    latencies, errors, messages = [], Counter(), 0
+    while True:
+        started = time.perf_counter()
+        if started >= stop_at:
+            break
+        try:
+            count = call(stubs, state)
+            error = None
+        except grpc.RpcError as e:
+            error = e.code().name
+        elapsed = time.perf_counter() - started
+        if started < warmup_until:
+            continue
+        if error:
+            errors[error] += 1
+        else:
+            latencies.append(elapsed)
+            messages += count
+    results.append((latencies, errors, messages))
+
+
+def _client_process(workload, address, threads, state, warmup, duration, result_queue):
+    """Runs `threads` client threads on one channel and sends their merged samples back."""
+    channel = grpc.insecure_channel(address)
+    stubs = {
+        "auth": order_api_pb2_grpc.AuthServiceStub(channel),
+        "product": order_api_pb2_grpc.ProductServiceStub(channel),
+        "order": order_api_pb2_grpc.OrderServiceStub(channel),
+    }
+    grpc.channel_ready_future(channel).result(timeout=10)
+    # Every process starts measuring at the same wall-clock moment.
+    warmup_until = state["start_at"] + warmup
+    stop_at = warmup_until + duration
+    while time.time() < state["start_at"]:
+        time.sleep(0.001)
+    offset = time.perf_counter() - time.time()
+    results = []
+    workers = [threading.Thread(target=_client_thread,
+                                args=(workload, stubs, state, warmup_until + offset, stop_at + offset, results))
+               for _ in range(threads)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    channel.close()
+
+    latencies, errors, messages = [], Counter(), 0
+    for thread_latencies, thread_errors, thread_messages in results:
+        latencies.extend(thread_latencies)
+        errors.update(thread_errors)
+        messages += thread_messages
+    result_queue.put((latencies, dict(errors), messages))
+
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an ascending list."""
+    if not sorted_values:
+        return None
+    return sorted_values[max(0, math.ceil(fraction * len(sorted_values)) - 1)]
+
+
+def run_workload(workload, args, state):
+    ctx = multiprocessing.get_context("spawn")
+    result_queue = ctx.Queue()
+    state = dict(state, start_at=time.time() + 2.0 + 0.2 * args.processes)  # time for the clients to spawn
+    processes = [ctx.Process(target=_client_process,
+                             args=(workload, args.address, args.threads, state, args.warmup, args.duration,
+                                   result_queue))
+                 for _ in range(args.processes)]
+    for process in processes:
+        process.start()
+    samples = [result_queue.get() for _ in processes]
+    for process in processes:
+        process.join()
+
+    latencies = sorted(latency for process_latencies, _, _ in samples for latency in process_latencies)
+    errors = Counter()
+    for _, process_errors, _ in samples:
+        errors.update(process_errors)
+    messages = sum(process_messages for _, _, process_messages in samples)
+
+    def ms(value):
+        return None if value is None else round(value * 1000, 3)
+
+    return {
+        "workload": workload,
+        "clients": args.processes * args.threads,
+        "requests": len(latencies),
+        "errors": dict(errors),
+        "rps": round(len(latencies) / args.duration, 1),
+        "messages_per_second": round(messages / args.duration, 1),
+        "latency_ms": {
+            "p50": ms(percentile(latencies, 0.50)),
+            "p99": ms(percentile(latencies, 0.99)),
+            "p999": ms(percentile(latencies, 0.999)),
+            "max": ms(latencies[-1] if latencies else None),
+        },
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load-test the gateway's RPCs and report throughput and latency.")
+    parser.add_argument("--workloads", nargs="+", choices=sorted(WORKLOADS), default=list(WORKLOADS))
+    parser.add_argument("--products", type=int, default=10000, help="Products seeded before the run")
+    parser.add_argument("--orders", type=int, default=10000, help="Orders seeded before the run")
+    parser.add_argument("--items-per-order", type=int, default=3)
+    parser.add_argument("--page-size", type=int, default=1000, help="page_size for ListProducts (0: whole table)")
+    parser.add_argument("--processes", type=int, default=2, help="Client processes")
+    parser.add_argument("--threads", type=int, default=8, help="Client threads per process")
+    parser.add_argument("--warmup", type=float, default=2.0, help="Seconds of uncounted calls before measuring")
+    parser.add_argument("--duration", type=float, default=10.0, help="Seconds measured per workload")
+    parser.add_argument("--address", default=BENCH_ADDRESS)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_path = os.path.join(tmp_dir, "bench.db")
+        db = server.Database(db_path)
+        product_ids = seed(db, db_path, args.products, args.orders, args.items_per_order)
+        verifier = server.PasswordVerifier()
+        # Login is measured for hashing throughput, not for how fast the rate limiter says no.
+        unlimited = server.LoginRateLimiter(rate=1e9, burst=1e9, user_rate=1e9, user_burst=1e9)
+        grpc_server = server.create_server(db, args.address, verifier=verifier, rate_limiter=unlimited)
+        grpc_server.start()
+        try:
+            channel = grpc.insecure_channel(args.address)
+            token = order_api_pb2_grpc.AuthServiceStub(channel).Login(
+                order_api_pb2.LoginRequest(username=ADMIN_USERNAME, password=ADMIN_PASSWORD)).token
+            channel.close()
+            state = {
+                "product_ids": product_ids,
+                "items_per_order": args.items_per_order,
+                "page_size": args.page_size,
+                "metadata": (("authorization", f"Bearer {token}"),),
+            }
+            results = []
+            for workload in args.workloads:
+                results.append(run_workload(workload, args, state))
+                latency = results[-1]["latency_ms"]
+                print(f"{workload:>22}: {results[-1]['rps']:>9} rps  p50 {latency['p50']} ms  "
+                      f"p99 {latency['p99']} ms  p999 {latency['p999']} ms  errors {results[-1]['errors']}",
+                      file=sys.stderr)
+        finally:
+            grpc_server.stop(0)
+            verifier.close()
+            db.close()
+
+    print(json.dumps({
+        "benchmark": "load_test",
+        "config": {key: value for key, value in vars(args).items() if key != "workloads"},
+        "results": results,
+    }, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,117 @@
+"""
+Wrapping of gRPC method handlers, shared by the server interceptors.
+
+An interceptor observes a call by returning its handler with the behavior
+wrapped. A behavior comes in four shapes (unary or streaming response, on
+the thread-pool server or as a grpc.aio coroutine / async generator);
+wrap_handler() writes each of them once, and an interceptor only supplies
+a start() hook:
+
+    def start(request_or_iterator, context, is_async):
+        return call, request_or_iterator
+
+start() runs in the wrapper before the behavior and may replace the request
+(or request iterator; with is_async it is an async iterator). The call it
+returns gets call.on_sent(response) for every response and, once,
+call.finish(context, error) when the behavior returns (error None) or
+raises (the exception, including the GeneratorExit of a response stream
+the client stopped reading). A None call runs the behavior unobserved.
+"""
+import inspect
+
+
+def _close(responses):
+    close = getattr(responses, "close", None)
+    if close is not None:
+        close()
+
+
+async def _aclose(responses):
+    aclose = getattr(responses, "aclose", None)
+    if aclose is not None:
+        await aclose()
+
+
+def wrap_handler(handler, start):
+    """Returns `handler` with its behavior run between start() and the call's finish()."""
+    def unary(behavior):
+        def wrapped(request_or_iterator, context):
+            call, request_or_iterator = start(request_or_iterator, context, False)
+            if call is None:
+                return behavior(request_or_iterator, context)
+            try:
+                response = behavior(request_or_iterator, context)
+            except BaseException as e:
+                call.finish(context, e)
+                raise
+            call.on_sent(response)
+            call.finish(context)
+            return response
+        return wrapped
+
+    def stream(behavior):
+        def wrapped(request_or_iterator, context):
+            call, request_or_iterator = start(request_or_iterator, context, False)
+            if call is None:
+                yield from behavior(request_or_iterator, context)
+                return
+            responses = behavior(request_or_iterator, context)
+            try:
+                for response in responses:
+                    call.on_sent(response)
+                    yield response
+            except BaseException as e:
+                # Close the behavior before finishing, as `yield from` would,
+                # so its own cleanup still runs inside the call.
+                _close(responses)
+                call.finish(context, e)
+                raise
+            call.finish(context)
+        return wrapped
+
+    def async_unary(behavior):
+        async def wrapped(request_or_iterator, context):
+            call, request_or_iterator = start(request_or_iterator, context, True)
+            if call is None:
+                return await behavior(request_or_iterator, context)
+            try:
+                response = await behavior(request_or_iterator, context)
+            except BaseException as e:
+                call.finish(context, e)
+                raise
+            call.on_sent(response)
+            call.finish(context)
+            return response
+        return wrapped
+
+    def async_stream(behavior):
+        async def wrapped(request_or_iterator, context):
+            call, request_or_iterator = start(request_or_iterator, context, True)
+            responses = behavior(request_or_iterator, context)
+            if call is None:
+                async for response in responses:
+                    yield response
+                return
+            try:
+                async for response in responses:
+                    call.on_sent(response)
+                    yield response
+            except BaseException as e:
+                await _aclose(responses)
+                call.finish(context, e)
+                raise
+            call.finish(context)
+        return wrapped
+
+    for field in ("unary_unary", "unary_stream", "stream_unary", "stream_stream"):
+        behavior = getattr(handler, field)
+        if behavior is None:
+            continue
+        if inspect.iscoroutinefunction(behavior):
+            wrap = async_unary
+        elif inspect.isasyncgenfunction(behavior):
+            wrap = async_stream
+        else:
+            wrap = stream if handler.response_streaming else unary
+        return handler._replace(**{field: wrap(behavior)})
+    return handler
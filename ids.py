@@ -0,0 +1,64 @@
+"""
+Row IDs for products and orders.
+
+IDs are ULIDs (https://github.com/ulid/spec) in lowercase Crockford base32,
+behind a type prefix:
+
+    prod-01j9z3k6q8x2c4v7b5n0m1r2t3
+
+The first 10 characters after the prefix are the creation time in
+milliseconds, the remaining 16 are 80 random bits. Two processes would have
+to draw the same 80 bits in the same millisecond to collide, so inserts need
+no uniqueness probe. Within a process, IDs made in the same millisecond
+increment the random part instead of redrawing it, so every ID sorts after
+the previous one and new rows append to the right edge of the primary key
+B-tree.
+"""
+import os
+import threading
+import time
+
+ENCODING = "0123456789abcdefghjkmnpqrstvwxyz"  # Crockford base32; ASCII order matches value order
+TIME_BITS = 48
+RANDOM_BITS = 80
+ID_LENGTH = 26  # (TIME_BITS + RANDOM_BITS) / 5, rounded up
+
+
+def _encode(value, length):
+    chars = []
+    for _ in range(length):
+        value, digit = divmod(value, 32)
+        chars.append(ENCODING[digit])
+    return "".join(reversed(chars))
+
+
+class MonotonicULID:
+    """Thread-safe ULID source whose IDs strictly increase within the process."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._last_ms = -1
+        self._last_random = 0
+
+    def new(self):
+        now_ms = time.time_ns() // 1_000_000
+        with self._lock:
+            if now_ms > self._last_ms:
+                self._last_ms = now_ms
+                self._last_random = int.from_bytes(os.urandom(RANDOM_BITS // 8), "big")
+            else:
+                # Same millisecond, or the clock stepped back: keep counting from the last ID.
+                self._last_random += 1
+                if self._last_random >> RANDOM_BITS:
+                    self._last_ms += 1
+                    self._last_random = int.from_bytes(os.urandom(RANDOM_BITS // 8), "big")
+            value = (self._last_ms << RANDOM_BITS) | self._last_random
+        return _encode(value, ID_LENGTH)
+
+
+_ulid = MonotonicULID()
+
+
+def new_id(prefix):
+    """A new ID such as "order-01j9z3k6q8x2c4v7b5n0m1r2t3"."""
+    return f"{prefix}-{_ulid.new()}"
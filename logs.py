@@ -0,0 +1,164 @@
+"""
+Structured logging for the Order API server.
+
+configure_logging() routes every record through a bounded queue to one
+background thread that formats it as a JSON line on stderr, so an RPC thread
+(or the aio event loop) never blocks on the stream. If the writer falls
+behind and the queue fills up, new records are dropped and counted in
+metrics.LOG_RECORDS_DROPPED rather than stalling the caller.
+
+Each RPC gets a request context (see start_request()): the request ID from
+its x-request-id metadata, or a new one, and its method, both added to every
+record it logs. Records below WARNING are sampled per method: a request is
+either sampled, and logs everything, or not, and only logs its warnings and
+errors.
+
+    {"time": "2026-10-16T09:12:03.481Z", "level": "INFO", "logger": "order_api",
+     "message": "Login succeeded", "request_id": "req-01j9z3k6...", "method":
+     "/my_api.v1.AuthService/Login", "user_id": "user-01j9..."}
+"""
+import atexit
+import contextvars
+import copy
+import json
+import logging
+import logging.handlers
+import queue
+import random
+import sys
+import time
+from collections import namedtuple
+
+import ids
+import metrics
+
+LOG_QUEUE_SIZE = 10000  # records waiting for the writer thread before new ones are dropped
+REQUEST_ID_KEY = "x-request-id"
+MAX_REQUEST_ID_LENGTH = 128
+
+RequestContext = namedtuple("RequestContext", "request_id method sampled")
+_request_context = contextvars.ContextVar("request_context", default=None)
+
+# Attributes every LogRecord has; anything else was passed through `extra=` and is logged as a field.
+_RECORD_ATTRIBUTES = set(vars(logging.makeLogRecord({}))) | {"message", "asctime", "taskName"}
+_TRACEBACK_FORMATTER = logging.Formatter()
+
+
+def start_request(method, metadata=(), sample_rate=1.0):
+    """Opens the request context for the current call (thread or task); returns it."""
+    request_id = next((value for key, value in metadata or ()
+                       if key == REQUEST_ID_KEY and isinstance(value, str)), "")
+    if not request_id or len(request_id) > MAX_REQUEST_ID_LENGTH:
+        request_id = ids.new_id("req")
+    sampled = sample_rate >= 1.0 or random.random() < sample_rate
+    context = RequestContext(request_id, method, sampled)
+    _request_context.set(context)
+    return context
+
+
+def current_request():
+    """The RequestContext of the call being handled, or None outside an RPC."""
+    return _request_context.get()
+
+
+class RequestContextFilter(logging.Filter):
+    """
+    Stamps records with the current request's ID and method, and drops
+    records below WARNING from requests that weren't sampled. Runs in the
+    thread that logs, before the record is queued.
+    """
+
+    def filter(self, record):
+        context = _request_context.get()
+        if context is None:
+            return True
+        if not context.sampled and record.levelno < logging.WARNING:
+            return False
+        record.request_id = context.request_id
+        record.method = context.method
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per record, with `extra=` fields at the top level."""
+
+    def format(self, record):
+        entry = {
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(record.created))
+                    + f".{int(record.msecs):03d}Z",
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRIBUTES:
+                entry[key] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exception"] = record.exc_text
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+class _DroppingQueueHandler(logging.handlers.QueueHandler):
+    def prepare(self, record):
+        # Like QueueHandler.prepare(), but keeps the traceback in exc_text
+        # instead of appending it to the message.
+        record = copy.copy(record)
+        record.message = record.getMessage()
+        record.msg, record.args = record.message, None
+        if record.exc_info:
+            record.exc_text = _TRACEBACK_FORMATTER.formatException(record.exc_info)
+        record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            metrics.LOG_RECORDS_DROPPED.inc()
+
+
+class _Listener(logging.handlers.QueueListener):
+    def enqueue_sentinel(self):
+        self.queue.put(self._sentinel)  # blocking: a full queue still drains, and stop() must not lose it
+
+
+_listener = None
+
+
+def configure_logging(level=logging.INFO, stream=None, queue_size=LOG_QUEUE_SIZE):
+    """
+    Sends all logging to `stream` (default stderr) as JSON lines through a
+    non-blocking queue. Replaces the root logger's handlers; safe to call again.
+    """
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+
+    output = logging.StreamHandler(stream or sys.stderr)
+    output.setFormatter(JsonFormatter())
+    log_queue = queue.Queue(maxsize=queue_size)
+    handler = _DroppingQueueHandler(log_queue)
+    handler.addFilter(RequestContextFilter())
+
+    root = logging.getLogger()
+    for existing in list(root.handlers):
+        root.removeHandler(existing)
+    root.addHandler(handler)
+    root.setLevel(level)
+
+    _listener = _Listener(log_queue, output, respect_handler_level=True)
+    _listener.start()
+    return _listener
+
+
+def shutdown_logging():
+    """Writes out the queued records and stops the writer thread."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+atexit.register(shutdown_logging)
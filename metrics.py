@@ -0,0 +1,342 @@
+"""
+Prometheus-style metrics for the Order API server.
+
+No client library: counters and histograms live in a Registry and are
+rendered in the Prometheus text exposition format (version 0.0.4) by a small
+HTTP server on /metrics.
+
+    python server.py --metrics-port 9100
+    curl localhost:9100/metrics
+
+MetricsInterceptor (and AsyncMetricsInterceptor for grpc.aio) records, per
+gRPC method, calls started and handled (by status code), handling latency,
+bytes and messages sent and received, and messages per stream. Database
+timings are recorded separately by server.Database into DB_SECONDS,
+DB_POOL_WAIT_SECONDS and the DB_WRITE_* metrics below.
+"""
+import asyncio
+import bisect
+import http.server
+import math
+import threading
+import time
+
+import grpc
+
+import handlers
+
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000, 100000)
+METRICS_ADDRESS = "127.0.0.1"  # /metrics is served on the loopback interface only
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names, values, extra=()):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    pairs.extend(f'{name}="{value}"' for name, value in extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value):
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """A monotonically increasing value per label combination."""
+
+    type_name = "counter"
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}  # label values -> total
+        self._lock = threading.Lock()
+
+    def inc(self, labels=(), amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def value(self, labels=()):
+        with self._lock:
+            return self._values.get(labels, 0)
+
+    def samples(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        for labels, value in items:
+            yield f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}"
+
+
+class Histogram:
+    """Observations counted into cumulative buckets per label combination."""
+
+    type_name = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}  # label values -> [per-bucket counts (+Inf last), sum]
+        self._lock = threading.Lock()
+
+    def observe(self, labels=(), value=0.0):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    def count(self, labels=()):
+        with self._lock:
+            series = self._series.get(labels)
+            return sum(series[0]) if series else 0
+
+    def samples(self):
+        with self._lock:
+            items = sorted((labels, (list(counts), total)) for labels, (counts, total) in self._series.items())
+        for labels, (counts, total) in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), counts):
+                cumulative += count
+                le = (("le", _format_value(bound)),)
+                yield f"{self.name}_bucket{_format_labels(self.labelnames, labels, le)} {cumulative}"
+            yield f"{self.name}_sum{_format_labels(self.labelnames, labels)} {_format_value(total)}"
+            yield f"{self.name}_count{_format_labels(self.labelnames, labels)} {cumulative}"
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            self._metrics.append(metric)
+        return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self.register(Counter(name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self):
+        """The text exposition of every registered metric."""
+        with self._lock:
+            metrics = list(self._metrics)
+        lines = []
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.type_name}")
+            lines.extend(metric.samples())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+_GRPC_LABELS = ("grpc_type", "grpc_service", "grpc_method")
+RPC_STARTED = REGISTRY.counter(
+    "grpc_server_started_total", "RPCs started on the server.", _GRPC_LABELS)
+RPC_HANDLED = REGISTRY.counter(
+    "grpc_server_handled_total", "RPCs completed on the server, by status code.", _GRPC_LABELS + ("grpc_code",))
+RPC_SECONDS = REGISTRY.histogram(
+    "grpc_server_handling_seconds", "Time from the start of an RPC until its last response was sent.", _GRPC_LABELS)
+MESSAGES_RECEIVED = REGISTRY.counter(
+    "grpc_server_msg_received_total", "Request messages received.", _GRPC_LABELS)
+MESSAGES_SENT = REGISTRY.counter(
+    "grpc_server_msg_sent_total", "Response messages sent.", _GRPC_LABELS)
+BYTES_RECEIVED = REGISTRY.counter(
+    "grpc_server_received_bytes_total", "Serialized size of the request messages received.", _GRPC_LABELS)
+BYTES_SENT = REGISTRY.counter(
+    "grpc_server_sent_bytes_total", "Serialized size of the response messages sent.", _GRPC_LABELS)
+STREAM_MESSAGES_RECEIVED = REGISTRY.histogram(
+    "grpc_server_stream_msg_received", "Request messages per client-streaming RPC.", _GRPC_LABELS, COUNT_BUCKETS)
+STREAM_MESSAGES_SENT = REGISTRY.histogram(
+    "grpc_server_stream_msg_sent", "Response messages per server-streaming RPC.", _GRPC_LABELS, COUNT_BUCKETS)
+
+DB_SECONDS = REGISTRY.histogram(
+    "db_operation_seconds",
+    "Time a Database operation held its connection: reads on a pooled connection, writes on the writer thread.",
+    ("operation", "kind"))
+DB_POOL_WAIT_SECONDS = REGISTRY.histogram(
+    "db_pool_wait_seconds", "Time spent waiting for a pooled connection when all were checked out.")
+DB_WRITE_COMMIT_SECONDS = REGISTRY.histogram(
+    "db_write_commit_seconds", "Time the writer thread spent in each COMMIT.")
+DB_WRITE_BATCH_JOBS = REGISTRY.histogram(
+    "db_write_batch_jobs", "Write jobs group-committed per writer batch.", buckets=COUNT_BUCKETS)
+
+LOG_RECORDS_DROPPED = REGISTRY.counter(
+    "log_records_dropped_total", "Log records dropped because the log writer had fallen behind.")
+TRACE_SPANS_DROPPED = REGISTRY.counter(
+    "trace_spans_dropped_total", "Finished spans dropped because the trace exporter had fallen behind.")
+
+
+def _rpc_type(handler):
+    return {
+        (False, False): "unary",
+        (False, True): "server_stream",
+        (True, False): "client_stream",
+        (True, True): "bidi_stream",
+    }[(handler.request_streaming, handler.response_streaming)]
+
+
+def _method_labels(handler, method):
+    service, _, name = method.lstrip("/").rpartition("/")
+    return _rpc_type(handler), service, name
+
+
+def status_name(context, error):
+    """The status code the call ends with, as its name (e.g. "NOT_FOUND")."""
+    if isinstance(error, (GeneratorExit, asyncio.CancelledError)):
+        return grpc.StatusCode.CANCELLED.name
+    try:
+        code = context.code()
+    except (AttributeError, NotImplementedError):
+        code = None
+    if isinstance(code, grpc.StatusCode):
+        return code.name
+    if code is not None:  # grpc.aio reports codes as integers
+        for status in grpc.StatusCode:
+            if status.value[0] == code:
+                return status.name
+    return grpc.StatusCode.UNKNOWN.name if error is not None else grpc.StatusCode.OK.name
+
+
+def _size(message):
+    try:
+        return message.ByteSize()
+    except AttributeError:
+        return 0
+
+
+class _Call:
+    """Counters for one RPC, flushed to the registry when it finishes."""
+
+    __slots__ = ("labels", "streaming_request", "streaming_response", "started",
+                 "received", "received_bytes", "sent", "sent_bytes")
+
+    def __init__(self, labels, streaming_request, streaming_response):
+        self.labels = labels
+        self.streaming_request = streaming_request
+        self.streaming_response = streaming_response
+        self.started = time.perf_counter()
+        self.received = self.received_bytes = self.sent = self.sent_bytes = 0
+        RPC_STARTED.inc(labels)
+
+    def on_received(self, message):
+        self.received += 1
+        self.received_bytes += _size(message)
+
+    def on_sent(self, message):
+        self.sent += 1
+        self.sent_bytes += _size(message)
+
+    def finish(self, context, error=None):
+        labels = self.labels
+        RPC_SECONDS.observe(labels, time.perf_counter() - self.started)
+        RPC_HANDLED.inc(labels + (status_name(context, error),))
+        MESSAGES_RECEIVED.inc(labels, self.received)
+        BYTES_RECEIVED.inc(labels, self.received_bytes)
+        MESSAGES_SENT.inc(labels, self.sent)
+        BYTES_SENT.inc(labels, self.sent_bytes)
+        if self.streaming_request:
+            STREAM_MESSAGES_RECEIVED.observe(labels, self.received)
+        if self.streaming_response:
+            STREAM_MESSAGES_SENT.observe(labels, self.sent)
+
+
+def _instrument(handler, method):
+    """Returns `handler` with its behavior wrapped to record a _Call."""
+    labels = _method_labels(handler, method)
+    request_streaming, response_streaming = handler.request_streaming, handler.response_streaming
+
+    def counted_requests(call, request_iterator):
+        for request in request_iterator:
+            call.on_received(request)
+            yield request
+
+    async def async_counted_requests(call, request_iterator):
+        async for request in request_iterator:
+            call.on_received(request)
+            yield request
+
+    def start(request_or_iterator, context, is_async):
+        call = _Call(labels, request_streaming, response_streaming)
+        if not request_streaming:
+            call.on_received(request_or_iterator)
+        elif is_async:
+            request_or_iterator = async_counted_requests(call, request_or_iterator)
+        else:
+            request_or_iterator = counted_requests(call, request_or_iterator)
+        return call, request_or_iterator
+
+    return handlers.wrap_handler(handler, start)
+
+
+class MetricsInterceptor(grpc.ServerInterceptor):
+    """
+    Records every RPC into the REGISTRY metrics. Install it before the
+    AuthInterceptor so rejected calls are counted (as UNAUTHENTICATED or
+    PERMISSION_DENIED) too.
+    """
+
+    def intercept_service(self, continuation, handler_call_details):
+        handler = continuation(handler_call_details)
+        if handler is None:
+            return None
+        return _instrument(handler, handler_call_details.method)
+
+
+class AsyncMetricsInterceptor(grpc.aio.ServerInterceptor):
+    """grpc.aio counterpart of MetricsInterceptor."""
+
+    async def intercept_service(self, continuation, handler_call_details):
+        handler = await continuation(handler_call_details)
+        if handler is None:
+            return None
+        return _instrument(handler, handler_call_details.method)
+
+
+class _MetricsHandler(http.server.BaseHTTPRequestHandler):
+    registry = REGISTRY
+
+    def do_GET(self):
+        if self.path.split("?", 1)[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = self.registry.render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", CONTENT_TYPE)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass  # scrapes every few seconds would flood stderr
+
+
+class _MetricsServer(http.server.ThreadingHTTPServer):
+    daemon_threads = True
+
+
+def start_http_server(port, address=METRICS_ADDRESS, registry=REGISTRY, reuse_port=False):
+    """
+    Serves `registry` on http://address:port/metrics from a daemon thread and
+    returns the HTTP server. With reuse_port, another process may bind the
+    same port (SO_REUSEPORT), as a restarting worker's replacement does.
+    """
+    handler = type("MetricsHandler", (_MetricsHandler,), {"registry": registry})
+    server_class = type("MetricsServer", (_MetricsServer,), {"allow_reuse_port": reuse_port})
+    httpd = server_class((address, port), handler)
+    threading.Thread(target=httpd.serve_forever, name="metrics-http", daemon=True).start()
+    return httpd
@@ -25,7 +25,7 @@ _sym_db = _symbol_database.Default()
 from google.protobuf import empty_pb2 as google_dot_protobuf_dot_empty__pb2
 
 
-DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(b'\n\x0forder_api.proto\x12\tmy_api.v1\x1a\x1bgoogle/protobuf/empty.proto\"2\n\x0cLoginRequest\x12\x10\n\x08username\x18\x01 \x01(\t\x12\x10\n\x08password\x18\x02 \x01(\t\",\n\rLoginResponse\x12\r\n\x05token\x18\x01 \x01(\t\x12\x0c\n\x04role\x18\x02 \x01(\t\"O\n\x07Product\x12\x12\n\nproduct_id\x18\x01 \x01(\t\x12\x0c\n\x04name\x18\x02 \x01(\t\x12\x13\n\x0b\x64\x65scription\x18\x03 \x01(\t\x12\r\n\x05price\x18\x04 \x01(\x01\"\xaf\x02\n\x05Order\x12\x10\n\x08order_id\x18\x01 \x01(\t\x12\x0f\n\x07user_id\x18\x02 \x01(\t\x12\'\n\x06status\x18\x03 \x01(\x0e\x32\x17.my_api.v1.Order.Status\x12$\n\x05items\x18\x04 \x03(\x0b\x32\x15.my_api.v1.Order.Item\x12\x14\n\x0ctotal_amount\x18\x05 \x01(\x01\x1a\x44\n\x04Item\x12\x12\n\nproduct_id\x18\x01 \x01(\t\x12\x10\n\x08quantity\x18\x02 \x01(\x05\x12\x16\n\x0eprice_per_item\x18\x03 \x01(\x01\"X\n\x06Status\x12\x16\n\x12STATUS_UNSPECIFIED\x10\x00\x12\x0b\n\x07PENDING\x10\x01\x12\x0b\n\x07SHIPPED\x10\x02\x12\r\n\tCOMPLETED\x10\x03\x12\r\n\tCANCELLED\x10\x04\"\x1e\n\rCountResponse\x12\r\n\x05\x63ount\x18\x01 \x01(\x03\"#\n\x0e\x45xportResponse\x12\x11\n\tjson_data\x18\x01 \x01(\t\"H\n\x14\x43reateProductRequest\x12\x0c\n\x04name\x18\x01 \x01(\t\x12\x13\n\x0b\x64\x65scription\x18\x02 \x01(\t\x12\r\n\x05price\x18\x03 \x01(\x01\"\'\n\x11GetProductRequest\x12\x12\n\nproduct_id\x18\x01 \x01(\t\"\\\n\x14UpdateProductRequest\x12\x12\n\nproduct_id\x18\x01 \x01(\t\x12\x0c\n\x04name\x18\x02 \x01(\t\x12\x13\n\x0b\x64\x65scription\x18\x03 \x01(\t\x12\r\n\x05price\x18\x04 \x01(\x01\"*\n\x14\x44\x65leteProductRequest\x12\x12\n\nproduct_id\x18\x01 \x01(\t\"(\n\x15\x44\x65leteProductResponse\x12\x0f\n\x07success\x18\x01 \x01(\x08\"\x15\n\x13ListProductsRequest\"<\n\x15SearchProductsRequest\x12\x14\n\x0csearch_query\x18\x01 \x01(\t\x12\r\n\x05limit\x18\x02 \x01(\x05\"K\n\x12\x43reateOrderRequest\x12\x0f\n\x07user_id\x18\x01 \x01(\t\x12$\n\x05items\x18\x02 \x03(\x0b\x32\x15.my_api.v1.Order.Item\"#\n\x0fGetOrderRequest\x12\x10\n\x08order_id\x18\x01 \x01(\t\"Y\n\x18UpdateOrderStatusRequest\x12\x10\n\x08order_id\x18\x01 \x01(\t\x12+\n\nnew_status\x18\x02 \x01(\x0e\x32\x17.my_api.v1.Order.Status2I\n\x0b\x41uthService\x12:\n\x05Login\x12\x17.my_api.v1.LoginRequest\x1a\x18.my_api.v1.LoginResponse2\xc8\x04\n\x0eProductService\x12\x44\n\rCreateProduct\x12\x1f.my_api.v1.CreateProductRequest\x1a\x12.my_api.v1.Product\x12>\n\nGetProduct\x12\x1c.my_api.v1.GetProductRequest\x1a\x12.my_api.v1.Product\x12\x44\n\rUpdateProduct\x12\x1f.my_api.v1.UpdateProductRequest\x1a\x12.my_api.v1.Product\x12R\n\rDeleteProduct\x12\x1f.my_api.v1.DeleteProductRequest\x1a .my_api.v1.DeleteProductResponse\x12\x44\n\x0cListProducts\x12\x1e.my_api.v1.ListProductsRequest\x1a\x12.my_api.v1.Product0\x01\x12H\n\x0eSearchProducts\x12 .my_api.v1.SearchProductsRequest\x1a\x12.my_api.v1.Product0\x01\x12\x41\n\rCountProducts\x12\x16.google.protobuf.Empty\x1a\x18.my_api.v1.CountResponse\x12\x43\n\x0e\x45xportProducts\x12\x16.google.protobuf.Empty\x1a\x19.my_api.v1.ExportResponse2\xd8\x02\n\x0cOrderService\x12>\n\x0b\x43reateOrder\x12\x1d.my_api.v1.CreateOrderRequest\x1a\x10.my_api.v1.Order\x12\x38\n\x08GetOrder\x12\x1a.my_api.v1.GetOrderRequest\x1a\x10.my_api.v1.Order\x12J\n\x11UpdateOrderStatus\x12#.my_api.v1.UpdateOrderStatusRequest\x1a\x10.my_api.v1.Order\x12?\n\x0b\x43ountOrders\x12\x16.google.protobuf.Empty\x1a\x18.my_api.v1.CountResponse\x12\x41\n\x0c\x45xportOrders\x12\x16.google.protobuf.Empty\x1a\x19.my_api.v1.ExportResponseb\x06proto3')
+DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(b'\n\x0forder_api.proto\x12\tmy_api.v1\x1a\x1bgoogle/protobuf/empty.proto\"2\n\x0cLoginRequest\x12\x10\n\x08username\x18\x01 \x01(\t\x12\x10\n\x08password\x18\x02 \x01(\t\",\n\rLoginResponse\x12\r\n\x05token\x18\x01 \x01(\t\x12\x0c\n\x04role\x18\x02 \x01(\t\"O\n\x07Product\x12\x12\n\nproduct_id\x18\x01 \x01(\t\x12\x0c\n\x04name\x18\x02 \x01(\t\x12\x13\n\x0b\x64\x65scription\x18\x03 \x01(\t\x12\r\n\x05price\x18\x04 \x01(\x01\"\xaf\x02\n\x05Order\x12\x10\n\x08order_id\x18\x01 \x01(\t\x12\x0f\n\x07user_id\x18\x02 \x01(\t\x12\'\n\x06status\x18\x03 \x01(\x0e\x32\x17.my_api.v1.Order.Status\x12$\n\x05items\x18\x04 \x03(\x0b\x32\x15.my_api.v1.Order.Item\x12\x14\n\x0ctotal_amount\x18\x05 \x01(\x01\x1a\x44\n\x04Item\x12\x12\n\nproduct_id\x18\x01 \x01(\t\x12\x10\n\x08quantity\x18\x02 \x01(\x05\x12\x16\n\x0eprice_per_item\x18\x03 \x01(\x01\"X\n\x06Status\x12\x16\n\x12STATUS_UNSPECIFIED\x10\x00\x12\x0b\n\x07PENDING\x10\x01\x12\x0b\n\x07SHIPPED\x10\x02\x12\r\n\tCOMPLETED\x10\x03\x12\r\n\tCANCELLED\x10\x04\"4\n\x0cProductBatch\x12$\n\x08products\x18\x01 \x03(\x0b\x32\x12.my_api.v1.Product\"\x1e\n\rCountResponse\x12\r\n\x05\x63ount\x18\x01 \x01(\x03\"#\n\x0e\x45xportResponse\x12\x11\n\tjson_data\x18\x01 \x01(\t\".\n\x0b\x45xportChunk\x12\x0e\n\x06ndjson\x18\x01 \x01(\x0c\x12\x0f\n\x07records\x18\x02 \x01(\x03\"H\n\x14\x43reateProductRequest\x12\x0c\n\x04name\x18\x01 \x01(\t\x12\x13\n\x0b\x64\x65scription\x18\x02 \x01(\t\x12\r\n\x05price\x18\x03 \x01(\x01\"J\n\x15ImportProductsRequest\x12\x31\n\x08products\x18\x01 \x03(\x0b\x32\x1f.my_api.v1.CreateProductRequest\"\xa2\x01\n\x16ImportProductsResponse\x12\x10\n\x08imported\x18\x01 \x01(\x03\x12\x0e\n\x06\x66\x61iled\x18\x02 \x01(\x03\x12:\n\x06\x65rrors\x18\x03 \x03(\x0b\x32*.my_api.v1.ImportProductsResponse.RowError\x1a*\n\x08RowError\x12\r\n\x05index\x18\x01 \x01(\x03\x12\x0f\n\x07message\x18\x02 \x01(\t\"\'\n\x11GetProductRequest\x12\x12\n\nproduct_id\x18\x01 \x01(\t\".\n\x17\x42\x61tchGetProductsRequest\x12\x13\n\x0bproduct_ids\x18\x01 \x03(\t\"U\n\x18\x42\x61tchGetProductsResponse\x12$\n\x08products\x18\x01 \x03(\x0b\x32\x12.my_api.v1.Product\x12\x13\n\x0bmissing_ids\x18\x02 \x03(\t\"\\\n\x14UpdateProductRequest\x12\x12\n\nproduct_id\x18\x01 \x01(\t\x12\x0c\n\x04name\x18\x02 \x01(\t\x12\x13\n\x0b\x64\x65scription\x18\x03 \x01(\t\x12\r\n\x05price\x18\x04 \x01(\x01\"*\n\x14\x44\x65leteProductRequest\x12\x12\n\nproduct_id\x18\x01 \x01(\t\"(\n\x15\x44\x65leteProductResponse\x12\x0f\n\x07success\x18\x01 \x01(\x08\"P\n\x13ListProductsRequest\x12\x11\n\tpage_size\x18\x01 \x01(\x05\x12\x12\n\npage_token\x18\x02 \x01(\t\x12\x12\n\nbatch_size\x18\x03 \x01(\x05\"P\n\x15SearchProductsRequest\x12\x14\n\x0csearch_query\x18\x01 \x01(\t\x12\r\n\x05limit\x18\x02 \x01(\x05\x12\x12\n\nbatch_size\x18\x03 \x01(\x05\"d\n\x12\x43reateOrderRequest\x12\x0f\n\x07user_id\x18\x01 \x01(\t\x12$\n\x05items\x18\x02 \x03(\x0b\x32\x15.my_api.v1.Order.Item\x12\x17\n\x0fidempotency_key\x18\x03 \x01(\t\"#\n\x0fGetOrderRequest\x12\x10\n\x08order_id\x18\x01 \x01(\t\"Y\n\x18UpdateOrderStatusRequest\x12\x10\n\x08order_id\x18\x01 \x01(\t\x12+\n\nnew_status\x18\x02 \x01(\x0e\x32\x17.my_api.v1.Order.Status\"O\n\x15StartProfilingRequest\x12\x0f\n\x07seconds\x18\x01 \x01(\x01\x12\x14\n\x0cmax_requests\x18\x02 \x01(\x05\x12\x0f\n\x07methods\x18\x03 \x03(\t\"f\n\x10ProfilingSession\x12\x0e\n\x06\x61\x63tive\x18\x01 \x01(\x08\x12\x12\n\noutput_dir\x18\x02 \x01(\t\x12\x10\n\x08requests\x18\x03 \x01(\x03\x12\x0f\n\x07samples\x18\x04 \x01(\x03\x12\x0b\n\x03pid\x18\x05 \x01(\x05\x32I\n\x0b\x41uthService\x12:\n\x05Login\x12\x17.my_api.v1.LoginRequest\x1a\x18.my_api.v1.LoginResponse2\xf0\x07\n\x0eProductService\x12\x44\n\rCreateProduct\x12\x1f.my_api.v1.CreateProductRequest\x1a\x12.my_api.v1.Product\x12W\n\x0eImportProducts\x12 .my_api.v1.ImportProductsRequest\x1a!.my_api.v1.ImportProductsResponse(\x01\x12>\n\nGetProduct\x12\x1c.my_api.v1.GetProductRequest\x1a\x12.my_api.v1.Product\x12[\n\x10\x42\x61tchGetProducts\x12\".my_api.v1.BatchGetProductsRequest\x1a#.my_api.v1.BatchGetProductsResponse\x12\x44\n\rUpdateProduct\x12\x1f.my_api.v1.UpdateProductRequest\x1a\x12.my_api.v1.Product\x12R\n\rDeleteProduct\x12\x1f.my_api.v1.DeleteProductRequest\x1a .my_api.v1.DeleteProductResponse\x12\x44\n\x0cListProducts\x12\x1e.my_api.v1.ListProductsRequest\x1a\x12.my_api.v1.Product0\x01\x12H\n\x0eSearchProducts\x12 .my_api.v1.SearchProductsRequest\x1a\x12.my_api.v1.Product0\x01\x12P\n\x13ListProductsBatched\x12\x1e.my_api.v1.ListProductsRequest\x1a\x17.my_api.v1.ProductBatch0\x01\x12T\n\x15SearchProductsBatched\x12 .my_api.v1.SearchProductsRequest\x1a\x17.my_api.v1.ProductBatch0\x01\x12\x41\n\rCountProducts\x12\x16.google.protobuf.Empty\x1a\x18.my_api.v1.CountResponse\x12\x43\n\x0e\x45xportProducts\x12\x16.google.protobuf.Empty\x1a\x19.my_api.v1.ExportResponse\x12H\n\x14\x45xportProductsStream\x12\x16.google.protobuf.Empty\x1a\x16.my_api.v1.ExportChunk0\x01\x32\xa0\x03\n\x0cOrderService\x12>\n\x0b\x43reateOrder\x12\x1d.my_api.v1.CreateOrderRequest\x1a\x10.my_api.v1.Order\x12\x38\n\x08GetOrder\x12\x1a.my_api.v1.GetOrderRequest\x1a\x10.my_api.v1.Order\x12J\n\x11UpdateOrderStatus\x12#.my_api.v1.UpdateOrderStatusRequest\x1a\x10.my_api.v1.Order\x12?\n\x0b\x43ountOrders\x12\x16.google.protobuf.Empty\x1a\x18.my_api.v1.CountResponse\x12\x41\n\x0c\x45xportOrders\x12\x16.google.protobuf.Empty\x1a\x19.my_api.v1.ExportResponse\x12\x46\n\x12\x45xportOrdersStream\x12\x16.google.protobuf.Empty\x1a\x16.my_api.v1.ExportChunk0\x01\x32\xa5\x01\n\x0c\x41\x64minService\x12O\n\x0eStartProfiling\x12 .my_api.v1.StartProfilingRequest\x1a\x1b.my_api.v1.ProfilingSession\x12\x44\n\rStopProfiling\x12\x16.google.protobuf.Empty\x1a\x1b.my_api.v1.ProfilingSessionb\x06proto3')
 
 _globals = globals()
 _builder.BuildMessageAndEnumDescriptors(DESCRIPTOR, _globals)
@@ -44,34 +44,54 @@ if not _descriptor._USE_C_DESCRIPTORS:
   _globals['_ORDER_ITEM']._serialized_end=452
   _globals['_ORDER_STATUS']._serialized_start=454
   _globals['_ORDER_STATUS']._serialized_end=542
-  _globals['_COUNTRESPONSE']._serialized_start=544
-  _globals['_COUNTRESPONSE']._serialized_end=574
-  _globals['_EXPORTRESPONSE']._serialized_start=576
-  _globals['_EXPORTRESPONSE']._serialized_end=611
-  _globals['_CREATEPRODUCTREQUEST']._serialized_start=613
-  _globals['_CREATEPRODUCTREQUEST']._serialized_end=685
-  _globals['_GETPRODUCTREQUEST']._serialized_start=687
-  _globals['_GETPRODUCTREQUEST']._serialized_end=726
-  _globals['_UPDATEPRODUCTREQUEST']._serialized_start=728
-  _globals['_UPDATEPRODUCTREQUEST']._serialized_end=820
-  _globals['_DELETEPRODUCTREQUEST']._serialized_start=822
-  _globals['_DELETEPRODUCTREQUEST']._serialized_end=864
-  _globals['_DELETEPRODUCTRESPONSE']._serialized_start=866
-  _globals['_DELETEPRODUCTRESPONSE']._serialized_end=906
-  _globals['_LISTPRODUCTSREQUEST']._serialized_start=908
-  _globals['_LISTPRODUCTSREQUEST']._serialized_end=929
-  _globals['_SEARCHPRODUCTSREQUEST']._serialized_start=931
-  _globals['_SEARCHPRODUCTSREQUEST']._serialized_end=991
-  _globals['_CREATEORDERREQUEST']._serialized_start=993
-  _globals['_CREATEORDERREQUEST']._serialized_end=1068
-  _globals['_GETORDERREQUEST']._serialized_start=1070
-  _globals['_GETORDERREQUEST']._serialized_end=1105
-  _globals['_UPDATEORDERSTATUSREQUEST']._serialized_start=1107
-  _globals['_UPDATEORDERSTATUSREQUEST']._serialized_end=1196
-  _globals['_AUTHSERVICE']._serialized_start=1198
-  _globals['_AUTHSERVICE']._serialized_end=1271
-  _globals['_PRODUCTSERVICE']._serialized_start=1274
-  _globals['_PRODUCTSERVICE']._serialized_end=1858
-  _globals['_ORDERSERVICE']._serialized_start=1861
-  _globals['_ORDERSERVICE']._serialized_end=2205
+  _globals['_PRODUCTBATCH']._serialized_start=544
+  _globals['_PRODUCTBATCH']._serialized_end=596
+  _globals['_COUNTRESPONSE']._serialized_start=598
+  _globals['_COUNTRESPONSE']._serialized_end=628
+  _globals['_EXPORTRESPONSE']._serialized_start=630
+  _globals['_EXPORTRESPONSE']._serialized_end=665
+  _globals['_EXPORTCHUNK']._serialized_start=667
+  _globals['_EXPORTCHUNK']._serialized_end=713
+  _globals['_CREATEPRODUCTREQUEST']._serialized_start=715
+  _globals['_CREATEPRODUCTREQUEST']._serialized_end=787
+  _globals['_IMPORTPRODUCTSREQUEST']._serialized_start=789
+  _globals['_IMPORTPRODUCTSREQUEST']._serialized_end=863
+  _globals['_IMPORTPRODUCTSRESPONSE']._serialized_start=866
+  _globals['_IMPORTPRODUCTSRESPONSE']._serialized_end=1028
+  _globals['_IMPORTPRODUCTSRESPONSE_ROWERROR']._serialized_start=986
+  _globals['_IMPORTPRODUCTSRESPONSE_ROWERROR']._serialized_end=1028
+  _globals['_GETPRODUCTREQUEST']._serialized_start=1030
+  _globals['_GETPRODUCTREQUEST']._serialized_end=1069
+  _globals['_BATCHGETPRODUCTSREQUEST']._serialized_start=1071
+  _globals['_BATCHGETPRODUCTSREQUEST']._serialized_end=1117
+  _globals['_BATCHGETPRODUCTSRESPONSE']._serialized_start=1119
+  _globals['_BATCHGETPRODUCTSRESPONSE']._serialized_end=1204
+  _globals['_UPDATEPRODUCTREQUEST']._serialized_start=1206
+  _globals['_UPDATEPRODUCTREQUEST']._serialized_end=1298
+  _globals['_DELETEPRODUCTREQUEST']._serialized_start=1300
+  _globals['_DELETEPRODUCTREQUEST']._serialized_end=1342
+  _globals['_DELETEPRODUCTRESPONSE']._serialized_start=1344
+  _globals['_DELETEPRODUCTRESPONSE']._serialized_end=1384
+  _globals['_LISTPRODUCTSREQUEST']._serialized_start=1386
+  _globals['_LISTPRODUCTSREQUEST']._serialized_end=1466
+  _globals['_SEARCHPRODUCTSREQUEST']._serialized_start=1468
+  _globals['_SEARCHPRODUCTSREQUEST']._serialized_end=1548
+  _globals['_CREATEORDERREQUEST']._serialized_start=1550
+  _globals['_CREATEORDERREQUEST']._serialized_end=1650
+  _globals['_GETORDERREQUEST']._serialized_start=1652
+  _globals['_GETORDERREQUEST']._serialized_end=1687
+  _globals['_UPDATEORDERSTATUSREQUEST']._serialized_start=1689
+  _globals['_UPDATEORDERSTATUSREQUEST']._serialized_end=1778
+  _globals['_STARTPROFILINGREQUEST']._serialized_start=1780
+  _globals['_STARTPROFILINGREQUEST']._serialized_end=1859
+  _globals['_PROFILINGSESSION']._serialized_start=1861
+  _globals['_PROFILINGSESSION']._serialized_end=1963
+  _globals['_AUTHSERVICE']._serialized_start=1965
+  _globals['_AUTHSERVICE']._serialized_end=2038
+  _globals['_PRODUCTSERVICE']._serialized_start=2041
+  _globals['_PRODUCTSERVICE']._serialized_end=3049
+  _globals['_ORDERSERVICE']._serialized_start=3052
+  _globals['_ORDERSERVICE']._serialized_end=3468
+  _globals['_ADMINSERVICE']._serialized_start=3471
+  _globals['_ADMINSERVICE']._serialized_end=3636
 # @@protoc_insertion_point(module_scope)
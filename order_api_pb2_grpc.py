@@ -128,11 +128,21 @@ class ProductServiceStub(object):
                 request_serializer=order__api__pb2.CreateProductRequest.SerializeToString,
                 response_deserializer=order__api__pb2.Product.FromString,
                 _registered_method=True)
+        self.ImportProducts = channel.stream_unary(
+                '/my_api.v1.ProductService/ImportProducts',
+                request_serializer=order__api__pb2.ImportProductsRequest.SerializeToString,
+                response_deserializer=order__api__pb2.ImportProductsResponse.FromString,
+                _registered_method=True)
         self.GetProduct = channel.unary_unary(
                 '/my_api.v1.ProductService/GetProduct',
                 request_serializer=order__api__pb2.GetProductRequest.SerializeToString,
                 response_deserializer=order__api__pb2.Product.FromString,
                 _registered_method=True)
+        self.BatchGetProducts = channel.unary_unary(
+                '/my_api.v1.ProductService/BatchGetProducts',
+                request_serializer=order__api__pb2.BatchGetProductsRequest.SerializeToString,
+                response_deserializer=order__api__pb2.BatchGetProductsResponse.FromString,
+                _registered_method=True)
         self.UpdateProduct = channel.unary_unary(
                 '/my_api.v1.ProductService/UpdateProduct',
                 request_serializer=order__api__pb2.UpdateProductRequest.SerializeToString,
@@ -153,6 +163,16 @@ class ProductServiceStub(object):
                 request_serializer=order__api__pb2.SearchProductsRequest.SerializeToString,
                 response_deserializer=order__api__pb2.Product.FromString,
                 _registered_method=True)
+        self.ListProductsBatched = channel.unary_stream(
+                '/my_api.v1.ProductService/ListProductsBatched',
+                request_serializer=order__api__pb2.ListProductsRequest.SerializeToString,
+                response_deserializer=order__api__pb2.ProductBatch.FromString,
+                _registered_method=True)
+        self.SearchProductsBatched = channel.unary_stream(
+                '/my_api.v1.ProductService/SearchProductsBatched',
+                request_serializer=order__api__pb2.SearchProductsRequest.SerializeToString,
+                response_deserializer=order__api__pb2.ProductBatch.FromString,
+                _registered_method=True)
         self.CountProducts = channel.unary_unary(
                 '/my_api.v1.ProductService/CountProducts',
                 request_serializer=google_dot_protobuf_dot_empty__pb2.Empty.SerializeToString,
@@ -163,6 +183,11 @@ class ProductServiceStub(object):
                 request_serializer=google_dot_protobuf_dot_empty__pb2.Empty.SerializeToString,
                 response_deserializer=order__api__pb2.ExportResponse.FromString,
                 _registered_method=True)
+        self.ExportProductsStream = channel.unary_stream(
+                '/my_api.v1.ProductService/ExportProductsStream',
+                request_serializer=google_dot_protobuf_dot_empty__pb2.Empty.SerializeToString,
+                response_deserializer=order__api__pb2.ExportChunk.FromString,
+                _registered_method=True)
 
 
 class ProductServiceServicer(object):
@@ -178,12 +203,26 @@ class ProductServiceServicer(object):
         context.set_details('Method not implemented!')
         raise NotImplementedError('Method not implemented!')
 
+    def ImportProducts(self, request_iterator, context):
+        """Bulk insert: stream any number of product batches, get one summary back.
+        """
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
     def GetProduct(self, request, context):
         """Missing associated documentation comment in .proto file."""
         context.set_code(grpc.StatusCode.UNIMPLEMENTED)
         context.set_details('Method not implemented!')
         raise NotImplementedError('Method not implemented!')
 
+    def BatchGetProducts(self, request, context):
+        """Many products in one round trip, e.g. to price an order's items.
+        """
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
     def UpdateProduct(self, request, context):
         """Missing associated documentation comment in .proto file."""
         context.set_code(grpc.StatusCode.UNIMPLEMENTED)
@@ -208,6 +247,19 @@ class ProductServiceServicer(object):
         context.set_details('Method not implemented!')
         raise NotImplementedError('Method not implemented!')
 
+    def ListProductsBatched(self, request, context):
+        """Same results as ListProducts/SearchProducts, packed many products per message.
+        """
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def SearchProductsBatched(self, request, context):
+        """Missing associated documentation comment in .proto file."""
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
     def CountProducts(self, request, context):
         """Missing associated documentation comment in .proto file."""
         context.set_code(grpc.StatusCode.UNIMPLEMENTED)
@@ -220,6 +272,13 @@ class ProductServiceServicer(object):
         context.set_details('Method not implemented!')
         raise NotImplementedError('Method not implemented!')
 
+    def ExportProductsStream(self, request, context):
+        """NDJSON export streamed in chunks; not bound by the 4 MB message limit.
+        """
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
 
 def add_ProductServiceServicer_to_server(servicer, server):
     rpc_method_handlers = {
@@ -228,11 +287,21 @@ def add_ProductServiceServicer_to_server(servicer, server):
                     request_deserializer=order__api__pb2.CreateProductRequest.FromString,
                     response_serializer=order__api__pb2.Product.SerializeToString,
             ),
+            'ImportProducts': grpc.stream_unary_rpc_method_handler(
+                    servicer.ImportProducts,
+                    request_deserializer=order__api__pb2.ImportProductsRequest.FromString,
+                    response_serializer=order__api__pb2.ImportProductsResponse.SerializeToString,
+            ),
             'GetProduct': grpc.unary_unary_rpc_method_handler(
                     servicer.GetProduct,
                     request_deserializer=order__api__pb2.GetProductRequest.FromString,
                     response_serializer=order__api__pb2.Product.SerializeToString,
             ),
+            'BatchGetProducts': grpc.unary_unary_rpc_method_handler(
+                    servicer.BatchGetProducts,
+                    request_deserializer=order__api__pb2.BatchGetProductsRequest.FromString,
+                    response_serializer=order__api__pb2.BatchGetProductsResponse.SerializeToString,
+            ),
             'UpdateProduct': grpc.unary_unary_rpc_method_handler(
                     servicer.UpdateProduct,
                     request_deserializer=order__api__pb2.UpdateProductRequest.FromString,
@@ -253,6 +322,16 @@ def add_ProductServiceServicer_to_server(servicer, server):
                     request_deserializer=order__api__pb2.SearchProductsRequest.FromString,
                     response_serializer=order__api__pb2.Product.SerializeToString,
             ),
+            'ListProductsBatched': grpc.unary_stream_rpc_method_handler(
+                    servicer.ListProductsBatched,
+                    request_deserializer=order__api__pb2.ListProductsRequest.FromString,
+                    response_serializer=order__api__pb2.ProductBatch.SerializeToString,
+            ),
+            'SearchProductsBatched': grpc.unary_stream_rpc_method_handler(
+                    servicer.SearchProductsBatched,
+                    request_deserializer=order__api__pb2.SearchProductsRequest.FromString,
+                    response_serializer=order__api__pb2.ProductBatch.SerializeToString,
+            ),
             'CountProducts': grpc.unary_unary_rpc_method_handler(
                     servicer.CountProducts,
                     request_deserializer=google_dot_protobuf_dot_empty__pb2.Empty.FromString,
@@ -263,6 +342,11 @@ def add_ProductServiceServicer_to_server(servicer, server):
                     request_deserializer=google_dot_protobuf_dot_empty__pb2.Empty.FromString,
                     response_serializer=order__api__pb2.ExportResponse.SerializeToString,
             ),
+            'ExportProductsStream': grpc.unary_stream_rpc_method_handler(
+                    servicer.ExportProductsStream,
+                    request_deserializer=google_dot_protobuf_dot_empty__pb2.Empty.FromString,
+                    response_serializer=order__api__pb2.ExportChunk.SerializeToString,
+            ),
     }
     generic_handler = grpc.method_handlers_generic_handler(
             'my_api.v1.ProductService', rpc_method_handlers)
@@ -305,6 +389,33 @@ class ProductService(object):
             metadata,
             _registered_method=True)
 
+    @staticmethod
+    def ImportProducts(request_iterator,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.stream_unary(
+            request_iterator,
+            target,
+            '/my_api.v1.ProductService/ImportProducts',
+            order__api__pb2.ImportProductsRequest.SerializeToString,
+            order__api__pb2.ImportProductsResponse.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
     @staticmethod
     def GetProduct(request,
             target,
@@ -332,6 +443,33 @@ class ProductService(object):
             metadata,
             _registered_method=True)
 
+    @staticmethod
+    def BatchGetProducts(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(
+            request,
+            target,
+            '/my_api.v1.ProductService/BatchGetProducts',
+            order__api__pb2.BatchGetProductsRequest.SerializeToString,
+            order__api__pb2.BatchGetProductsResponse.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
     @staticmethod
     def UpdateProduct(request,
             target,
@@ -440,6 +578,60 @@ class ProductService(object):
             metadata,
             _registered_method=True)
 
+    @staticmethod
+    def ListProductsBatched(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_stream(
+            request,
+            target,
+            '/my_api.v1.ProductService/ListProductsBatched',
+            order__api__pb2.ListProductsRequest.SerializeToString,
+            order__api__pb2.ProductBatch.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
+    @staticmethod
+    def SearchProductsBatched(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_stream(
+            request,
+            target,
+            '/my_api.v1.ProductService/SearchProductsBatched',
+            order__api__pb2.SearchProductsRequest.SerializeToString,
+            order__api__pb2.ProductBatch.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
     @staticmethod
     def CountProducts(request,
             target,
@@ -494,6 +686,33 @@ class ProductService(object):
             metadata,
             _registered_method=True)
 
+    @staticmethod
+    def ExportProductsStream(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_stream(
+            request,
+            target,
+            '/my_api.v1.ProductService/ExportProductsStream',
+            google_dot_protobuf_dot_empty__pb2.Empty.SerializeToString,
+            order__api__pb2.ExportChunk.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
 
 class OrderServiceStub(object):
     """=======================================================
@@ -533,6 +752,11 @@ class OrderServiceStub(object):
                 request_serializer=google_dot_protobuf_dot_empty__pb2.Empty.SerializeToString,
                 response_deserializer=order__api__pb2.ExportResponse.FromString,
                 _registered_method=True)
+        self.ExportOrdersStream = channel.unary_stream(
+                '/my_api.v1.OrderService/ExportOrdersStream',
+                request_serializer=google_dot_protobuf_dot_empty__pb2.Empty.SerializeToString,
+                response_deserializer=order__api__pb2.ExportChunk.FromString,
+                _registered_method=True)
 
 
 class OrderServiceServicer(object):
@@ -572,6 +796,12 @@ class OrderServiceServicer(object):
         context.set_details('Method not implemented!')
         raise NotImplementedError('Method not implemented!')
 
+    def ExportOrdersStream(self, request, context):
+        """Missing associated documentation comment in .proto file."""
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
 
 def add_OrderServiceServicer_to_server(servicer, server):
     rpc_method_handlers = {
@@ -600,6 +830,11 @@ def add_OrderServiceServicer_to_server(servicer, server):
                     request_deserializer=google_dot_protobuf_dot_empty__pb2.Empty.FromString,
                     response_serializer=order__api__pb2.ExportResponse.SerializeToString,
             ),
+            'ExportOrdersStream': grpc.unary_stream_rpc_method_handler(
+                    servicer.ExportOrdersStream,
+                    request_deserializer=google_dot_protobuf_dot_empty__pb2.Empty.FromString,
+                    response_serializer=order__api__pb2.ExportChunk.SerializeToString,
+            ),
     }
     generic_handler = grpc.method_handlers_generic_handler(
             'my_api.v1.OrderService', rpc_method_handlers)
@@ -749,3 +984,161 @@ class OrderService(object):
             timeout,
             metadata,
             _registered_method=True)
+
+    @staticmethod
+    def ExportOrdersStream(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_stream(
+            request,
+            target,
+            '/my_api.v1.OrderService/ExportOrdersStream',
+            google_dot_protobuf_dot_empty__pb2.Empty.SerializeToString,
+            order__api__pb2.ExportChunk.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
+
+class AdminServiceStub(object):
+    """=======================================================
+    Service: AdminService
+    Operational controls for the server process that answers.
+    =======================================================
+    """
+
+    def __init__(self, channel):
+        """Constructor.
+
+        Args:
+            channel: A grpc.Channel.
+        """
+        self.StartProfiling = channel.unary_unary(
+                '/my_api.v1.AdminService/StartProfiling',
+                request_serializer=order__api__pb2.StartProfilingRequest.SerializeToString,
+                response_deserializer=order__api__pb2.ProfilingSession.FromString,
+                _registered_method=True)
+        self.StopProfiling = channel.unary_unary(
+                '/my_api.v1.AdminService/StopProfiling',
+                request_serializer=google_dot_protobuf_dot_empty__pb2.Empty.SerializeToString,
+                response_deserializer=order__api__pb2.ProfilingSession.FromString,
+                _registered_method=True)
+
+
+class AdminServiceServicer(object):
+    """=======================================================
+    Service: AdminService
+    Operational controls for the server process that answers.
+    =======================================================
+    """
+
+    def StartProfiling(self, request, context):
+        """Samples the stacks of in-flight RPCs for a window of time and/or
+        requests, then writes collapsed stacks (one file per method) on the
+        server. Fails with FAILED_PRECONDITION if a session is already running.
+        """
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def StopProfiling(self, request, context):
+        """Ends the running session early and writes its output.
+        """
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+
+def add_AdminServiceServicer_to_server(servicer, server):
+    rpc_method_handlers = {
+            'StartProfiling': grpc.unary_unary_rpc_method_handler(
+                    servicer.StartProfiling,
+                    request_deserializer=order__api__pb2.StartProfilingRequest.FromString,
+                    response_serializer=order__api__pb2.ProfilingSession.SerializeToString,
+            ),
+            'StopProfiling': grpc.unary_unary_rpc_method_handler(
+                    servicer.StopProfiling,
+                    request_deserializer=google_dot_protobuf_dot_empty__pb2.Empty.FromString,
+                    response_serializer=order__api__pb2.ProfilingSession.SerializeToString,
+            ),
+    }
+    generic_handler = grpc.method_handlers_generic_handler(
+            'my_api.v1.AdminService', rpc_method_handlers)
+    server.add_generic_rpc_handlers((generic_handler,))
+    server.add_registered_method_handlers('my_api.v1.AdminService', rpc_method_handlers)
+
+
+ # This class is part of an EXPERIMENTAL API.
+class AdminService(object):
+    """=======================================================
+    Service: AdminService
+    Operational controls for the server process that answers.
+    =======================================================
+    """
+
+    @staticmethod
+    def StartProfiling(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(
+            request,
+            target,
+            '/my_api.v1.AdminService/StartProfiling',
+            order__api__pb2.StartProfilingRequest.SerializeToString,
+            order__api__pb2.ProfilingSession.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
+    @staticmethod
+    def StopProfiling(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(
+            request,
+            target,
+            '/my_api.v1.AdminService/StopProfiling',
+            google_dot_protobuf_dot_empty__pb2.Empty.SerializeToString,
+            order__api__pb2.ProfilingSession.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
@@ -0,0 +1,58 @@
+"""
+Password hashing for the users table.
+
+Hashes are scrypt (hashlib, no extra dependencies), stored as
+
+    scrypt$<n>$<r>$<p>$<salt>$<hash>
+
+with salt and hash base64-encoded, so the cost parameters travel with each
+hash and can be raised later without breaking stored passwords.
+"""
+import base64
+import functools
+import hashlib
+import hmac
+import os
+
+SCRYPT_N = 2 ** 14  # CPU/memory cost; ~16 MB and tens of ms per hash
+SCRYPT_R = 8
+SCRYPT_P = 1
+SALT_BYTES = 16
+HASH_BYTES = 32
+SCHEME = "scrypt"
+
+
+def _scrypt(password, salt, n, r, p):
+    return hashlib.scrypt(password.encode("utf-8"), salt=salt, n=n, r=r, p=p,
+                          maxmem=2 * 128 * r * n, dklen=HASH_BYTES)
+
+
+def hash_password(password, n=SCRYPT_N, r=SCRYPT_R, p=SCRYPT_P):
+    salt = os.urandom(SALT_BYTES)
+    digest = _scrypt(password, salt, n, r, p)
+    return "$".join((SCHEME, str(n), str(r), str(p),
+                     base64.b64encode(salt).decode("ascii"), base64.b64encode(digest).decode("ascii")))
+
+
+def is_password_hash(value):
+    """True if `value` is a hash from hash_password() rather than a legacy plaintext password."""
+    return isinstance(value, str) and value.startswith(SCHEME + "$") and value.count("$") == 5
+
+
+def verify_password(password, encoded):
+    """Checks `password` against a stored hash in constant time; False for anything malformed."""
+    if not is_password_hash(encoded):
+        return False
+    try:
+        _, n, r, p, salt, digest = encoded.split("$")
+        expected = base64.b64decode(digest)
+        actual = _scrypt(password, base64.b64decode(salt), int(n), int(r), int(p))
+    except ValueError:
+        return False
+    return hmac.compare_digest(actual, expected)
+
+
+@functools.lru_cache(maxsize=1)
+def dummy_hash():
+    """A hash of a random password, verified for unknown users so they take as long as known ones."""
+    return hash_password(base64.b64encode(os.urandom(SALT_BYTES)).decode("ascii"))
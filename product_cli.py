@@ -1,5 +1,7 @@
 import grpc
 import argparse
+import itertools
+import os
 import sys
 import json
 from google.protobuf import empty_pb2
@@ -10,13 +12,17 @@ import order_api_pb2_grpc
 
 class ProductClient:
     """A resilient client for the ProductService gRPC API with error handling."""
-    def __init__(self, target='localhost:50051'): 
+    def __init__(self, target='localhost:50051', token=None): 
         self.stub = None
+        # Admin commands (add, update, delete, import_json) need a token from `login`.
+        self.metadata = [('authorization', f'Bearer {token}')] if token else []
         try:
             self.channel = grpc.insecure_channel(target)
             
             grpc.channel_ready_future(self.channel).result(timeout=1)
             self.stub = order_api_pb2_grpc.ProductServiceStub(self.channel)
+            self.auth_stub = order_api_pb2_grpc.AuthServiceStub(self.channel)
+            self.admin_stub = order_api_pb2_grpc.AdminServiceStub(self.channel)
             print(f"🔌 Connected to gRPC server at {target}")
         except grpc.FutureTimeoutError:
             print(f"❌ Error: Could not connect to the server at {target}.", file=sys.stderr)
@@ -32,13 +38,24 @@ class ProductClient:
             print(f"❌ RPC Error: {e.code()} - {e.details()}", file=sys.stderr)
             return None
 
+    def login(self, args):
+        print(f"--- Calling Login for user: {args.username} ---")
+        def rpc():
+            request = order_api_pb2.LoginRequest(username=args.username, password=args.password)
+            return self.auth_stub.Login(request)
+
+        response = self._execute_rpc(rpc)
+        if response:
+            print(f"✅ Logged in as '{response.role}'. Use the token with --token, or:")
+            print(f"export ORDER_API_TOKEN={response.token}")
+
     def add_product(self, args):
         print("--- Calling CreateProduct ---")
         def rpc():
             request = order_api_pb2.CreateProductRequest(
                 name=args.name, description=args.description, price=args.price
             )
-            return self.stub.CreateProduct(request)
+            return self.stub.CreateProduct(request, metadata=self.metadata)
         
         response = self._execute_rpc(rpc)
         if response:
@@ -48,15 +65,22 @@ class ProductClient:
     def list_products(self, args):
         print("--- Calling ListProducts ---")
         def rpc():
-            return list(self.stub.ListProducts(empty_pb2.Empty()))
+            request = order_api_pb2.ListProductsRequest(page_size=args.page_size, page_token=args.page_token)
+            call = self.stub.ListProductsBatched(request)
+            products = [product for batch in call for product in batch.products]
+            next_token = dict(call.trailing_metadata() or ()).get('x-next-page-token', '')
+            return products, next_token
 
         response = self._execute_rpc(rpc)
         if response is not None:
-            print("📦 All products in database:")
-            if not response:
+            products, next_token = response
+            print("📦 Products in database:" if args.page_size else "📦 All products in database:")
+            if not products:
                 print("   (No products found)")
-            for product in response:
+            for product in products:
                 print(f"  - ID: {product.product_id}, Name: {product.name}, Price: {product.price:.2f}")
+            if next_token:
+                print(f"➡️  More products available. Next page: --page-token {next_token}")
 
     def update_product(self, args):
         print(f"--- Calling UpdateProduct for ID: {args.id} ---")
@@ -67,7 +91,7 @@ class ProductClient:
                 description=args.description,
                 price=args.price
             )
-            return self.stub.UpdateProduct(request)
+            return self.stub.UpdateProduct(request, metadata=self.metadata)
         
         response = self._execute_rpc(rpc)
         if response:
@@ -78,7 +102,7 @@ class ProductClient:
         print(f"--- Calling DeleteProduct for ID: {args.id} ---")
         def rpc():
             request = order_api_pb2.DeleteProductRequest(product_id=args.id)
-            return self.stub.DeleteProduct(request)
+            return self.stub.DeleteProduct(request, metadata=self.metadata)
 
         response = self._execute_rpc(rpc)
         if response:
@@ -96,45 +120,82 @@ class ProductClient:
         if response:
             print(f"📊 Total products in DB: {response.count}")
 
-    def export_products(self, args):
-        print("--- Calling ExportProducts ---")
+    def profile(self, args):
+        print("--- Calling StopProfiling ---" if args.stop else "--- Calling StartProfiling ---")
         def rpc():
-            return self.stub.ExportProducts(empty_pb2.Empty())
+            if args.stop:
+                return self.admin_stub.StopProfiling(empty_pb2.Empty(), metadata=self.metadata)
+            request = order_api_pb2.StartProfilingRequest(
+                seconds=args.seconds, max_requests=args.max_requests, methods=args.method or []
+            )
+            return self.admin_stub.StartProfiling(request, metadata=self.metadata)
 
         response = self._execute_rpc(rpc)
         if response:
-            filename = "products_export.json"
-            with open(filename, "w", encoding="utf-8") as f:
-                f.write(response.json_data)
-            print(f"✅ All products exported to {filename}")
+            state = "running" if response.active else "finished"
+            print(f"🔬 Profiling {state} on server pid {response.pid}: {response.requests} requests, "
+                  f"{response.samples} samples")
+            print(f"   Collapsed stacks: {response.output_dir} (on the server)")
+
+    def export_products(self, args):
+        print("--- Calling ExportProductsStream ---")
+        def rpc():
+            # Write chunks as they arrive; only move the file into place once the stream completed.
+            tmp_path = f"{args.output}.part"
+            records = 0
+            try:
+                with open(tmp_path, "wb") as f:
+                    for chunk in self.stub.ExportProductsStream(empty_pb2.Empty()):
+                        f.write(chunk.ndjson)
+                        records += chunk.records
+            except grpc.RpcError:
+                os.remove(tmp_path)
+                raise
+            os.replace(tmp_path, args.output)
+            return records
+
+        records = self._execute_rpc(rpc)
+        if records is not None:
+            print(f"✅ Exported {records} products to {args.output} (one JSON object per line)")
     
     def import_from_json(self, args):
         print(f"--- Importing products from {args.file} ---")
         try:
             with open(args.file, 'r', encoding='utf-8') as f:
                 products_to_import = json.load(f)
-            
-            count = 0
-            for product in products_to_import:
-                
-                if 'name' not in product or 'price' not in product:
-                    print(f"  -> Skipping product (missing name or price): {product}")
-                    continue
-                    
-                def rpc(p=product):
-                    request = order_api_pb2.CreateProductRequest(
-                        name=p.get('name'),
-                        description=p.get('description', ''),
-                        price=p.get('price')
+
+            sent_positions = []  # file position of every product actually streamed
+
+            def product_requests():
+                for position, product in enumerate(products_to_import):
+                    if 'name' not in product or 'price' not in product:
+                        print(f"  -> Skipping product (missing name or price): {product}")
+                        continue
+                    sent_positions.append(position)
+                    yield order_api_pb2.CreateProductRequest(
+                        name=product.get('name'),
+                        description=product.get('description', ''),
+                        price=product.get('price')
                     )
-                    return self.stub.CreateProduct(request)
 
-                response = self._execute_rpc(rpc)
-                if response:
-                    print(f"  -> Imported '{response.name}'")
-                    count += 1
-            
-            print(f"\n✅ Successfully imported {count} products.")
+            def import_requests(batch_size=1000):
+                products = product_requests()
+                while True:
+                    batch = list(itertools.islice(products, batch_size))
+                    if not batch:
+                        return
+                    yield order_api_pb2.ImportProductsRequest(products=batch)
+
+            def rpc():
+                return self.stub.ImportProducts(import_requests(), metadata=self.metadata)
+
+            response = self._execute_rpc(rpc)
+            if response:
+                for error in response.errors:
+                    print(f"  -> Failed product #{sent_positions[error.index]} in file: {error.message}")
+                if response.failed > len(response.errors):
+                    print(f"  -> ... and {response.failed - len(response.errors)} more failures")
+                print(f"\n✅ Successfully imported {response.imported} products ({response.failed} failed).")
 
         except FileNotFoundError:
             print(f"❌ Error: File not found at {args.file}", file=sys.stderr)
@@ -146,8 +207,15 @@ class ProductClient:
 
 def setup_parsers():
     parser = argparse.ArgumentParser(description="A CLI tool to manage Products via gRPC.")
+    parser.add_argument("--token", type=str, default=os.environ.get("ORDER_API_TOKEN"),
+                        help="JWT from `login` (default: $ORDER_API_TOKEN)")
     subparsers = parser.add_subparsers(dest='command', required=True, help="Available commands")
 
+    # Login command
+    parser_login = subparsers.add_parser('login', help="Log in and print a token for admin commands")
+    parser_login.add_argument("--username", type=str, required=True)
+    parser_login.add_argument("--password", type=str, required=True)
+
     # Add command
     parser_add = subparsers.add_parser('add', help="Add a new product")
     parser_add.add_argument("--name", type=str, required=True, help="Name of the product")
@@ -155,7 +223,9 @@ def setup_parsers():
     parser_add.add_argument("--description", type=str, default="", help="Description of the product")
 
     # List command
-    subparsers.add_parser('list', help="List all products")
+    parser_list = subparsers.add_parser('list', help="List products (all, or one page at a time)")
+    parser_list.add_argument("--page-size", type=int, default=0, help="Products per page (0 = all)")
+    parser_list.add_argument("--page-token", type=str, default="", help="Token printed by the previous page")
 
     # Update command
     parser_update = subparsers.add_parser('update', help="Update an existing product")
@@ -172,7 +242,17 @@ def setup_parsers():
     subparsers.add_parser('count', help="Count all products")
     
     # Export command
-    subparsers.add_parser('export', help="Export all products to products_export.json")
+    parser_export = subparsers.add_parser('export', help="Export all products as NDJSON")
+    parser_export.add_argument("--output", type=str, default="products_export.ndjson", help="Output file path")
+
+    # Profile command
+    parser_profile = subparsers.add_parser('profile', help="Profile the server's RPCs for a while (admin)")
+    parser_profile.add_argument("--seconds", type=float, default=0, help="Window length (0 = server default)")
+    parser_profile.add_argument("--max-requests", type=int, default=0, help="Stop after N requests (0 = no limit)")
+    parser_profile.add_argument("--method", action="append",
+                                help="Full method name to profile, e.g. /my_api.v1.OrderService/CreateOrder "
+                                     "(repeatable; default all)")
+    parser_profile.add_argument("--stop", action="store_true", help="End the running session now")
 
     # Import command
     parser_import = subparsers.add_parser('import_json', help="Import products from a JSON file")
@@ -183,7 +263,7 @@ def setup_parsers():
 def main():
     parser = setup_parsers()
     args = parser.parse_args()
-    client = ProductClient()
+    client = ProductClient(token=args.token)
     
     if not client.stub:
         print("Exiting due to connection failure.", file=sys.stderr)
@@ -191,6 +271,7 @@ def main():
 
     # Dictionary connect with command 
     command_functions = {
+        'login': client.login,
         'add': client.add_product,
         'list': client.list_products,
         'update': client.update_product,
@@ -198,6 +279,7 @@ def main():
         'count': client.count_products,
         'export': client.export_products,
         'import_json': client.import_from_json,
+        'profile': client.profile,
     }
 
     
@@ -0,0 +1,236 @@
+"""
+On-demand stack-sampling profiler for the Order API server.
+
+A session is started by an admin (AdminService.StartProfiling, or SIGUSR2
+for PROFILE_DEFAULT_SECONDS) and runs for a window of seconds and/or
+requests. While it runs, a sampler thread reads every thread's stack every
+`interval` seconds and attributes it to the RPC it belongs to: the
+interceptor marks the frame of each profiled call's behavior, so a stack
+containing that frame is that call's. This works for the thread-pool server
+and for grpc.aio, where the loop thread's stack runs through the current
+task's coroutine frames.
+
+When the session ends, one file per method is written, in the collapsed
+("folded") format flamegraph.pl and speedscope read:
+
+    profiles/20261016-091203-4711/my_api.v1.OrderService.CreateOrder.folded
+
+    server.py:CreateOrder;server.py:create_order;concurrent/futures/_base.py:result 42
+
+Outside a session the interceptor costs one hook call and attribute check per call.
+"""
+import functools
+import os
+import sys
+import threading
+import time
+from collections import Counter, defaultdict
+
+import grpc
+
+import handlers
+
+PROFILE_DIR = "profiles"
+PROFILE_DEFAULT_SECONDS = 30.0
+PROFILE_MAX_SECONDS = 600.0
+PROFILE_SAMPLE_INTERVAL = 0.005  # seconds between stack samples (~200 Hz)
+MAX_STACK_DEPTH = 128
+
+
+class ProfilerBusyError(Exception):
+    """Raised by Profiler.start() while another session is running."""
+
+
+class _Session:
+    def __init__(self, output_dir, deadline, max_requests, methods):
+        self.output_dir = output_dir
+        self.deadline = deadline
+        self.max_requests = max_requests
+        self.methods = frozenset(methods or ())
+        self.requests = 0
+        self.samples = 0
+        self.frames = {}  # marked behavior frame -> method, for calls in flight
+        self.stacks = defaultdict(Counter)  # method -> collapsed stack -> samples
+        self.stopped = threading.Event()
+        self.sampler = None
+
+    def wants(self, method):
+        if self.methods and method not in self.methods:
+            return False
+        return not self.max_requests or self.requests < self.max_requests
+
+    def exhausted(self):
+        return bool(self.max_requests) and self.requests >= self.max_requests and not self.frames
+
+
+@functools.lru_cache(maxsize=8192)
+def _frame_name(code):
+    filename = code.co_filename
+    for path in sorted(sys.path, key=len, reverse=True):
+        if path and filename.startswith(path + os.sep):
+            filename = filename[len(path) + 1:]
+            break
+    return f"{filename}:{code.co_name}"
+
+
+class Profiler:
+    """
+    Runs one profiling session at a time; safe to start and stop from any
+    thread (RPC handlers, signal handlers).
+    """
+
+    def __init__(self, output_dir=PROFILE_DIR, interval=PROFILE_SAMPLE_INTERVAL):
+        self.output_dir = output_dir
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._session = None
+        self._last = None
+
+    def start(self, seconds=0, max_requests=0, methods=None):
+        """Opens a session; returns its status() snapshot. Raises ProfilerBusyError if one is running."""
+        seconds = min(seconds or PROFILE_DEFAULT_SECONDS, PROFILE_MAX_SECONDS)
+        output_dir = os.path.join(self.output_dir, f"{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}")
+        with self._lock:
+            if self._session is not None:
+                raise ProfilerBusyError("A profiling session is already running.")
+            session = self._session = _Session(output_dir, time.monotonic() + seconds, max_requests, methods)
+            session.sampler = threading.Thread(target=self._sample, args=(session,), name="profiler-sampler",
+                                               daemon=True)
+        session.sampler.start()
+        return self._status(session, active=True)
+
+    def stop(self):
+        """Ends the running session (if any), waits for its output; returns the status() snapshot."""
+        session = self._session
+        if session is not None:
+            session.stopped.set()
+            session.sampler.join()  # the sampler writes the output as it exits
+        return self.status()
+
+    def status(self):
+        session = self._session
+        if session is not None:
+            return self._status(session, active=True)
+        if self._last is not None:
+            return self._status(self._last, active=False)
+        return {"active": False, "output_dir": "", "requests": 0, "samples": 0, "pid": os.getpid()}
+
+    @staticmethod
+    def _status(session, active):
+        return {"active": active, "output_dir": session.output_dir, "requests": session.requests,
+                "samples": session.samples, "pid": os.getpid()}
+
+    # --- Call tracking (from the interceptor) ---
+
+    def _enter(self, frame, method):
+        """Marks `frame` as running `method` if the current session profiles it; returns the session."""
+        session = self._session
+        if session is None:
+            return None
+        with self._lock:
+            if session is not self._session or not session.wants(method):
+                return None
+            session.requests += 1
+            session.frames[frame] = method
+        return session
+
+    def _exit(self, session, frame):
+        with self._lock:
+            session.frames.pop(frame, None)
+
+    # --- Sampling ---
+
+    def _sample(self, session):
+        me = threading.get_ident()
+        while not session.stopped.wait(self.interval):
+            if time.monotonic() >= session.deadline or session.exhausted():
+                break
+            with self._lock:
+                marked = dict(session.frames)
+            if not marked:
+                continue
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == me:
+                    continue
+                names = []
+                while frame is not None and len(names) < MAX_STACK_DEPTH:
+                    method = marked.get(frame)
+                    names.append(_frame_name(frame.f_code))
+                    if method is not None:
+                        # The marked frame is the wrapper itself; the stack starts at the servicer below it.
+                        session.stacks[method][";".join(reversed(names[:-1]))] += 1
+                        session.samples += 1
+                        break
+                    frame = frame.f_back
+        self._finished(session)
+
+    def _finished(self, session):
+        with self._lock:
+            self._session = None
+            self._last = session
+        self._write(session)
+
+    def _write(self, session):
+        os.makedirs(session.output_dir, exist_ok=True)
+        for method, stacks in session.stacks.items():
+            filename = method.strip("/").replace("/", ".") + ".folded"
+            with open(os.path.join(session.output_dir, filename), "w", encoding="utf-8") as f:
+                for stack, count in stacks.most_common():
+                    if stack:
+                        f.write(f"{stack} {count}\n")
+
+    # --- Interceptor support ---
+
+    def instrument(self, handler, method):
+        """Returns `handler` with its behavior wrapped to be profiled while a session wants `method`."""
+        def start(request_or_iterator, context, is_async):
+            if self._session is None:
+                return None, request_or_iterator
+            frame = sys._getframe(1)  # the wrapper running the behavior
+            session = self._enter(frame, method)
+            if session is None:
+                return None, request_or_iterator
+            return _ProfiledCall(self, session, frame), request_or_iterator
+
+        return handlers.wrap_handler(handler, start)
+
+
+class _ProfiledCall:
+    __slots__ = ("profiler", "session", "frame")
+
+    def __init__(self, profiler, session, frame):
+        self.profiler = profiler
+        self.session = session
+        self.frame = frame
+
+    def on_sent(self, response):
+        pass
+
+    def finish(self, context, error=None):
+        self.profiler._exit(self.session, self.frame)
+
+
+class ProfilingInterceptor(grpc.ServerInterceptor):
+    """Lets `profiler` attribute stack samples to the RPC they were taken in."""
+
+    def __init__(self, profiler):
+        self.profiler = profiler
+
+    def intercept_service(self, continuation, handler_call_details):
+        handler = continuation(handler_call_details)
+        if handler is None:
+            return None
+        return self.profiler.instrument(handler, handler_call_details.method)
+
+
+class AsyncProfilingInterceptor(grpc.aio.ServerInterceptor):
+    """grpc.aio counterpart of ProfilingInterceptor."""
+
+    def __init__(self, profiler):
+        self.profiler = profiler
+
+    async def intercept_service(self, continuation, handler_call_details):
+        handler = await continuation(handler_call_details)
+        if handler is None:
+            return None
+        return self.profiler.instrument(handler, handler_call_details.method)
@@ -1,245 +1,1631 @@
 import grpc
+import argparse
+import asyncio
 import sqlite3
-import uuid
 import json
+import base64
+import contextvars
+import hashlib
+import hmac
+import itertools
+import logging
+import math
+import multiprocessing
+import queue
+import re
+import signal
+import threading
+import time
+from collections import OrderedDict, namedtuple
 from concurrent import futures
-from contextlib import contextmanager
+from contextlib import closing, contextmanager
 from datetime import datetime, timedelta
 import jwt
 
 import order_api_pb2
+import handlers
+import ids
+import logs
+import metrics
 import order_api_pb2_grpc
+import passwords
+import profiling
+import tracing
 from google.protobuf import empty_pb2
 
+logger = logging.getLogger("order_api")
+
 # --- Configuration ---
 DATABASE_NAME = "orders.db"
 JWT_SECRET = "your-super-secret-key-that-should-be-in-an-env-variable"
+MAX_WORKERS = 10  # gRPC worker threads
+DB_POOL_SIZE = MAX_WORKERS  # one connection per worker thread, so no RPC waits on the pool
+DB_POOL_TIMEOUT = 5.0  # seconds to wait for a free connection before failing the call
+DB_POOL_HEALTHCHECK_INTERVAL = 30.0  # re-validate connections idle for longer than this
+WRITE_BATCH_MAX = 64  # max queued mutations group-committed in one transaction
+PAGE_TOKEN_SECRET = JWT_SECRET  # signs ListProducts page tokens
+MAX_PAGE_SIZE = 1000
+NEXT_PAGE_TOKEN_KEY = "x-next-page-token"  # trailing metadata key carrying the next page token
+DEFAULT_BATCH_SIZE = 500  # products per ProductBatch when the client doesn't say
+MAX_BATCH_SIZE = 5000
+MAX_BATCH_BYTES = 1024 * 1024  # keep every ProductBatch well under gRPC's 4 MB message limit
+EXPORT_CHUNK_BYTES = 256 * 1024  # target size of each streamed ExportChunk
+IMPORT_BATCH_SIZE = 5000  # products inserted per write transaction by ImportProducts
+MAX_IMPORT_ERRORS = 1000  # row errors listed in an ImportProductsResponse
+SQLITE_MAX_PARAMS = 900  # stay under SQLite's bound-parameter limit in IN (...) lists
+MAX_BATCH_GET_IDS = 1000  # product IDs per BatchGetProducts request
+MAX_ORDER_ITEMS = SQLITE_MAX_PARAMS // 3  # items per order; pricing binds 3 parameters per item
+PRODUCT_CACHE_MAX_ENTRIES = 10000
+PRODUCT_CACHE_MAX_BYTES = 16 * 1024 * 1024  # approximate; see ProductCache._entry_size
+PRODUCT_CACHE_TTL = 60.0  # seconds; also bounds staleness across server processes
+SEARCH_CACHE_MAX_ENTRIES = 1024  # cached SearchProducts results (each at most 100 rows)
+SEARCH_CACHE_TTL = 30.0  # seconds; bounds staleness from other server processes' writes
+IDEMPOTENCY_CACHE_MAX_ENTRIES = 10000  # recent (user_id, idempotency_key) -> order_id
+MAX_IDEMPOTENCY_KEY_LENGTH = 255
+TOKEN_CACHE_MAX_ENTRIES = 10000  # verified JWTs remembered by hash
+TOKEN_CACHE_MAX_TTL = 300.0  # seconds; cap for tokens without an exp claim
+LOGIN_HASH_WORKERS = 2  # processes running password hashing
+LOGIN_MAX_CONCURRENT = 4  # logins that may wait on a hash at once; the rest fail fast
+LOGIN_HASH_TIMEOUT = 10.0  # seconds
+LOGIN_RATE_PER_SECOND = 1.0  # sustained login attempts per client address
+LOGIN_RATE_BURST = 10
+# Per username across all clients: loose enough that one client can't lock a user out,
+# it only caps guessing spread over many addresses.
+LOGIN_USER_RATE_PER_SECOND = 20.0
+LOGIN_USER_RATE_BURST = 100
+LOGIN_RATE_MAX_KEYS = 10000  # rate-limit buckets kept (least recently used are dropped)
+SERVER_ADDRESS = '0.0.0.0:50051'
+AIO_PAGE_ROWS = 1000  # rows fetched per executor call when an aio stream reads the database
+LOG_LEVEL = "INFO"
+TRACE_SAMPLE_RATE = 0.0  # calls without a sampled traceparent that start a trace of their own
+
+# SQLite storage profile, applied to every connection the server opens.
+# WAL lets ListProducts/SearchProducts readers run while the writer commits;
+# synchronous=NORMAL is durable against application crashes under WAL and
+# only fsyncs on checkpoint.
+SQLITE_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "busy_timeout": 5000,  # ms
+    "mmap_size": 256 * 1024 * 1024,  # bytes
+    "cache_size": -64000,  # negative = KiB, i.e. ~64 MB per connection
+    "temp_store": "MEMORY",
+}
+
+# --- Logging ---
+# Fraction of requests per RPC whose INFO/DEBUG records are logged; warnings
+# and errors are always logged. RPCs missing from the table use
+# DEFAULT_LOG_SAMPLE_RATE.
+LOG_SAMPLE_RATES = {
+    "/my_api.v1.ProductService/GetProduct": 0.1,
+    "/my_api.v1.ProductService/BatchGetProducts": 0.1,
+    "/my_api.v1.ProductService/ListProducts": 0.1,
+    "/my_api.v1.ProductService/SearchProducts": 0.1,
+    "/my_api.v1.ProductService/ListProductsBatched": 0.1,
+    "/my_api.v1.ProductService/SearchProductsBatched": 0.1,
+    "/my_api.v1.ProductService/CountProducts": 0.1,
+    "/my_api.v1.OrderService/GetOrder": 0.1,
+    "/my_api.v1.OrderService/CountOrders": 0.1,
+}
+DEFAULT_LOG_SAMPLE_RATE = 1.0
+
+# --- Authentication ---
+# Least role allowed to call each RPC: "guest" is anyone, "user" any logged-in
+# caller. RPCs missing from the table need DEFAULT_METHOD_POLICY, so a new RPC
+# stays closed until it is listed here.
+METHOD_POLICIES = {
+    "/my_api.v1.AuthService/Login": "guest",
+
+    "/my_api.v1.ProductService/CreateProduct": "admin",
+    "/my_api.v1.ProductService/ImportProducts": "admin",
+    "/my_api.v1.ProductService/UpdateProduct": "admin",
+    "/my_api.v1.ProductService/DeleteProduct": "admin",
+    "/my_api.v1.ProductService/GetProduct": "guest",
+    "/my_api.v1.ProductService/BatchGetProducts": "guest",
+    "/my_api.v1.ProductService/ListProducts": "guest",
+    "/my_api.v1.ProductService/SearchProducts": "guest",
+    "/my_api.v1.ProductService/ListProductsBatched": "guest",
+    "/my_api.v1.ProductService/SearchProductsBatched": "guest",
+    "/my_api.v1.ProductService/CountProducts": "guest",
+    "/my_api.v1.ProductService/ExportProducts": "guest",
+    "/my_api.v1.ProductService/ExportProductsStream": "guest",
+
+    "/my_api.v1.OrderService/CreateOrder": "user",
+    "/my_api.v1.OrderService/UpdateOrderStatus": "admin",
+    "/my_api.v1.OrderService/GetOrder": "guest",
+    "/my_api.v1.OrderService/CountOrders": "guest",
+    "/my_api.v1.OrderService/ExportOrders": "guest",
+    "/my_api.v1.OrderService/ExportOrdersStream": "guest",
+
+    "/my_api.v1.AdminService/StartProfiling": "admin",
+    "/my_api.v1.AdminService/StopProfiling": "admin",
+}
+DEFAULT_METHOD_POLICY = "admin"
+ROLE_LEVELS = {"guest": 0, "user": 1, "admin": 2}  # token roles not listed count as "user"
+
+AuthInfo = namedtuple("AuthInfo", ["role", "user_id", "error"])  # error: UNAUTHENTICATED details, or None
+GUEST = AuthInfo("guest", None, None)
 
-def get_role_from_context(context, secret):
+_current_auth = contextvars.ContextVar("current_auth", default=None)
+
+
+class TokenCache:
     """
-    Helper "Guest": Checking for Token in metadata and ruturn to 'role'
+    Bounded LRU of verified JWTs, keyed by the SHA-256 of the token so raw
+    tokens are never held. An entry lives until the token's exp claim (or
+    TOKEN_CACHE_MAX_TTL if it has none); after that the token is decoded
+    again, which reports the expiry.
     """
-    metadata = dict(context.invocation_metadata())
-    auth_header = metadata.get('authorization', None)
-    
+
+    def __init__(self, max_entries=TOKEN_CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # token hash -> (expires_at, AuthInfo)
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "expired": 0, "evictions": 0}
+
+    @staticmethod
+    def _key(token):
+        return hashlib.sha256(token.encode("utf-8")).digest()
+
+    def get(self, token):
+        key = self._key(token)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._stats["misses"] += 1
+                return None
+            expires_at, auth = entry
+            if time.time() >= expires_at:
+                del self._entries[key]
+                self._stats["expired"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self._stats["hits"] += 1
+            return auth
+
+    def put(self, token, auth, exp=None):
+        expires_at = time.time() + TOKEN_CACHE_MAX_TTL
+        if exp is not None:
+            expires_at = min(expires_at, exp)
+        key = self._key(token)
+        with self._lock:
+            self._entries[key] = (expires_at, auth)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._stats["evictions"] += 1
+
+    def stats(self):
+        with self._lock:
+            snapshot = dict(self._stats)
+            snapshot["entries"] = len(self._entries)
+        return snapshot
+
+
+def authenticate(metadata, secret=JWT_SECRET, cache=None):
+    """
+    Resolves the caller from invocation metadata. No or malformed
+    credentials make the caller a guest; an expired token is an error.
+    """
+    auth_header = next((value for key, value in metadata if key == 'authorization'), None)
     if not auth_header:
-        
-        return "guest" # "guest" Role
+        return GUEST
+    token_type, _, token = auth_header.partition(' ')
+    if token_type.lower() != 'bearer' or not token:
+        return GUEST
 
+    if cache is not None:
+        auth = cache.get(token)
+        if auth is not None:
+            return auth
     try:
-        token_type, token = auth_header.split(' ')
-        if token_type.lower() != 'bearer':
-            return "guest" 
-            
         payload = jwt.decode(token, secret, algorithms=["HS256"])
-        return payload.get('role', "guest") # Return role (Example "admin")
-        
     except jwt.ExpiredSignatureError:
-        context.set_code(grpc.StatusCode.UNAUTHENTICATED)
-        context.set_details("Token has expired.")
-        return None # Expired Token
+        return AuthInfo(None, None, "Token has expired.")
     except Exception as e:
-        print(f"Token validation error: {e}")
-        return "guest" # 
+        logger.info("Token rejected", extra={"error": str(e)})
+        return GUEST
 
-class Database:
-    """Manages all database operations for the API."""
-    def __init__(self, db_name):
+    auth = AuthInfo(payload.get('role', "guest"), payload.get('user_id'), None)
+    if cache is not None:
+        cache.put(token, auth, payload.get('exp'))
+    return auth
+
+
+def current_auth():
+    """The AuthInfo the auth interceptor resolved for the running call, or None outside one."""
+    return _current_auth.get()
+
+
+def _with_context(handler, enter):
+    """Returns `handler` with each behavior wrapped to call enter() (which sets context variables) first."""
+    # Called inside the behavior, not in intercept_service: the sync server
+    # looks handlers up on its polling thread and runs them on a pool thread,
+    # and grpc.aio runs them in their own task. Every call sets its own
+    # values, so a pool thread never sees the previous call's.
+    def start(request_or_iterator, context, is_async):
+        enter()
+        return None, request_or_iterator
+
+    return handlers.wrap_handler(handler, start)
+
+
+def _rejection_handler(handler, code, details, is_async):
+    """A handler shaped like `handler` that aborts the call without running the servicer."""
+    if is_async:
+        async def reject(request_or_iterator, context):
+            await context.abort(code, details)
+    else:
+        def reject(request_or_iterator, context):
+            context.abort(code, details)
+    make_handler = {
+        (False, False): grpc.unary_unary_rpc_method_handler,
+        (False, True): grpc.unary_stream_rpc_method_handler,
+        (True, False): grpc.stream_unary_rpc_method_handler,
+        (True, True): grpc.stream_stream_rpc_method_handler,
+    }[(handler.request_streaming, handler.response_streaming)]
+    return make_handler(reject, request_deserializer=handler.request_deserializer,
+                        response_serializer=handler.response_serializer)
+
+
+class _AuthPolicy:
+    """Shared policy check behind AuthInterceptor and AsyncAuthInterceptor."""
+
+    def __init__(self, policies=None, secret=JWT_SECRET, cache=None):
+        self.policies = METHOD_POLICIES if policies is None else policies
+        self.secret = secret
+        self.cache = cache if cache is not None else TokenCache()
+
+    def _apply(self, handler, handler_call_details, is_async):
+        required = self.policies.get(handler_call_details.method, DEFAULT_METHOD_POLICY)
+        if required == "guest":
+            return handler  # anyone may call it, so don't even look at the token
+
+        auth = authenticate(handler_call_details.invocation_metadata, self.secret, self.cache)
+        if auth.error:
+            return _rejection_handler(handler, grpc.StatusCode.UNAUTHENTICATED, auth.error, is_async)
+        if ROLE_LEVELS.get(auth.role, ROLE_LEVELS["user"]) < ROLE_LEVELS[required]:
+            return _rejection_handler(handler, grpc.StatusCode.PERMISSION_DENIED,
+                                      f"Permission denied: '{required}' role required.", is_async)
+        return _with_context(handler, lambda: _current_auth.set(auth))
+
+
+class AuthInterceptor(_AuthPolicy, grpc.ServerInterceptor):
+    """
+    Enforces METHOD_POLICIES. Calls that need a role are authenticated once,
+    from their metadata, and rejected before the servicer runs (so before any
+    database work) if the caller falls short. Allowed callers are exposed to
+    the servicer through current_auth(). Repeat tokens are served from the
+    TokenCache instead of being decoded and HMAC-verified again.
+    """
+
+    def intercept_service(self, continuation, handler_call_details):
+        handler = continuation(handler_call_details)
+        if handler is None:
+            return None
+        return self._apply(handler, handler_call_details, is_async=False)
+
+
+class AsyncAuthInterceptor(_AuthPolicy, grpc.aio.ServerInterceptor):
+    """grpc.aio counterpart of AuthInterceptor."""
+
+    async def intercept_service(self, continuation, handler_call_details):
+        handler = await continuation(handler_call_details)
+        if handler is None:
+            return None
+        return self._apply(handler, handler_call_details, is_async=True)
+
+
+class _RequestLogPolicy:
+    """Shared request-context setup behind RequestLogInterceptor and AsyncRequestLogInterceptor."""
+
+    def __init__(self, sample_rates=None, default_rate=DEFAULT_LOG_SAMPLE_RATE):
+        self.sample_rates = LOG_SAMPLE_RATES if sample_rates is None else sample_rates
+        self.default_rate = default_rate
+
+    def _apply(self, handler, handler_call_details):
+        method = handler_call_details.method
+        metadata = handler_call_details.invocation_metadata
+        rate = self.sample_rates.get(method, self.default_rate)
+        return _with_context(handler, lambda: logs.start_request(method, metadata, rate))
+
+
+class RequestLogInterceptor(_RequestLogPolicy, grpc.ServerInterceptor):
+    """
+    Gives every call a request context for logging: its x-request-id (or a
+    new ID) and method are added to each record it logs, and its INFO/DEBUG
+    records are sampled at LOG_SAMPLE_RATES.
+    """
+
+    def intercept_service(self, continuation, handler_call_details):
+        handler = continuation(handler_call_details)
+        if handler is None:
+            return None
+        return self._apply(handler, handler_call_details)
+
+
+class AsyncRequestLogInterceptor(_RequestLogPolicy, grpc.aio.ServerInterceptor):
+    """grpc.aio counterpart of RequestLogInterceptor."""
+
+    async def intercept_service(self, continuation, handler_call_details):
+        handler = await continuation(handler_call_details)
+        if handler is None:
+            return None
+        return self._apply(handler, handler_call_details)
+
+
+class LoginBusyError(Exception):
+    """Raised when LOGIN_MAX_CONCURRENT password checks are already in flight."""
+
+
+class PasswordVerifier:
+    """
+    Runs password verification on a small dedicated process pool, so a burst
+    of logins burns those cores instead of the server's GIL. At most
+    max_concurrent callers may wait on it at once; past that, submit() fails
+    fast with LoginBusyError instead of parking more gRPC worker threads.
+    """
+
+    def __init__(self, workers=LOGIN_HASH_WORKERS, max_concurrent=LOGIN_MAX_CONCURRENT):
+        # spawn: gRPC's threads don't survive fork().
+        self._pool = futures.ProcessPoolExecutor(max_workers=workers,
+                                                 mp_context=multiprocessing.get_context("spawn"))
+        self._slots = threading.BoundedSemaphore(max_concurrent)
+        passwords.dummy_hash()  # computed now, not during the first unknown-user login
+
+    def submit(self, password, encoded):
+        if not self._slots.acquire(blocking=False):
+            raise LoginBusyError()
+        try:
+            future = self._pool.submit(passwords.verify_password, password, encoded)
+        except BaseException:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        return future
+
+    def verify(self, password, encoded, timeout=LOGIN_HASH_TIMEOUT):
+        return self.submit(password, encoded).result(timeout)
+
+    def close(self):
+        self._pool.shutdown(wait=True)
+
+
+class LoginRateLimiter:
+    """
+    Token buckets of login attempts, kept in a bounded LRU: a tight one per
+    client address, and a much looser one per username (user_rate) that a
+    single client can't drain to lock that user out.
+    """
+
+    def __init__(self, rate=LOGIN_RATE_PER_SECOND, burst=LOGIN_RATE_BURST, user_rate=LOGIN_USER_RATE_PER_SECOND,
+                 user_burst=LOGIN_USER_RATE_BURST, max_keys=LOGIN_RATE_MAX_KEYS):
+        self.rate = rate
+        self.burst = burst
+        self.user_rate = user_rate
+        self.user_burst = user_burst
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()  # key -> [tokens, last refill]
+        self._lock = threading.Lock()
+
+    def _bucket(self, key, now, rate, burst):
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = [float(burst), now]
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        else:
+            bucket[0] = min(burst, bucket[0] + (now - bucket[1]) * rate)
+            bucket[1] = now
+            self._buckets.move_to_end(key)
+        return bucket
+
+    def allow(self, peer, username):
+        """Spends one attempt from the peer's and the username's buckets, or none if either is empty."""
+        now = time.monotonic()
+        with self._lock:
+            buckets = [self._bucket(("peer", peer), now, self.rate, self.burst),
+                       self._bucket(("user", username), now, self.user_rate, self.user_burst)]
+            if any(tokens < 1 for tokens, _ in buckets):
+                return False
+            for bucket in buckets:
+                bucket[0] -= 1
+            return True
+
+
+def _peer_host(context):
+    """The client address of a call without its port, e.g. 'ipv4:127.0.0.1'."""
+    return context.peer().rsplit(":", 1)[0]
+
+
+def _login_refusal(rate_limiter, request, context):
+    """Returns why a login attempt is refused before any hashing, or None to go ahead."""
+    if not rate_limiter.allow(_peer_host(context), request.username):
+        return "Too many login attempts; try again later."
+    return None
+
+
+def _b64encode(data):
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode("ascii")
+
+
+def _b64decode(text):
+    return base64.urlsafe_b64decode(text + "=" * (-len(text) % 4))
+
+
+def encode_page_token(last_product_id):
+    """Builds an opaque, HMAC-signed cursor pointing just past last_product_id."""
+    payload = _b64encode(json.dumps({"after": last_product_id}).encode("utf-8"))
+    signature = hmac.new(PAGE_TOKEN_SECRET.encode("utf-8"), payload.encode("ascii"), hashlib.sha256).digest()
+    return f"{payload}.{_b64encode(signature[:16])}"
+
+
+def decode_page_token(token):
+    """Returns the product_id a page token points past; raises ValueError if it was tampered with."""
+    try:
+        payload, signature = token.split(".")
+        expected = hmac.new(PAGE_TOKEN_SECRET.encode("utf-8"), payload.encode("ascii"), hashlib.sha256).digest()[:16]
+        if not hmac.compare_digest(expected, _b64decode(signature)):
+            raise ValueError("bad signature")
+        after = json.loads(_b64decode(payload))["after"]
+    except (ValueError, KeyError, TypeError, UnicodeError) as e:
+        raise ValueError(f"Invalid page token: {e}") from None
+    if not isinstance(after, str):
+        raise ValueError("Invalid page token: malformed cursor")
+    return after
+
+
+def _fts_match_expression(search_query):
+    """
+    Turns free text into an FTS5 query: every word must match as a prefix,
+    e.g. 'gaming lap' -> '"gaming"* "lap"*'. Returns '' if there are no words.
+    """
+    terms = re.findall(r"\w+", search_query)
+    return " ".join(f'"{term}"*' for term in terms)
+
+
+def _apply_pragmas(conn, pragmas):
+    for name, value in pragmas.items():
+        conn.execute(f"PRAGMA {name} = {value}").fetchall()
+
+
+class PoolTimeoutError(Exception):
+    """Raised when no pooled connection becomes free within the pool timeout."""
+
+
+class UnknownProductsError(ValueError):
+    """Raised when an order refers to products that don't exist; nothing was written."""
+
+    def __init__(self, product_ids):
+        self.product_ids = product_ids
+        super().__init__(f"Unknown product_id(s): {', '.join(product_ids)}")
+
+
+class ConnectionPool:
+    """
+    A bounded pool of SQLite connections shared by the gRPC worker threads.
+
+    Connections are thread-affine while checked out: a thread that already
+    holds one gets the same connection back, so nested Database calls (e.g.
+    update_product -> get_product) never wait on the pool.
+    """
+    def __init__(self, db_name, size=DB_POOL_SIZE, timeout=DB_POOL_TIMEOUT,
+                 healthcheck_interval=DB_POOL_HEALTHCHECK_INTERVAL, pragmas=None):
+        if size < 1:
+            raise ValueError("Pool size must be at least 1.")
         self.db_name = db_name
-        self._init_db()
+        self.pragmas = pragmas or {}
+        self.size = size
+        self.timeout = timeout
+        self.healthcheck_interval = healthcheck_interval
+        self._idle = queue.LifoQueue()  # (conn, last_used); LIFO keeps hot connections warm
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._created = 0
+        self._closed = False
+        self._stats = {
+            "checkouts": 0,
+            "waits": 0,
+            "wait_seconds_total": 0.0,
+            "wait_seconds_max": 0.0,
+            "timeouts": 0,
+            "recycled": 0,
+        }
 
-    def _init_db(self):
-        
-        with self._get_connection() as conn:
-            cursor = conn.cursor()
-            cursor.execute("""
-            CREATE TABLE IF NOT EXISTS products (
-                product_id TEXT PRIMARY KEY, name TEXT NOT NULL,
-                description TEXT, price REAL NOT NULL
-            )""")
-            cursor.execute("""
-            CREATE TABLE IF NOT EXISTS orders (
-                order_id TEXT PRIMARY KEY, user_id TEXT NOT NULL,
-                status INTEGER NOT NULL, total_amount REAL NOT NULL
-            )""")
-            cursor.execute("""
-            CREATE TABLE IF NOT EXISTS order_items (
-                item_id INTEGER PRIMARY KEY AUTOINCREMENT, order_id TEXT NOT NULL,
-                product_id TEXT NOT NULL, quantity INTEGER NOT NULL, price_per_item REAL NOT NULL,
-                FOREIGN KEY (order_id) REFERENCES orders (order_id)
-            )""")
-            cursor.execute("""
-            CREATE TABLE IF NOT EXISTS users (
-                user_id TEXT PRIMARY KEY, username TEXT UNIQUE NOT NULL,
-                password_hash TEXT NOT NULL, role TEXT NOT NULL
-            )""")
-            cursor.execute("SELECT * FROM users WHERE username='admin'")
-            if not cursor.fetchone():
-                admin_id = "user-" + str(uuid.uuid4())[:8]
-                conn.execute("INSERT INTO users VALUES (?, ?, ?, ?)", (admin_id, 'admin', 'admin123', 'admin'))
-                conn.commit()
+    def _connect(self):
+        conn = sqlite3.connect(self.db_name, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        _apply_pragmas(conn, self.pragmas)
+        return conn
+
+    def _is_healthy(self, conn):
+        try:
+            conn.execute("SELECT 1").fetchone()
+            return True
+        except sqlite3.Error:
+            return False
+
+    def _checkout(self):
+        if self._closed:
+            raise PoolTimeoutError("Connection pool is closed.")
+        try:
+            conn, last_used = self._idle.get_nowait()
+        except queue.Empty:
+            conn = None
+            with self._lock:
+                can_create = self._created < self.size
+                if can_create:
+                    self._created += 1
+            if can_create:
+                try:
+                    conn, last_used = self._connect(), time.monotonic()
+                except Exception:
+                    with self._lock:
+                        self._created -= 1
+                    raise
+            else:
+                started = time.monotonic()
+                try:
+                    conn, last_used = self._idle.get(timeout=self.timeout)
+                except queue.Empty:
+                    with self._lock:
+                        self._stats["timeouts"] += 1
+                    raise PoolTimeoutError(
+                        f"No database connection available after {self.timeout}s "
+                        f"(pool size {self.size})."
+                    )
+                waited = time.monotonic() - started
+                with self._lock:
+                    self._stats["waits"] += 1
+                    self._stats["wait_seconds_total"] += waited
+                    self._stats["wait_seconds_max"] = max(self._stats["wait_seconds_max"], waited)
+                metrics.DB_POOL_WAIT_SECONDS.observe(value=waited)
+
+        if time.monotonic() - last_used > self.healthcheck_interval and not self._is_healthy(conn):
+            try:
+                conn.close()
+            except sqlite3.Error:
+                pass
+            conn = self._connect()
+            with self._lock:
+                self._stats["recycled"] += 1
+        with self._lock:
+            self._stats["checkouts"] += 1
+        return conn
+
+    def _checkin(self, conn):
+        try:
+            if conn.in_transaction:
+                conn.rollback()  # never hand a half-finished transaction to the next caller
+        except sqlite3.Error:
+            try:
+                conn.close()
+            except sqlite3.Error:
+                pass
+            with self._lock:
+                self._created -= 1
+            return
+        self._idle.put((conn, time.monotonic()))
 
     @contextmanager
-    def _get_connection(self):
-        
-        conn = sqlite3.connect(self.db_name)
-        conn.row_factory = sqlite3.Row
+    def connection(self):
+        held = getattr(self._local, "conn", None)
+        if held is not None:
+            yield held
+            return
+        conn = self._checkout()
+        self._local.conn = conn
         try:
             yield conn
         finally:
+            self._local.conn = None
+            self._checkin(conn)
+
+    def stats(self):
+        """Returns a snapshot of pool usage counters."""
+        with self._lock:
+            snapshot = dict(self._stats)
+            snapshot["size"] = self.size
+            snapshot["open"] = self._created
+        snapshot["idle"] = self._idle.qsize()
+        snapshot["in_use"] = snapshot["open"] - snapshot["idle"]
+        return snapshot
+
+    def close(self):
+        self._closed = True
+        while True:
+            try:
+                conn, _ = self._idle.get_nowait()
+            except queue.Empty:
+                break
             conn.close()
 
+
+class _WriteJob:
+    __slots__ = ("fn", "args", "future", "span", "queued")
+
+    def __init__(self, fn, args):
+        self.fn = fn
+        self.args = args
+        self.future = futures.Future()
+        # Started in the submitting call, so it joins that call's trace; ended by the writer.
+        self.span = tracing.child_span(f"db {fn.__name__.lstrip('_')}", tracing.CLIENT,
+                                       {"db.system": "sqlite", "db.kind": "write"})
+        self.queued = time.perf_counter()
+
+    def set_result(self, result):
+        self.span.end()
+        self.future.set_result(result)
+
+    def set_exception(self, error):
+        self.span.set_attribute("error", f"{type(error).__name__}: {error}")
+        self.span.end("ERROR")
+        self.future.set_exception(error)
+
+
+class WriteQueue:
+    """
+    Funnels every mutation through one dedicated writer thread.
+
+    Jobs that queue up while a transaction is in flight are group-committed
+    together (up to max_batch per COMMIT), so a burst of CreateOrder calls
+    costs one fsync instead of one each. If a job raises, the transaction is
+    rolled back, that job gets the exception and the rest of the batch is
+    replayed in a fresh transaction. (No per-job SAVEPOINTs: while one is
+    open, FTS5 flushes its pending index on every statement, which makes
+    product writes several times slower.)
+    """
+    def __init__(self, db_name, pragmas=None, max_batch=WRITE_BATCH_MAX):
+        self.max_batch = max_batch
+        self._conn = sqlite3.connect(db_name, isolation_level=None, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        _apply_pragmas(self._conn, pragmas or {})
+        self._queue = queue.Queue()
+        self._stats = {"transactions": 0, "jobs": 0, "failed_jobs": 0, "max_batch_seen": 0}
+        self._stats_lock = threading.Lock()
+        self._thread = threading.Thread(target=self._run, name="sqlite-writer", daemon=True)
+        self._thread.start()
+
+    def submit(self, fn, *args):
+        """Queues fn(conn, *args) for the writer; returns a Future with its result."""
+        job = _WriteJob(fn, args)
+        self._queue.put(job)
+        return job.future
+
+    def execute(self, fn, *args):
+        """Runs fn(conn, *args) on the writer thread and waits for it to commit."""
+        return self.submit(fn, *args).result()
+
+    def _run(self):
+        running = True
+        while running:
+            job = self._queue.get()
+            if job is None:
+                break
+            batch = [job]
+            while len(batch) < self.max_batch:
+                try:
+                    job = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if job is None:
+                    running = False
+                    break
+                batch.append(job)
+            self._commit_batch(batch)
+        self._conn.close()
+
+    def _commit_batch(self, batch):
+        conn = self._conn
+        pending = list(batch)
+        failed = 0
+        transactions = 0
+        while pending:
+            results = []
+            error = None
+            try:
+                conn.execute("BEGIN IMMEDIATE")
+                for job in pending:
+                    started = time.perf_counter()
+                    try:
+                        results.append(job.fn(conn, *job.args))
+                    except Exception as e:
+                        error = e
+                        break
+                    finally:
+                        elapsed = time.perf_counter() - started
+                        metrics.DB_SECONDS.observe((job.fn.__name__.lstrip("_"), "write"), elapsed)
+                        job.span.set_attribute("db.queued_ms", round((started - job.queued) * 1000, 3))
+                        job.span.set_attribute("db.execute_ms", round(elapsed * 1000, 3))
+                        job.span.set_attribute("db.batch_jobs", len(batch))
+                if error is None:
+                    started = time.perf_counter()
+                    conn.execute("COMMIT")
+                    metrics.DB_WRITE_COMMIT_SECONDS.observe(value=time.perf_counter() - started)
+                    transactions += 1
+                else:
+                    conn.rollback()
+            except Exception as e:
+                if conn.in_transaction:
+                    conn.rollback()
+                for job in pending:
+                    job.set_exception(e)
+                return
+
+            if error is None:
+                for job, result in zip(pending, results):
+                    job.set_result(result)
+                pending = []
+            else:
+                # Only the failing job is dropped; the jobs before it are replayed.
+                failed_job = pending.pop(len(results))
+                failed_job.set_exception(error)
+                failed += 1
+
+        with self._stats_lock:
+            self._stats["transactions"] += transactions
+            self._stats["jobs"] += len(batch)
+            self._stats["failed_jobs"] += failed
+            self._stats["max_batch_seen"] = max(self._stats["max_batch_seen"], len(batch))
+        metrics.DB_WRITE_BATCH_JOBS.observe(value=len(batch))
+
+    def stats(self):
+        with self._stats_lock:
+            snapshot = dict(self._stats)
+        snapshot["queued"] = self._queue.qsize()
+        return snapshot
+
+    def close(self):
+        self._queue.put(None)
+        self._thread.join()
+
+
+class Database:
+    """
+    Manages all database operations for the API.
+
+    Reads go through a pool of read-only connections; every mutation is
+    handed to the single WriteQueue thread.
+    """
+    def __init__(self, db_name, pool_size=DB_POOL_SIZE, pragmas=None):
+        self.db_name = db_name
+        pragmas = dict(SQLITE_PRAGMAS if pragmas is None else pragmas)
+        # journal_mode is persistent and can only change outside a transaction,
+        # so the writer connection sets it once; readers get the rest.
+        self.writer = WriteQueue(db_name, pragmas=pragmas)
+        reader_pragmas = {k: v for k, v in pragmas.items() if k != "journal_mode"}
+        reader_pragmas["query_only"] = "ON"
+        self.pool = ConnectionPool(db_name, size=pool_size, pragmas=reader_pragmas)
+        self.writer.execute(self._init_db)
+
+    def _init_db(self, conn):
+        cursor = conn.cursor()
+        cursor.execute("""
+        CREATE TABLE IF NOT EXISTS products (
+            product_id TEXT PRIMARY KEY, name TEXT NOT NULL,
+            description TEXT, price REAL NOT NULL
+        )""")
+        cursor.execute("""
+        CREATE TABLE IF NOT EXISTS orders (
+            order_id TEXT PRIMARY KEY, user_id TEXT NOT NULL,
+            status INTEGER NOT NULL, total_amount REAL NOT NULL
+        )""")
+        cursor.execute("""
+        CREATE TABLE IF NOT EXISTS order_items (
+            item_id INTEGER PRIMARY KEY AUTOINCREMENT, order_id TEXT NOT NULL,
+            product_id TEXT NOT NULL, quantity INTEGER NOT NULL, price_per_item REAL NOT NULL,
+            FOREIGN KEY (order_id) REFERENCES orders (order_id)
+        )""")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_order_items_order_id ON order_items (order_id)")
+        cursor.execute("""
+        CREATE TABLE IF NOT EXISTS users (
+            user_id TEXT PRIMARY KEY, username TEXT UNIQUE NOT NULL,
+            password_hash TEXT NOT NULL, role TEXT NOT NULL
+        )""")
+        cursor.execute("SELECT * FROM users WHERE username='admin'")
+        if not cursor.fetchone():
+            admin_id = ids.new_id("user")
+            cursor.execute("INSERT INTO users VALUES (?, ?, ?, ?)",
+                           (admin_id, 'admin', passwords.hash_password('admin123'), 'admin'))
+        self._hash_plaintext_passwords(conn)
+        self._init_idempotency_keys(conn)
+        self._init_row_counts(conn)
+        self.fts_enabled = self._init_search_index(conn)
+
+    def _hash_plaintext_passwords(self, conn):
+        """Migrates users created before passwords were hashed (stored in plaintext)."""
+        rows = conn.execute("SELECT user_id, password_hash FROM users").fetchall()
+        for user_id, stored in rows:
+            if not passwords.is_password_hash(stored):
+                conn.execute("UPDATE users SET password_hash = ? WHERE user_id = ?",
+                             (passwords.hash_password(stored), user_id))
+
+    def _init_idempotency_keys(self, conn):
+        """Adds orders.idempotency_key to databases created before it existed, and its dedup index."""
+        columns = {row["name"] for row in conn.execute("PRAGMA table_info(orders)")}
+        if "idempotency_key" not in columns:
+            conn.execute("ALTER TABLE orders ADD COLUMN idempotency_key TEXT")
+        conn.execute("""
+            CREATE UNIQUE INDEX IF NOT EXISTS idx_orders_idempotency_key
+            ON orders (user_id, idempotency_key) WHERE idempotency_key IS NOT NULL""")
+
+    def _init_row_counts(self, conn):
+        """
+        Keeps products/orders row counts in table_counts, maintained by triggers
+        in the same transaction as every insert/delete, so counting is a single
+        primary-key lookup. A missing counter is seeded from COUNT(*) once.
+        """
+        conn.execute("""
+        CREATE TABLE IF NOT EXISTS table_counts (
+            table_name TEXT PRIMARY KEY, row_count INTEGER NOT NULL
+        )""")
+        for table in ("products", "orders"):
+            conn.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS {table}_count_insert AFTER INSERT ON {table} BEGIN
+                UPDATE table_counts SET row_count = row_count + 1 WHERE table_name = '{table}';
+            END""")
+            conn.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS {table}_count_delete AFTER DELETE ON {table} BEGIN
+                UPDATE table_counts SET row_count = row_count - 1 WHERE table_name = '{table}';
+            END""")
+            if not conn.execute("SELECT 1 FROM table_counts WHERE table_name = ?", (table,)).fetchone():
+                conn.execute(f"INSERT INTO table_counts SELECT '{table}', COUNT(*) FROM {table}")
+
+    def _row_count(self, table):
+        with self._get_connection(f"count_{table}") as conn:
+            return conn.execute("SELECT row_count FROM table_counts WHERE table_name = ?", (table,)).fetchone()[0]
+
+    def _init_search_index(self, conn):
+        """
+        Creates the FTS5 index over products.name/description and the triggers
+        that keep it in sync inside the same transaction as every product write.
+        Returns False if this SQLite build has no FTS5 (search falls back to LIKE).
+
+        The index is keyed by products.rowid, which a VACUUM may renumber;
+        the index is rebuilt here whenever it no longer matches, so restart
+        the server after vacuuming the database.
+        """
+        is_new = not conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'products_fts'").fetchone()
+        try:
+            conn.execute("""
+            CREATE VIRTUAL TABLE IF NOT EXISTS products_fts USING fts5(
+                name, description,
+                content='products', content_rowid='rowid',
+                tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+            )""")
+        except sqlite3.OperationalError as e:
+            logger.warning("Full-text search unavailable, falling back to LIKE", extra={"error": str(e)})
+            return False
+        # Plain execute() rather than executescript(), which would COMMIT the writer's transaction.
+        conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS products_fts_insert AFTER INSERT ON products BEGIN
+            INSERT INTO products_fts (rowid, name, description) VALUES (new.rowid, new.name, new.description);
+        END""")
+        conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS products_fts_delete AFTER DELETE ON products BEGIN
+            INSERT INTO products_fts (products_fts, rowid, name, description)
+            VALUES ('delete', old.rowid, old.name, old.description);
+        END""")
+        conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS products_fts_update AFTER UPDATE ON products BEGIN
+            INSERT INTO products_fts (products_fts, rowid, name, description)
+            VALUES ('delete', old.rowid, old.name, old.description);
+            INSERT INTO products_fts (rowid, name, description) VALUES (new.rowid, new.name, new.description);
+        END""")
+        if is_new:
+            conn.execute("INSERT INTO products_fts (products_fts) VALUES ('rebuild')")  # index existing rows
+        elif not self._search_index_in_sync(conn):
+            logger.warning("Search index out of sync with products, rebuilding")
+            conn.execute("INSERT INTO products_fts (products_fts) VALUES ('rebuild')")
+        return True
+
+    def _search_index_in_sync(self, conn):
+        """
+        Whether products_fts still indexes products' rowids. A VACUUM keeps the
+        rowids in order but closes their gaps, so if it renumbered any, the
+        lowest or highest one moved; both ends are B-tree lookups.
+        """
+        products = conn.execute("SELECT min(rowid), max(rowid) FROM products").fetchone()
+        indexed = conn.execute("SELECT min(id), max(id) FROM products_fts_docsize").fetchone()
+        return tuple(products) == tuple(indexed)
+
+    @contextmanager
+    def _get_connection(self, operation):
+        """A pooled connection; the time it is held is recorded under `operation`, and traced as a span."""
+        with tracing.child_span(f"db {operation}", tracing.CLIENT, {"db.system": "sqlite", "db.kind": "read"}):
+            started = time.perf_counter()
+            with self.pool.connection() as conn:
+                try:
+                    yield conn
+                finally:
+                    metrics.DB_SECONDS.observe((operation, "read"), time.perf_counter() - started)
+
+    def close(self):
+        self.writer.close()
+        self.pool.close()
+
     # --- User Methods ---
     def get_user_by_username(self, username):
         
-        with self._get_connection() as conn:
+        with self._get_connection("get_user_by_username") as conn:
             return conn.execute("SELECT * FROM users WHERE username = ?", (username,)).fetchone()
         
     
 
     # --- Product Methods ---
-    
+
+    def _insert_product(self, conn, name, description, price):
+        product_id = ids.new_id("prod")
+        conn.execute("INSERT INTO products (product_id, name, description, price) VALUES (?, ?, ?, ?)",
+                     (product_id, name, description, price))
+        return conn.execute("SELECT * FROM products WHERE product_id = ?", (product_id,)).fetchone()
+
     def create_product(self, name, description, price):
-   
-        with self._get_connection() as conn:
-            cursor = conn.cursor()
-            while True:
-                product_id = "prod-" + str(uuid.uuid4())[:8]
-                cursor.execute("SELECT 1 FROM products WHERE product_id = ?", (product_id,))
-                if not cursor.fetchone():
-                    break
-            
-            cursor.execute("INSERT INTO products (product_id, name, description, price) VALUES (?, ?, ?, ?)", 
-                           (product_id, name, description, price))
-            
-            conn.commit()
-            
-            
-            row = cursor.execute("SELECT * FROM products WHERE product_id = ?", (product_id,)).fetchone()
-            return row
-     
+        return self.writer.execute(self._insert_product, name, description, price)
+
+    def _insert_products(self, conn, rows):
+        """Inserts already-validated (index, name, description, price) rows with one executemany."""
+        records = [(ids.new_id("prod"), name, description, price) for _, name, description, price in rows]
+        conn.executemany("INSERT INTO products (product_id, name, description, price) VALUES (?, ?, ?, ?)", records)
+        return len(records)
+
+    def import_products(self, rows):
+        return self.writer.execute(self._insert_products, rows)
 
     def get_product(self, product_id):
-        
-        with self._get_connection() as conn:
+        with self._get_connection("get_product") as conn:
             return conn.execute("SELECT * FROM products WHERE product_id = ?", (product_id,)).fetchone()
 
+    def get_products(self, product_ids):
+        """Fetches the given products (any order) with one IN (...) query per SQLITE_MAX_PARAMS IDs."""
+        product_ids = list(dict.fromkeys(product_ids))
+        rows = []
+        with self._get_connection("get_products") as conn:
+            for start in range(0, len(product_ids), SQLITE_MAX_PARAMS):
+                chunk = product_ids[start:start + SQLITE_MAX_PARAMS]
+                placeholders = ",".join("?" * len(chunk))
+                rows.extend(conn.execute(f"SELECT * FROM products WHERE product_id IN ({placeholders})", chunk))
+        return rows
+
+    def _update_product(self, conn, product_id, name, description, price):
+        cursor = conn.execute("UPDATE products SET name=?, description=?, price=? WHERE product_id=?",
+                              (name, description, price, product_id))
+        if cursor.rowcount == 0:
+            return None
+        return conn.execute("SELECT * FROM products WHERE product_id = ?", (product_id,)).fetchone()
+
     def update_product(self, product_id, name, description, price):
-        
-        with self._get_connection() as conn:
-            cursor = conn.execute("UPDATE products SET name=?, description=?, price=? WHERE product_id=?",
-                                  (name, description, price, product_id))
-            conn.commit()
-            if cursor.rowcount == 0:
-                return None
-            return self.get_product(product_id)
+        return self.writer.execute(self._update_product, product_id, name, description, price)
 
-    def delete_product(self, product_id): 
-        with self._get_connection() as conn:
-            cursor = conn.execute("DELETE FROM products WHERE product_id = ?", (product_id,))
-            conn.commit()
-            return cursor.rowcount > 0
+    def _delete_product(self, conn, product_id):
+        cursor = conn.execute("DELETE FROM products WHERE product_id = ?", (product_id,))
+        return cursor.rowcount > 0
 
-    def list_products(self):
-        
-        with self._get_connection() as conn:
-            return conn.execute("SELECT * FROM products").fetchall()
+    def delete_product(self, product_id):
+        return self.writer.execute(self._delete_product, product_id)
+
+    def iter_products(self, after=None, limit=None):
+        """
+        Yields products in product_id order, starting just past `after`.
+        Keyset pagination: every page is an index range scan on the primary key.
+        """
+        sql = "SELECT * FROM products"
+        params = []
+        if after is not None:
+            sql += " WHERE product_id > ?"
+            params.append(after)
+        sql += " ORDER BY product_id"
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(limit)
+        with self._get_connection("iter_products") as conn:
+            yield from conn.execute(sql, params)
+
+    def list_products(self, after=None, limit=None):
+        with closing(self.iter_products(after, limit)) as rows:
+            return list(rows)
+
+    def search_key(self, search_query):
+        """Canonical form of search_query: queries with the same key return the same rows."""
+        if not self.fts_enabled:
+            return search_query  # LIKE matches the raw text
+        # The FTS tokenizer case-folds, so the match expression decides the result.
+        # None: a query with no words, which matches nothing (unlike '', which lists).
+        return _fts_match_expression(search_query).lower() or (None if search_query else "")
+
+    def search_products(self, search_query, limit):
+        """
+        Prefix search over name and description, best BM25 match first (name
+        hits weigh 10x description hits). An empty query returns the first
+        `limit` products; one without any words (e.g. '!!!') matches nothing.
+        """
+        match = _fts_match_expression(search_query)
+        with self._get_connection("search_products") as conn:
+            if not search_query:
+                return conn.execute("SELECT * FROM products ORDER BY product_id LIMIT ?", (limit,)).fetchall()
+            if not self.fts_enabled:
+                return conn.execute("SELECT * FROM products WHERE UPPER(name) LIKE UPPER(?) LIMIT ?",
+                                    (f"%{search_query}%", limit)).fetchall()
+            if not match:
+                return []
+            return conn.execute("""
+                SELECT products.* FROM products_fts
+                JOIN products ON products.rowid = products_fts.rowid
+                WHERE products_fts MATCH ?
+                ORDER BY bm25(products_fts, 10.0, 1.0)
+                LIMIT ?""", (match, limit)).fetchall()
 
     def count_products(self):
-        
-        with self._get_connection() as conn:
-            return conn.execute("SELECT COUNT(*) FROM products").fetchone()[0]
+        return self._row_count("products")
+
+    def iter_export_products(self):
+        """Yields every product as a dict straight off the cursor."""
+        with self._get_connection("iter_export_products") as conn:
+            for row in conn.execute("SELECT * FROM products ORDER BY product_id"):
+                yield dict(row)
 
     def export_products(self):
-        
-        with self._get_connection() as conn:
-            rows = conn.execute("SELECT * FROM products").fetchall()
-            return json.dumps([dict(row) for row in rows], indent=2)
+        with closing(self.iter_export_products()) as products:
+            return json.dumps(list(products), indent=2)
 
     # --- Order Methods ---
-    
-    def create_order(self, user_id, items):
-        total_amount = sum(item.quantity * item.price_per_item for item in items)
-        with self._get_connection() as conn:
-            cursor = conn.cursor()
-            while True:
-                order_id = "order-" + str(uuid.uuid4())[:8]
-                cursor.execute("SELECT 1 FROM orders WHERE order_id = ?", (order_id,))
-                if not cursor.fetchone():
-                    break
-            cursor.execute("INSERT INTO orders (order_id, user_id, status, total_amount) VALUES (?, ?, ?, ?)",
-                         (order_id, user_id, order_api_pb2.Order.PENDING, total_amount))
-            for item in items:
-                cursor.execute("INSERT INTO order_items (order_id, product_id, quantity, price_per_item) VALUES (?, ?, ?, ?)",
-                             (order_id, item.product_id, item.quantity, item.price_per_item))
-            conn.commit()
-        return self.get_order(order_id)
+
+    def _fetch_order(self, conn, order_id):
+        order_data = conn.execute(
+            "SELECT order_id, user_id, status, total_amount FROM orders WHERE order_id = ?", (order_id,)
+        ).fetchone()
+        if not order_data:
+            return None, []
+        items_data = conn.execute(
+            "SELECT product_id, quantity, price_per_item FROM order_items WHERE order_id = ?", (order_id,)
+        ).fetchall()
+        return order_data, items_data
+
+    def _price_order_items(self, conn, items):
+        """
+        Prices (product_id, quantity) items from the products table with one
+        join. Returns ([(product_id, quantity, price)], total_amount); raises
+        UnknownProductsError if any product doesn't exist.
+        """
+        values = ", ".join("(?, ?, ?)" for _ in items)
+        params = [value for position, (product_id, quantity) in enumerate(items)
+                  for value in (position, product_id, quantity)]
+        rows = conn.execute(f"""
+            WITH wanted(position, product_id, quantity) AS (VALUES {values})
+            SELECT w.product_id, w.quantity, p.price, SUM(w.quantity * p.price) OVER () AS total_amount
+            FROM wanted w LEFT JOIN products p ON p.product_id = w.product_id
+            ORDER BY w.position""", params).fetchall()
+        unknown = [row["product_id"] for row in rows if row["price"] is None]
+        if unknown:
+            raise UnknownProductsError(list(dict.fromkeys(unknown)))
+        return [(row["product_id"], row["quantity"], row["price"]) for row in rows], rows[0]["total_amount"]
+
+    def _find_order_id_by_idempotency_key(self, conn, user_id, idempotency_key):
+        row = conn.execute("SELECT order_id FROM orders WHERE user_id = ? AND idempotency_key = ?",
+                           (user_id, idempotency_key)).fetchone()
+        return row["order_id"] if row else None
+
+    def find_order_by_idempotency_key(self, user_id, idempotency_key):
+        """Returns (order, items) previously created with this key, or (None, [])."""
+        with self._get_connection("find_order_by_idempotency_key") as conn:
+            order_id = self._find_order_id_by_idempotency_key(conn, user_id, idempotency_key)
+            return self._fetch_order(conn, order_id) if order_id else (None, [])
+
+    def _insert_order(self, conn, user_id, items, idempotency_key=None):
+        if idempotency_key:
+            # A concurrent retry may have committed since the caller last looked.
+            order_id = self._find_order_id_by_idempotency_key(conn, user_id, idempotency_key)
+            if order_id:
+                return self._fetch_order(conn, order_id)
+        # Priced inside the write transaction, so the order is charged the
+        # prices current at commit and an unknown product writes nothing.
+        items, total_amount = self._price_order_items(conn, items)
+        order_id = ids.new_id("order")
+        conn.execute("INSERT INTO orders (order_id, user_id, status, total_amount, idempotency_key) VALUES (?, ?, ?, ?, ?)",
+                     (order_id, user_id, order_api_pb2.Order.PENDING, total_amount, idempotency_key or None))
+        conn.executemany("INSERT INTO order_items (order_id, product_id, quantity, price_per_item) VALUES (?, ?, ?, ?)",
+                           [(order_id, *item) for item in items])
+        return self._fetch_order(conn, order_id)
+
+    def create_order(self, user_id, items, idempotency_key=None):
+        """
+        Creates an order from Order.Item-like items; their price_per_item is
+        ignored. With an idempotency_key already used by this user, returns
+        that order instead of creating another.
+        """
+        items = [(item.product_id, item.quantity) for item in items]
+        return self.writer.execute(self._insert_order, user_id, items, idempotency_key)
 
     def get_order(self, order_id):
-        with self._get_connection() as conn:
-            order_data = conn.execute("SELECT * FROM orders WHERE order_id = ?", (order_id,)).fetchone()
-            if not order_data:
-                return None, []
-            items_data = conn.execute("SELECT * FROM order_items WHERE order_id = ?", (order_id,)).fetchall()
-            return order_data, items_data
-    
+        with self._get_connection("get_order") as conn:
+            return self._fetch_order(conn, order_id)
+
+    def _update_order_status(self, conn, order_id, new_status):
+        cursor = conn.execute("UPDATE orders SET status=? WHERE order_id=?", (new_status, order_id))
+        if cursor.rowcount == 0:
+            return None, []
+        return self._fetch_order(conn, order_id)
+
     def update_order_status(self, order_id, new_status):
-        with self._get_connection() as conn:
-            cursor = conn.execute("UPDATE orders SET status=? WHERE order_id=?", (new_status, order_id))
-            conn.commit()
-            if cursor.rowcount == 0:
-                return None, []
-        return self.get_order(order_id)
-        
+        return self.writer.execute(self._update_order_status, order_id, new_status)
+
     def count_orders(self):
-        with self._get_connection() as conn:
-            return conn.execute("SELECT COUNT(*) FROM orders").fetchone()[0]
+        return self._row_count("orders")
+
+    def iter_export_orders(self, after=None, limit=None):
+        """
+        Yields orders (all of them by default, or `limit` orders past order_id
+        `after`) as dicts with their items, one order at a time.
+
+        A single join ordered by (order_id, item_id) walks orders by primary key
+        and items through idx_order_items_order_id, so each order's items arrive
+        contiguously and the whole export is one linear pass. Keep it flat: a
+        LIMITed subquery makes SQLite sort the whole join before the first row.
+        """
+        with self._get_connection("iter_export_orders") as conn, closing(conn.execute("""
+                SELECT o.order_id, o.user_id, o.status, o.total_amount,
+                       i.item_id, i.product_id, i.quantity, i.price_per_item
+                FROM orders o
+                LEFT JOIN order_items i ON i.order_id = o.order_id
+                WHERE o.order_id > ?
+                ORDER BY o.order_id, i.item_id""", ("" if after is None else after,))) as rows:
+            # LIMIT counts joined rows, not orders, so a page stops after `limit` orders here.
+            orders = itertools.groupby(rows, key=lambda row: row['order_id'])
+            for order_id, order_rows in itertools.islice(orders, limit):
+                first = next(order_rows)
+                order_dict = {
+                    'order_id': order_id,
+                    'user_id': first['user_id'],
+                    'status': first['status'],
+                    'total_amount': first['total_amount'],
+                    'items': [],
+                }
+                for row in itertools.chain((first,), order_rows):
+                    if row['item_id'] is None:  # order without items (LEFT JOIN)
+                        continue
+                    order_dict['items'].append({
+                        'item_id': row['item_id'],
+                        'order_id': order_id,
+                        'product_id': row['product_id'],
+                        'quantity': row['quantity'],
+                        'price_per_item': row['price_per_item'],
+                    })
+                yield order_dict
+
+    def list_export_orders(self, after=None, limit=None):
+        with closing(self.iter_export_orders(after, limit)) as orders:
+            return list(orders)
 
     def export_orders(self):
-        with self._get_connection() as conn:
-            orders_rows = conn.execute("SELECT * FROM orders").fetchall()
-            items_rows = conn.execute("SELECT * FROM order_items").fetchall()
-        
-        orders_list = []
-        for order_row in orders_rows:
-            order_dict = dict(order_row)
-            order_dict['items'] = [dict(item_row) for item_row in items_rows if item_row['order_id'] == order_dict['order_id']]
-            orders_list.append(order_dict)
-        return json.dumps(orders_list, indent=2)
+        return json.dumps(self.list_export_orders(), indent=2)
+
+# --- Caching ---
+class ProductCache:
+    """
+    In-process LRU + TTL cache of Product messages keyed by product_id.
+
+    Bounded both by entry count and by approximate memory. Writers call
+    invalidate(); readers that missed pass the generation they saw to put(),
+    so a row read before a concurrent update can't be cached after it.
+    """
+    ENTRY_OVERHEAD = 200  # rough per-entry bytes for the dict slot, key and message object
+
+    def __init__(self, max_entries=PRODUCT_CACHE_MAX_ENTRIES, max_bytes=PRODUCT_CACHE_MAX_BYTES,
+                 ttl=PRODUCT_CACHE_TTL):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._entries = OrderedDict()  # product_id -> (product, expires_at, size)
+        self._bytes = 0
+        self._generation = 0
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "evictions": 0, "expirations": 0, "invalidations": 0}
+
+    def _entry_size(self, key, product):
+        return product.ByteSize() + len(key) + self.ENTRY_OVERHEAD
+
+    def _drop(self, key):
+        _, _, size = self._entries.pop(key)
+        self._bytes -= size
+
+    def generation(self):
+        return self._generation
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._stats["misses"] += 1
+                return None
+            product, expires_at, _ = entry
+            if expires_at <= time.monotonic():
+                self._drop(key)
+                self._stats["expirations"] += 1
+                self._stats["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self._stats["hits"] += 1
+            return product
+
+    def put(self, key, product, generation):
+        size = self._entry_size(key, product)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if generation != self._generation:
+                return  # something was invalidated since this value was read
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = (product, time.monotonic() + self.ttl, size)
+            self._bytes += size
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                self._drop(next(iter(self._entries)))
+                self._stats["evictions"] += 1
+
+    def invalidate(self, key):
+        with self._lock:
+            self._generation += 1
+            if key in self._entries:
+                self._drop(key)
+            self._stats["invalidations"] += 1
+
+    def stats(self):
+        with self._lock:
+            snapshot = dict(self._stats)
+            snapshot["entries"] = len(self._entries)
+            snapshot["bytes"] = self._bytes
+        return snapshot
+
+
+class SearchCache:
+    """
+    In-process LRU + TTL cache of SearchProducts results keyed by
+    (Database.search_key(query), limit).
+
+    Any product mutation calls invalidate_all(), which only bumps a
+    generation counter: entries cached under an older generation are
+    misses and are dropped when next looked up (or evicted by the LRU).
+    """
+
+    def __init__(self, max_entries=SEARCH_CACHE_MAX_ENTRIES, ttl=SEARCH_CACHE_TTL):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()  # key -> (rows, generation, expires_at)
+        self._generation = 0
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "evictions": 0, "expirations": 0, "invalidations": 0}
+
+    def generation(self):
+        return self._generation
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._stats["misses"] += 1
+                return None
+            rows, generation, expires_at = entry
+            if generation != self._generation or expires_at <= time.monotonic():
+                del self._entries[key]
+                self._stats["expirations"] += 1
+                self._stats["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self._stats["hits"] += 1
+            return rows
+
+    def put(self, key, rows, generation):
+        with self._lock:
+            if generation != self._generation:
+                return  # products changed while these rows were being read
+            self._entries[key] = (tuple(rows), generation, time.monotonic() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._stats["evictions"] += 1
+
+    def invalidate_all(self):
+        with self._lock:
+            self._generation += 1
+            self._stats["invalidations"] += 1
+
+    def stats(self):
+        with self._lock:
+            snapshot = dict(self._stats)
+            snapshot["entries"] = len(self._entries)
+        return snapshot
+
+
+class IdempotencyCache:
+    """
+    Bounded LRU of recently used (user_id, idempotency_key) -> order_id, so a
+    replayed CreateOrder is answered with one read instead of a trip through
+    the writer. Orders are never deleted, so entries never go stale.
+    """
+
+    def __init__(self, max_entries=IDEMPOTENCY_CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "evictions": 0}
+
+    def get(self, key):
+        with self._lock:
+            order_id = self._entries.get(key)
+            if order_id is None:
+                self._stats["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self._stats["hits"] += 1
+            return order_id
+
+    def put(self, key, order_id):
+        with self._lock:
+            self._entries[key] = order_id
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._stats["evictions"] += 1
+
+    def stats(self):
+        with self._lock:
+            snapshot = dict(self._stats)
+            snapshot["entries"] = len(self._entries)
+        return snapshot
+
+
+def _relay_stream(messages, context, stream_name):
+    """Relays a message generator to the client with the shared stream error handling."""
+    try:
+        with closing(messages):
+            yield from messages
+    except grpc.RpcError as e:
+        if e.code() == grpc.StatusCode.CANCELLED:
+            logger.info("Stream cancelled by the client", extra={"stream": stream_name})
+        else:
+            logger.warning("Stream failed", extra={"stream": stream_name, "error": str(e)})
+    except Exception as e:
+        logger.exception("Stream failed with an internal error", extra={"stream": stream_name})
+        context.set_code(grpc.StatusCode.INTERNAL)
+        context.set_details(f"An internal error occurred: {e}")
+
+    logger.debug("Stream finished", extra={"stream": stream_name})
+
+
+def _ndjson_chunks(records, chunk_bytes=EXPORT_CHUNK_BYTES):
+    """Serializes records as NDJSON and packs whole lines into ~chunk_bytes ExportChunks."""
+    lines = []
+    size = 0
+    for record in records:
+        line = json.dumps(record, ensure_ascii=False).encode("utf-8") + b"\n"
+        lines.append(line)
+        size += len(line)
+        if size >= chunk_bytes:
+            yield order_api_pb2.ExportChunk(ndjson=b"".join(lines), records=len(lines))
+            lines = []
+            size = 0
+    if lines:
+        yield order_api_pb2.ExportChunk(ndjson=b"".join(lines), records=len(lines))
+
+
+def _parse_page_request(request):
+    """Returns (after, page_size) for a ListProductsRequest; raises ValueError if it is invalid."""
+    if request.page_size < 0:
+        raise ValueError("page_size must not be negative.")
+    after = decode_page_token(request.page_token) if request.page_token else None
+    return after, min(request.page_size, MAX_PAGE_SIZE)
+
+
+def _search_limit(request):
+    limit = request.limit
+    if limit <= 0 or limit > 100:
+        limit = 10
+    return limit
+
+
+def _import_row_error(product):
+    """Returns why a product can't be imported, or None if it is valid."""
+    if not product.name.strip():
+        return "name is required."
+    if not math.isfinite(product.price) or product.price < 0:
+        return f"price must be a non-negative number, got {product.price}."
+    return None
+
+
+class _ProductImport:
+    """
+    ImportProducts bookkeeping shared by the sync and async servicers: groups
+    streamed products into write batches of IMPORT_BATCH_SIZE and tallies the
+    response. The servicers only write the batches.
+    """
+
+    def __init__(self):
+        self.response = order_api_pb2.ImportProductsResponse()
+        self._batch = []
+        self._index = 0
+
+    def add(self, product):
+        """Queues one product; returns the batch to write once it is full, else None."""
+        error = _import_row_error(product)
+        if error:
+            self._record_error(self._index, error)
+        else:
+            self._batch.append((self._index, product.name, product.description, product.price))
+        self._index += 1
+        return self.take() if len(self._batch) >= IMPORT_BATCH_SIZE else None
+
+    def take(self):
+        """The products queued since the last batch."""
+        batch, self._batch = self._batch, []
+        return batch
+
+    def imported(self, count):
+        self.response.imported += count
+
+    def failed(self, batch, error):
+        # The batch's transaction was rolled back as a whole.
+        for index, *_ in batch:
+            self._record_error(index, f"Batch insert failed: {error}")
+
+    def finish(self, search_cache):
+        if self.response.imported:
+            search_cache.invalidate_all()
+        logger.info("ImportProducts finished",
+                    extra={"imported": self.response.imported, "failed": self.response.failed})
+        return self.response
+
+    def _record_error(self, index, message):
+        self.response.failed += 1
+        if len(self.response.errors) < MAX_IMPORT_ERRORS:
+            self.response.errors.add(index=index, message=message)
+
+
+def _split_cached_products(cache, product_ids):
+    """Returns ({product_id: Product} served from `cache`, [product_ids it missed])."""
+    found, misses = {}, []
+    for product_id in product_ids:
+        product = cache.get(product_id)
+        if product is None:
+            misses.append(product_id)
+        else:
+            found[product_id] = product
+    return found, misses
+
+
+def _batch_get_response(product_ids, found, rows, cache, generation):
+    """Adds fetched rows to `found` (and the cache), then answers in request order."""
+    for row in rows:
+        product = order_api_pb2.Product(**row)
+        found[row["product_id"]] = product
+        cache.put(row["product_id"], product, generation)
+    response = order_api_pb2.BatchGetProductsResponse()
+    for product_id in product_ids:
+        if product_id in found:
+            response.products.append(found[product_id])
+        else:
+            response.missing_ids.append(product_id)
+    return response
+
+
+def _order_request_error(request):
+    """Returns why a CreateOrderRequest is invalid, or None if its items can be priced."""
+    if len(request.idempotency_key) > MAX_IDEMPOTENCY_KEY_LENGTH:
+        return f"idempotency_key must be at most {MAX_IDEMPOTENCY_KEY_LENGTH} characters."
+    items = request.items
+    if not items:
+        return "An order needs at least one item."
+    if len(items) > MAX_ORDER_ITEMS:
+        return f"At most {MAX_ORDER_ITEMS} items per order."
+    for item in items:
+        if item.quantity <= 0:
+            return f"quantity must be positive, got {item.quantity} for {item.product_id}."
+    return None
+
+
+def _order_user_id(request):
+    """
+    The user an order is placed for: admins may order for any user_id,
+    anyone else only for themselves (an empty user_id means the caller).
+    Returns (user_id, None), or (None, why the caller may not).
+    """
+    auth = current_auth()
+    if auth is None:  # servicer used without the auth interceptor
+        return request.user_id, None
+    if ROLE_LEVELS.get(auth.role, ROLE_LEVELS["user"]) >= ROLE_LEVELS["admin"]:
+        return request.user_id or auth.user_id, None
+    if not auth.user_id:
+        return None, "This token does not identify a user."
+    if request.user_id and request.user_id != auth.user_id:
+        return None, "Orders can only be placed for your own user_id."
+    return auth.user_id, None
+
+
+def _order_message(order_row, item_rows):
+    items = [order_api_pb2.Order.Item(**item) for item in item_rows]
+    return order_api_pb2.Order(**order_row, items=items)
+
+
+def _login_response(user_row):
+    payload = {
+        "user_id": user_row["user_id"],
+        "role": user_row["role"],
+        "exp": datetime.utcnow() + timedelta(hours=8)
+    }
+    token = jwt.encode(payload, JWT_SECRET, algorithm="HS256")
+    logger.info("Login succeeded", extra={"user_id": user_row["user_id"]})
+    return order_api_pb2.LoginResponse(token=token, role=user_row["role"])
+
+
+def _batch_size(requested):
+    """The products per ProductBatch for a request's batch_size: the server default unless it is positive."""
+    return min(requested, MAX_BATCH_SIZE) if requested > 0 else DEFAULT_BATCH_SIZE
+
+
+def _product_batches(rows, batch_size=0, max_bytes=MAX_BATCH_BYTES):
+    """
+    Packs product rows into ProductBatch messages of at most batch_size
+    products (server default if 0) or roughly max_bytes, whichever fills first.
+    """
+    batch_size = _batch_size(batch_size)
+    batch = order_api_pb2.ProductBatch()
+    batch_bytes = 0
+    for row in rows:
+        batch_bytes += batch.products.add(**row).ByteSize()
+        if len(batch.products) >= batch_size or batch_bytes >= max_bytes:
+            yield batch
+            batch = order_api_pb2.ProductBatch()
+            batch_bytes = 0
+    if batch.products:
+        yield batch
+
 
 # --- AuthService ---
 class AuthServiceServicer(order_api_pb2_grpc.AuthServiceServicer):
-    def __init__(self, db):
+    def __init__(self, db, verifier=None, rate_limiter=None):
         self.db = db
+        self.verifier = verifier if verifier is not None else PasswordVerifier()
+        self.rate_limiter = rate_limiter if rate_limiter is not None else LoginRateLimiter()
 
     def Login(self, request, context):
-        print(f"Login attempt for username: {request.username}")
+        logger.debug("Login attempt", extra={"username": request.username})
+        refusal = _login_refusal(self.rate_limiter, request, context)
+        if refusal:
+            context.set_code(grpc.StatusCode.RESOURCE_EXHAUSTED); context.set_details(refusal)
+            return order_api_pb2.LoginResponse()
         user_row = self.db.get_user_by_username(request.username)
-        
-        if user_row and user_row["password_hash"] == request.password:
-            payload = {
-                "user_id": user_row["user_id"],
-                "role": user_row["role"],
-                "exp": datetime.utcnow() + timedelta(hours=8)
-            }
-            token = jwt.encode(payload, JWT_SECRET, algorithm="HS256")
-            print(f"Login successful for user: {user_row['user_id']}")
-            
-            # [แก้ไข] ตรวจสอบว่า .proto มี 'role' หรือไม่
-            if hasattr(order_api_pb2.LoginResponse(), 'role'):
-                return order_api_pb2.LoginResponse(token=token, role=user_row["role"])
-            else:
-                return order_api_pb2.LoginResponse(token=token) # .proto เวอร์ชันเก่า
+        # Unknown users are checked against a dummy hash so they take as long as known ones.
+        encoded = user_row["password_hash"] if user_row else passwords.dummy_hash()
+        try:
+            verified = self.verifier.verify(request.password, encoded)
+        except LoginBusyError:
+            context.set_code(grpc.StatusCode.RESOURCE_EXHAUSTED)
+            context.set_details("Too many logins in progress; try again shortly.")
+            return order_api_pb2.LoginResponse()
+        except futures.TimeoutError:
+            logger.warning("Login timed out verifying the password", extra={"username": request.username})
+            context.set_code(grpc.StatusCode.UNAVAILABLE)
+            context.set_details("Login timed out; try again shortly.")
+            return order_api_pb2.LoginResponse()
+
+        if user_row and verified:
+            return _login_response(user_row)
         else:
-            print("Login failed: Invalid credentials.")
+            logger.info("Login failed: invalid credentials", extra={"username": request.username})
             context.set_code(grpc.StatusCode.UNAUTHENTICATED)
             context.set_details("Invalid username or password")
             return order_api_pb2.LoginResponse()
 
 # --- ProductService ---
 class ProductServiceServicer(order_api_pb2_grpc.ProductServiceServicer):
-    def __init__(self, db):
+    def __init__(self, db, cache=None, search_cache=None):
         self.db = db
+        self.cache = cache if cache is not None else ProductCache()
+        self.search_cache = search_cache if search_cache is not None else SearchCache()
+
+    def _forget(self, product_id):
+        """Drops cached reads that a mutation of product_id may have made stale."""
+        self.cache.invalidate(product_id)
+        self.search_cache.invalidate_all()
 
     def CreateProduct(self, request, context):
         
@@ -248,89 +1634,119 @@ class ProductServiceServicer(order_api_pb2_grpc.ProductServiceServicer):
             context.set_code(grpc.StatusCode.INTERNAL)
             context.set_details("Failed to create product or retrieve it after creation.")
             return order_api_pb2.Product()
+        self._forget(row["product_id"])
         return order_api_pb2.Product(**row)
 
+    def ImportProducts(self, request_iterator, context):
+        logger.debug("Stream started")
+        progress = _ProductImport()
+
+        def flush(batch):
+            try:
+                progress.imported(self.db.import_products(batch))
+            except sqlite3.Error as e:
+                progress.failed(batch, e)
+
+        for request in request_iterator:
+            for product in request.products:
+                batch = progress.add(product)
+                if batch:
+                    flush(batch)
+        batch = progress.take()
+        if batch:
+            flush(batch)
+        return progress.finish(self.search_cache)
+
     def GetProduct(self, request, context):
+        product = self.cache.get(request.product_id)
+        if product is not None:
+            return product
+        generation = self.cache.generation()
         row = self.db.get_product(request.product_id)
         if not row:
             context.set_code(grpc.StatusCode.NOT_FOUND); context.set_details("Product not found.")
             return order_api_pb2.Product()
-        return order_api_pb2.Product(**row)
+        product = order_api_pb2.Product(**row)
+        self.cache.put(request.product_id, product, generation)
+        return product
+
+    def BatchGetProducts(self, request, context):
+        if len(request.product_ids) > MAX_BATCH_GET_IDS:
+            context.set_code(grpc.StatusCode.INVALID_ARGUMENT)
+            context.set_details(f"At most {MAX_BATCH_GET_IDS} product_ids per request.")
+            return order_api_pb2.BatchGetProductsResponse()
+        product_ids = list(dict.fromkeys(request.product_ids))
+        found, misses = _split_cached_products(self.cache, product_ids)
+        generation = self.cache.generation()
+        rows = self.db.get_products(misses) if misses else []
+        return _batch_get_response(product_ids, found, rows, self.cache, generation)
 
     def UpdateProduct(self, request, context):
         row = self.db.update_product(request.product_id, request.name, request.description, request.price)
+        self._forget(request.product_id)
         if not row:
             context.set_code(grpc.StatusCode.NOT_FOUND); context.set_details("Product not found to update.")
             return order_api_pb2.Product()
         return order_api_pb2.Product(**row)
 
     def DeleteProduct(self, request, context):
-        role = get_role_from_context(context, JWT_SECRET)
-        if role != "admin":
-            context.set_code(grpc.StatusCode.PERMISSION_DENIED)
-            context.set_details("Permission denied: 'admin' role required.")
-            return order_api_pb2.DeleteProductResponse(success=False)
         success = self.db.delete_product(request.product_id)
+        self._forget(request.product_id)
         return order_api_pb2.DeleteProductResponse(success=success)
 
    
-    def ListProducts(self, request, context):
-        print("[User is calling ListProducts API (Streaming)...]")
+    def _page_rows(self, request, context):
+        """
+        Yields the product rows of one ListProducts page and sets the
+        next-page token trailer. Yields nothing if the request is invalid.
+        """
         try:
-            with self.db._get_connection() as conn:
-                cursor = conn.cursor()
-                cursor.execute("SELECT * FROM products")
-                
-                
-                for row in cursor:
-                    
-                    yield order_api_pb2.Product(**row)
-                    
-        except grpc.RpcError as e:
-            if e.code() == grpc.StatusCode.CANCELLED:
-                print("Client ยกเลิก Product Stream (ทั้งหมด)")
-            else:
-                print(f"Stream error (All): {e}")
-        except Exception as e:
-            print(f"Internal stream error (All): {e}")
-            context.set_code(grpc.StatusCode.INTERNAL)
-            context.set_details(f"An internal error occurred: {e}")
-            
-        print("Product Stream (ทั้งหมด) สิ้นสุดลง")
-   
+            after, page_size = _parse_page_request(request)
+        except ValueError as e:
+            context.set_code(grpc.StatusCode.INVALID_ARGUMENT)
+            context.set_details(str(e))
+            return
+
+        # Fetch one extra row to learn whether another page follows.
+        limit = page_size + 1 if page_size else None
+        with closing(self.db.iter_products(after=after, limit=limit)) as rows:
+            sent = 0
+            for row in rows:
+                if page_size and sent == page_size:
+                    context.set_trailing_metadata(((NEXT_PAGE_TOKEN_KEY, encode_page_token(last_id)),))
+                    break
+                last_id = row["product_id"]
+                sent += 1
+                yield row
+
+    def _search_rows(self, request):
+        limit = _search_limit(request)
+        logger.debug("Stream started", extra={"search_query": request.search_query, "limit": limit})
+        key = (self.db.search_key(request.search_query), limit)
+        rows = self.search_cache.get(key)
+        if rows is None:
+            generation = self.search_cache.generation()
+            rows = self.db.search_products(request.search_query, limit)
+            self.search_cache.put(key, rows, generation)
+        yield from rows
+
+    def ListProducts(self, request, context):
+        logger.debug("Stream started")
+        products = (order_api_pb2.Product(**row) for row in self._page_rows(request, context))
+        yield from _relay_stream(products, context, "Product Stream (ทั้งหมด)")
+
     def SearchProducts(self, request, context):
-        search_query = request.search_query
-        limit = request.limit
-        
-        if limit <= 0 or limit > 100:
-            limit = 10 
+        products = (order_api_pb2.Product(**row) for row in self._search_rows(request))
+        yield from _relay_stream(products, context, "Product Stream (Search)")
 
-        print(f"Client ร้องขอ Product Stream (Search: '{search_query}', Limit: {limit})...")
-        try:
-            with self.db._get_connection() as conn:
-                cursor = conn.cursor()
-                
-                
-                sql_query = "SELECT * FROM products WHERE UPPER(name) LIKE UPPER(?) LIMIT ?"
-                params = (f"%{search_query}%", limit)
-                
-                cursor.execute(sql_query, params)
-                
-                for row in cursor:
-                    yield order_api_pb2.Product(**row)
-                    
-        except grpc.RpcError as e:
-            if e.code() == grpc.StatusCode.CANCELLED:
-                print("Client ยกเลิก Product Stream (Search)")
-            else:
-                print(f"Stream error (Search): {e}")
-        except Exception as e:
-            print(f"Internal stream error (Search): {e}")
-            context.set_code(grpc.StatusCode.INTERNAL)
-            context.set_details(f"An internal error occurred: {e}")
-            
-        print("Product Stream (Search) สิ้นสุดลง")
-    
+    def ListProductsBatched(self, request, context):
+        logger.debug("Stream started")
+        batches = _product_batches(self._page_rows(request, context), request.batch_size)
+        yield from _relay_stream(batches, context, "Product Stream (ทั้งหมด, Batched)")
+
+    def SearchProductsBatched(self, request, context):
+        batches = _product_batches(self._search_rows(request), request.batch_size)
+        yield from _relay_stream(batches, context, "Product Stream (Search, Batched)")
 
     def CountProducts(self, request, context):
         count = self.db.count_products()
@@ -341,34 +1757,66 @@ class ProductServiceServicer(order_api_pb2_grpc.ProductServiceServicer):
         json_data = self.db.export_products()
         return order_api_pb2.ExportResponse(json_data=json_data)
 
+    def ExportProductsStream(self, request, context):
+        logger.debug("Stream started")
+        chunks = _ndjson_chunks(self.db.iter_export_products())
+        yield from _relay_stream(chunks, context, "Export Stream (Products)")
+
 # --- OrderService  ---
 class OrderServiceServicer(order_api_pb2_grpc.OrderServiceServicer):
-    def __init__(self, db):
+    def __init__(self, db, idempotency_cache=None):
         self.db = db
+        self.idempotency_cache = idempotency_cache if idempotency_cache is not None else IdempotencyCache()
+
+    def _replayed_order(self, user_id, idempotency_key):
+        """The order an earlier request with the same idempotency key created, found without the writer."""
+        key = (user_id, idempotency_key)
+        order_id = self.idempotency_cache.get(key)
+        if order_id is not None:
+            return self.db.get_order(order_id)
+        order_row, item_rows = self.db.find_order_by_idempotency_key(*key)
+        if order_row:
+            self.idempotency_cache.put(key, order_row["order_id"])
+        return order_row, item_rows
 
     def CreateOrder(self, request, context):
-        order_row, item_rows = self.db.create_order(request.user_id, request.items)
+        error = _order_request_error(request)
+        if error:
+            context.set_code(grpc.StatusCode.INVALID_ARGUMENT); context.set_details(error)
+            return order_api_pb2.Order()
+        user_id, error = _order_user_id(request)
+        if error:
+            context.set_code(grpc.StatusCode.PERMISSION_DENIED); context.set_details(error)
+            return order_api_pb2.Order()
+        if request.idempotency_key:
+            order_row, item_rows = self._replayed_order(user_id, request.idempotency_key)
+            if order_row:
+                return _order_message(order_row, item_rows)
+        try:
+            order_row, item_rows = self.db.create_order(user_id, request.items, request.idempotency_key)
+        except UnknownProductsError as e:
+            context.set_code(grpc.StatusCode.INVALID_ARGUMENT); context.set_details(str(e))
+            return order_api_pb2.Order()
         if not order_row:
              context.set_code(grpc.StatusCode.INTERNAL); context.set_details("Failed to create order.")
              return order_api_pb2.Order()
-        items = [order_api_pb2.Order.Item(**item) for item in item_rows]
-        return order_api_pb2.Order(**order_row, items=items)
+        if request.idempotency_key:
+            self.idempotency_cache.put((user_id, request.idempotency_key), order_row["order_id"])
+        return _order_message(order_row, item_rows)
 
     def GetOrder(self, request, context):
         order_row, item_rows = self.db.get_order(request.order_id)
         if not order_row:
             context.set_code(grpc.StatusCode.NOT_FOUND); context.set_details("Order not found.")
             return order_api_pb2.Order()
-        items = [order_api_pb2.Order.Item(**item) for item in item_rows]
-        return order_api_pb2.Order(**order_row, items=items)
+        return _order_message(order_row, item_rows)
 
     def UpdateOrderStatus(self, request, context):
         order_row, item_rows = self.db.update_order_status(request.order_id, request.new_status)
         if not order_row:
             context.set_code(grpc.StatusCode.NOT_FOUND); context.set_details("Order not found to update.")
             return order_api_pb2.Order()
-        items = [order_api_pb2.Order.Item(**item) for item in item_rows]
-        return order_api_pb2.Order(**order_row, items=items)
+        return _order_message(order_row, item_rows)
         
     def CountOrders(self, request, context):
         count = self.db.count_orders()
@@ -378,28 +1826,591 @@ class OrderServiceServicer(order_api_pb2_grpc.OrderServiceServicer):
         json_data = self.db.export_orders()
         return order_api_pb2.ExportResponse(json_data=json_data)
 
+    def ExportOrdersStream(self, request, context):
+        logger.debug("Stream started")
+        chunks = _ndjson_chunks(self.db.iter_export_orders())
+        yield from _relay_stream(chunks, context, "Export Stream (Orders)")
+
+# --- AdminService ---
+def _profiling_request_error(request):
+    if request.seconds < 0 or request.max_requests < 0:
+        return "seconds and max_requests must not be negative."
+    return None
+
+
+class AdminServiceServicer(order_api_pb2_grpc.AdminServiceServicer):
+    def __init__(self, profiler):
+        self.profiler = profiler
+
+    def StartProfiling(self, request, context):
+        error = _profiling_request_error(request)
+        if error:
+            context.set_code(grpc.StatusCode.INVALID_ARGUMENT); context.set_details(error)
+            return order_api_pb2.ProfilingSession()
+        try:
+            session = self.profiler.start(request.seconds, request.max_requests, request.methods)
+        except profiling.ProfilerBusyError as e:
+            context.set_code(grpc.StatusCode.FAILED_PRECONDITION); context.set_details(str(e))
+            return order_api_pb2.ProfilingSession(**self.profiler.status())
+        logger.info("Profiling started", extra={"output_dir": session["output_dir"]})
+        return order_api_pb2.ProfilingSession(**session)
+
+    def StopProfiling(self, request, context):
+        return order_api_pb2.ProfilingSession(**self.profiler.stop())
+
+
+def install_profiling_signal(profiler, loop=None):
+    """Makes SIGUSR2 start a PROFILE_DEFAULT_SECONDS session (POSIX only)."""
+    if not hasattr(signal, "SIGUSR2"):
+        return
+
+    def start():
+        try:
+            session = profiler.start()
+        except profiling.ProfilerBusyError:
+            return
+        logger.info("Profiling started by SIGUSR2", extra={"output_dir": session["output_dir"]})
+
+    if loop is not None:
+        loop.add_signal_handler(signal.SIGUSR2, start)
+    else:
+        signal.signal(signal.SIGUSR2, lambda signum, frame: start())
+
+# --- asyncio (grpc.aio) mode ---
+class AsyncDatabase:
+    """
+    asyncio front-end for Database, used by the grpc.aio servicers.
+
+    Reads run on a thread pool sized to the connection pool, so the event
+    loop never blocks on SQLite and at most pool_size queries run at once.
+    Writes await the WriteQueue future directly and hold no thread while
+    queued. Streams are read as keyset pages of AIO_PAGE_ROWS, so an open
+    stream holds no thread or connection between pages.
+    """
+
+    def __init__(self, db, max_workers=DB_POOL_SIZE):
+        self.db = db
+        self._executor = futures.ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="aio-db")
+
+    async def _read(self, fn, *args):
+        # Run in a copy of the task's context, so the read's span joins the RPC's trace.
+        return await asyncio.get_running_loop().run_in_executor(
+            self._executor, contextvars.copy_context().run, fn, *args)
+
+    async def _write(self, fn, *args):
+        return await asyncio.wrap_future(self.db.writer.submit(fn, *args))
+
+    def close(self):
+        self._executor.shutdown(wait=True)
+        self.db.close()
+
+    async def get_user_by_username(self, username):
+        return await self._read(self.db.get_user_by_username, username)
+
+    async def create_product(self, name, description, price):
+        return await self._write(self.db._insert_product, name, description, price)
+
+    async def import_products(self, rows):
+        return await self._write(self.db._insert_products, rows)
+
+    async def get_product(self, product_id):
+        return await self._read(self.db.get_product, product_id)
+
+    async def get_products(self, product_ids):
+        return await self._read(self.db.get_products, product_ids)
+
+    async def update_product(self, product_id, name, description, price):
+        return await self._write(self.db._update_product, product_id, name, description, price)
+
+    async def delete_product(self, product_id):
+        return await self._write(self.db._delete_product, product_id)
+
+    async def iter_product_pages(self, after=None, limit=None, page_rows=AIO_PAGE_ROWS):
+        """Yields lists of product rows in product_id order, starting just past `after`."""
+        remaining = limit
+        while remaining is None or remaining > 0:
+            size = page_rows if remaining is None else min(page_rows, remaining)
+            rows = await self._read(self.db.list_products, after, size)
+            if not rows:
+                return
+            yield rows
+            if len(rows) < size:
+                return
+            after = rows[-1]["product_id"]
+            if remaining is not None:
+                remaining -= len(rows)
+
+    def search_key(self, search_query):
+        return self.db.search_key(search_query)  # pure computation, no I/O
+
+    async def search_products(self, search_query, limit):
+        return await self._read(self.db.search_products, search_query, limit)
+
+    async def count_products(self):
+        return await self._read(self.db.count_products)
+
+    async def export_products(self):
+        return await self._read(self.db.export_products)
+
+    async def iter_export_product_pages(self, page_rows=AIO_PAGE_ROWS):
+        async for rows in self.iter_product_pages(page_rows=page_rows):
+            yield [dict(row) for row in rows]
+
+    async def create_order(self, user_id, items, idempotency_key=None):
+        items = [(item.product_id, item.quantity) for item in items]
+        return await self._write(self.db._insert_order, user_id, items, idempotency_key)
+
+    async def find_order_by_idempotency_key(self, user_id, idempotency_key):
+        return await self._read(self.db.find_order_by_idempotency_key, user_id, idempotency_key)
+
+    async def get_order(self, order_id):
+        return await self._read(self.db.get_order, order_id)
+
+    async def update_order_status(self, order_id, new_status):
+        return await self._write(self.db._update_order_status, order_id, new_status)
+
+    async def count_orders(self):
+        return await self._read(self.db.count_orders)
+
+    async def export_orders(self):
+        return await self._read(self.db.export_orders)
+
+    async def iter_export_order_pages(self, page_rows=AIO_PAGE_ROWS):
+        after = None
+        while True:
+            orders = await self._read(self.db.list_export_orders, after, page_rows)
+            if orders:
+                yield orders
+            if len(orders) < page_rows:
+                return
+            after = orders[-1]["order_id"]
+
+
+async def _relay_stream_async(messages, context, stream_name):
+    """Async counterpart of _relay_stream for the grpc.aio servicers."""
+    try:
+        async for message in messages:
+            yield message
+    except asyncio.CancelledError:
+        logger.info("Stream cancelled by the client", extra={"stream": stream_name})
+        raise
+    except Exception as e:
+        logger.exception("Stream failed with an internal error", extra={"stream": stream_name})
+        context.set_code(grpc.StatusCode.INTERNAL)
+        context.set_details(f"An internal error occurred: {e}")
+    finally:
+        await messages.aclose()
+
+    logger.debug("Stream finished", extra={"stream": stream_name})
+
+
+class AsyncAuthServiceServicer(order_api_pb2_grpc.AuthServiceServicer):
+    def __init__(self, db, verifier=None, rate_limiter=None):
+        self.db = db
+        self.verifier = verifier if verifier is not None else PasswordVerifier()
+        self.rate_limiter = rate_limiter if rate_limiter is not None else LoginRateLimiter()
+
+    async def Login(self, request, context):
+        logger.debug("Login attempt", extra={"username": request.username})
+        refusal = _login_refusal(self.rate_limiter, request, context)
+        if refusal:
+            context.set_code(grpc.StatusCode.RESOURCE_EXHAUSTED); context.set_details(refusal)
+            return order_api_pb2.LoginResponse()
+        user_row = await self.db.get_user_by_username(request.username)
+        encoded = user_row["password_hash"] if user_row else passwords.dummy_hash()
+        try:
+            verified = await asyncio.wait_for(
+                asyncio.wrap_future(self.verifier.submit(request.password, encoded)), LOGIN_HASH_TIMEOUT)
+        except LoginBusyError:
+            context.set_code(grpc.StatusCode.RESOURCE_EXHAUSTED)
+            context.set_details("Too many logins in progress; try again shortly.")
+            return order_api_pb2.LoginResponse()
+        except asyncio.TimeoutError:
+            logger.warning("Login timed out verifying the password", extra={"username": request.username})
+            context.set_code(grpc.StatusCode.UNAVAILABLE)
+            context.set_details("Login timed out; try again shortly.")
+            return order_api_pb2.LoginResponse()
+
+        if user_row and verified:
+            return _login_response(user_row)
+        logger.info("Login failed: invalid credentials", extra={"username": request.username})
+        context.set_code(grpc.StatusCode.UNAUTHENTICATED)
+        context.set_details("Invalid username or password")
+        return order_api_pb2.LoginResponse()
+
+
+class AsyncProductServiceServicer(order_api_pb2_grpc.ProductServiceServicer):
+    def __init__(self, db, cache=None, search_cache=None):
+        self.db = db
+        self.cache = cache if cache is not None else ProductCache()
+        self.search_cache = search_cache if search_cache is not None else SearchCache()
+
+    def _forget(self, product_id):
+        """Drops cached reads that a mutation of product_id may have made stale."""
+        self.cache.invalidate(product_id)
+        self.search_cache.invalidate_all()
+
+    async def CreateProduct(self, request, context):
+        row = await self.db.create_product(request.name, request.description, request.price)
+        if row is None:
+            context.set_code(grpc.StatusCode.INTERNAL)
+            context.set_details("Failed to create product or retrieve it after creation.")
+            return order_api_pb2.Product()
+        self._forget(row["product_id"])
+        return order_api_pb2.Product(**row)
+
+    async def ImportProducts(self, request_iterator, context):
+        logger.debug("Stream started")
+        progress = _ProductImport()
+
+        async def flush(batch):
+            try:
+                progress.imported(await self.db.import_products(batch))
+            except sqlite3.Error as e:
+                progress.failed(batch, e)
+
+        async for request in request_iterator:
+            for product in request.products:
+                batch = progress.add(product)
+                if batch:
+                    await flush(batch)
+        batch = progress.take()
+        if batch:
+            await flush(batch)
+        return progress.finish(self.search_cache)
+
+    async def GetProduct(self, request, context):
+        product = self.cache.get(request.product_id)
+        if product is not None:
+            return product
+        generation = self.cache.generation()
+        row = await self.db.get_product(request.product_id)
+        if not row:
+            context.set_code(grpc.StatusCode.NOT_FOUND); context.set_details("Product not found.")
+            return order_api_pb2.Product()
+        product = order_api_pb2.Product(**row)
+        self.cache.put(request.product_id, product, generation)
+        return product
+
+    async def BatchGetProducts(self, request, context):
+        if len(request.product_ids) > MAX_BATCH_GET_IDS:
+            context.set_code(grpc.StatusCode.INVALID_ARGUMENT)
+            context.set_details(f"At most {MAX_BATCH_GET_IDS} product_ids per request.")
+            return order_api_pb2.BatchGetProductsResponse()
+        product_ids = list(dict.fromkeys(request.product_ids))
+        found, misses = _split_cached_products(self.cache, product_ids)
+        generation = self.cache.generation()
+        rows = await self.db.get_products(misses) if misses else []
+        return _batch_get_response(product_ids, found, rows, self.cache, generation)
+
+    async def UpdateProduct(self, request, context):
+        row = await self.db.update_product(request.product_id, request.name, request.description, request.price)
+        self._forget(request.product_id)
+        if not row:
+            context.set_code(grpc.StatusCode.NOT_FOUND); context.set_details("Product not found to update.")
+            return order_api_pb2.Product()
+        return order_api_pb2.Product(**row)
+
+    async def DeleteProduct(self, request, context):
+        success = await self.db.delete_product(request.product_id)
+        self._forget(request.product_id)
+        return order_api_pb2.DeleteProductResponse(success=success)
+
+    async def _page_rows(self, request, context, page_rows=AIO_PAGE_ROWS):
+        """
+        Yields the product rows of one ListProducts page in lists of up to
+        page_rows, and sets the next-page token trailer. Yields nothing if
+        the request is invalid.
+        """
+        try:
+            after, page_size = _parse_page_request(request)
+        except ValueError as e:
+            context.set_code(grpc.StatusCode.INVALID_ARGUMENT)
+            context.set_details(str(e))
+            return
+
+        # Fetch one extra row to learn whether another page follows.
+        limit = page_size + 1 if page_size else None
+        sent = 0
+        async for rows in self.db.iter_product_pages(after, limit, page_rows):
+            if page_size and sent + len(rows) > page_size:
+                rows = rows[:page_size - sent]
+                if rows:
+                    yield rows
+                last_id = rows[-1]["product_id"] if rows else after
+                context.set_trailing_metadata(((NEXT_PAGE_TOKEN_KEY, encode_page_token(last_id)),))
+                return
+            sent += len(rows)
+            after = rows[-1]["product_id"]
+            yield rows
+
+    async def _search_rows(self, request):
+        limit = _search_limit(request)
+        logger.debug("Stream started", extra={"search_query": request.search_query, "limit": limit})
+        key = (self.db.search_key(request.search_query), limit)
+        rows = self.search_cache.get(key)
+        if rows is None:
+            generation = self.search_cache.generation()
+            rows = await self.db.search_products(request.search_query, limit)
+            self.search_cache.put(key, rows, generation)
+        return rows
+
+    async def ListProducts(self, request, context):
+        logger.debug("Stream started")
+
+        async def products():
+            async for rows in self._page_rows(request, context):
+                for row in rows:
+                    yield order_api_pb2.Product(**row)
+
+        async for product in _relay_stream_async(products(), context, "Product Stream (ทั้งหมด)"):
+            yield product
+
+    async def SearchProducts(self, request, context):
+        async def products():
+            for row in await self._search_rows(request):
+                yield order_api_pb2.Product(**row)
+
+        async for product in _relay_stream_async(products(), context, "Product Stream (Search)"):
+            yield product
+
+    async def ListProductsBatched(self, request, context):
+        logger.debug("Stream started")
+        batch_size = _batch_size(request.batch_size)
+
+        async def batches():
+            # Pages are read batch_size rows at a time, so each page is one batch
+            # unless it has to be split to stay under MAX_BATCH_BYTES.
+            async for rows in self._page_rows(request, context, page_rows=batch_size):
+                for batch in _product_batches(rows, batch_size):
+                    yield batch
+
+        async for batch in _relay_stream_async(batches(), context, "Product Stream (ทั้งหมด, Batched)"):
+            yield batch
+
+    async def SearchProductsBatched(self, request, context):
+        async def batches():
+            for batch in _product_batches(await self._search_rows(request), request.batch_size):
+                yield batch
+
+        async for batch in _relay_stream_async(batches(), context, "Product Stream (Search, Batched)"):
+            yield batch
+
+    async def CountProducts(self, request, context):
+        count = await self.db.count_products()
+        return order_api_pb2.CountResponse(count=count)
+
+    async def ExportProducts(self, request, context):
+        json_data = await self.db.export_products()
+        return order_api_pb2.ExportResponse(json_data=json_data)
+
+    async def ExportProductsStream(self, request, context):
+        logger.debug("Stream started")
+
+        async def chunks():
+            async for records in self.db.iter_export_product_pages():
+                for chunk in _ndjson_chunks(records):
+                    yield chunk
+
+        async for chunk in _relay_stream_async(chunks(), context, "Export Stream (Products)"):
+            yield chunk
+
+
+class AsyncOrderServiceServicer(order_api_pb2_grpc.OrderServiceServicer):
+    def __init__(self, db, idempotency_cache=None):
+        self.db = db
+        self.idempotency_cache = idempotency_cache if idempotency_cache is not None else IdempotencyCache()
+
+    async def _replayed_order(self, user_id, idempotency_key):
+        key = (user_id, idempotency_key)
+        order_id = self.idempotency_cache.get(key)
+        if order_id is not None:
+            return await self.db.get_order(order_id)
+        order_row, item_rows = await self.db.find_order_by_idempotency_key(*key)
+        if order_row:
+            self.idempotency_cache.put(key, order_row["order_id"])
+        return order_row, item_rows
+
+    async def CreateOrder(self, request, context):
+        error = _order_request_error(request)
+        if error:
+            context.set_code(grpc.StatusCode.INVALID_ARGUMENT); context.set_details(error)
+            return order_api_pb2.Order()
+        user_id, error = _order_user_id(request)
+        if error:
+            context.set_code(grpc.StatusCode.PERMISSION_DENIED); context.set_details(error)
+            return order_api_pb2.Order()
+        if request.idempotency_key:
+            order_row, item_rows = await self._replayed_order(user_id, request.idempotency_key)
+            if order_row:
+                return _order_message(order_row, item_rows)
+        try:
+            order_row, item_rows = await self.db.create_order(user_id, request.items, request.idempotency_key)
+        except UnknownProductsError as e:
+            context.set_code(grpc.StatusCode.INVALID_ARGUMENT); context.set_details(str(e))
+            return order_api_pb2.Order()
+        if not order_row:
+            context.set_code(grpc.StatusCode.INTERNAL); context.set_details("Failed to create order.")
+            return order_api_pb2.Order()
+        if request.idempotency_key:
+            self.idempotency_cache.put((user_id, request.idempotency_key), order_row["order_id"])
+        return _order_message(order_row, item_rows)
+
+    async def GetOrder(self, request, context):
+        order_row, item_rows = await self.db.get_order(request.order_id)
+        if not order_row:
+            context.set_code(grpc.StatusCode.NOT_FOUND); context.set_details("Order not found.")
+            return order_api_pb2.Order()
+        return _order_message(order_row, item_rows)
+
+    async def UpdateOrderStatus(self, request, context):
+        order_row, item_rows = await self.db.update_order_status(request.order_id, request.new_status)
+        if not order_row:
+            context.set_code(grpc.StatusCode.NOT_FOUND); context.set_details("Order not found to update.")
+            return order_api_pb2.Order()
+        return _order_message(order_row, item_rows)
+
+    async def CountOrders(self, request, context):
+        count = await self.db.count_orders()
+        return order_api_pb2.CountResponse(count=count)
+
+    async def ExportOrders(self, request, context):
+        json_data = await self.db.export_orders()
+        return order_api_pb2.ExportResponse(json_data=json_data)
+
+    async def ExportOrdersStream(self, request, context):
+        logger.debug("Stream started")
+
+        async def chunks():
+            async for orders in self.db.iter_export_order_pages():
+                for chunk in _ndjson_chunks(orders):
+                    yield chunk
+
+        async for chunk in _relay_stream_async(chunks(), context, "Export Stream (Orders)"):
+            yield chunk
+
+class AsyncAdminServiceServicer(order_api_pb2_grpc.AdminServiceServicer):
+    def __init__(self, profiler):
+        self.profiler = profiler
+
+    async def StartProfiling(self, request, context):
+        error = _profiling_request_error(request)
+        if error:
+            context.set_code(grpc.StatusCode.INVALID_ARGUMENT); context.set_details(error)
+            return order_api_pb2.ProfilingSession()
+        try:
+            session = self.profiler.start(request.seconds, request.max_requests, request.methods)
+        except profiling.ProfilerBusyError as e:
+            context.set_code(grpc.StatusCode.FAILED_PRECONDITION); context.set_details(str(e))
+            return order_api_pb2.ProfilingSession(**self.profiler.status())
+        logger.info("Profiling started", extra={"output_dir": session["output_dir"]})
+        return order_api_pb2.ProfilingSession(**session)
+
+    async def StopProfiling(self, request, context):
+        # stop() waits for the sampler to write its output; keep that off the event loop.
+        session = await asyncio.get_running_loop().run_in_executor(None, self.profiler.stop)
+        return order_api_pb2.ProfilingSession(**session)
+
 # --- Server Startup  ---
-def serve():
-    db = Database(DATABASE_NAME)
-    server = grpc.server(futures.ThreadPoolExecutor(max_workers=10))
-    
-    order_api_pb2_grpc.add_AuthServiceServicer_to_server(AuthServiceServicer(db), server)
-    order_api_pb2_grpc.add_ProductServiceServicer_to_server(ProductServiceServicer(db), server)
+def create_server(db, address=SERVER_ADDRESS, options=None, cache=None, verifier=None, search_cache=None,
+                  rate_limiter=None, profiler=None):
+    """Builds the thread-pool server with all services bound to `address` (not yet started)."""
+    profiler = profiler if profiler is not None else profiling.Profiler()
+    server = grpc.server(futures.ThreadPoolExecutor(max_workers=MAX_WORKERS),
+                         interceptors=[metrics.MetricsInterceptor(), RequestLogInterceptor(),
+                                       tracing.TracingInterceptor(), AuthInterceptor(),
+                                       profiling.ProfilingInterceptor(profiler)],
+                         options=options)
+
+    order_api_pb2_grpc.add_AuthServiceServicer_to_server(AuthServiceServicer(db, verifier, rate_limiter), server)
+    order_api_pb2_grpc.add_ProductServiceServicer_to_server(ProductServiceServicer(db, cache, search_cache), server)
     order_api_pb2_grpc.add_OrderServiceServicer_to_server(OrderServiceServicer(db), server)
-    
-    port = '0.0.0.0:50051'
-    server.add_insecure_port(port)
+    order_api_pb2_grpc.add_AdminServiceServicer_to_server(AdminServiceServicer(profiler), server)
+
+    server.add_insecure_port(address)
+    return server
+
+
+def _start_metrics_endpoint(port):
+    if port:
+        metrics.start_http_server(port)
+        logger.info("Metrics endpoint started", extra={"url": f"http://{metrics.METRICS_ADDRESS}:{port}/metrics"})
+
+
+def serve(address=SERVER_ADDRESS, metrics_port=None):
+    _start_metrics_endpoint(metrics_port)
+    db = Database(DATABASE_NAME, pool_size=DB_POOL_SIZE)
+    verifier = PasswordVerifier()
+    profiler = profiling.Profiler()
+    server = create_server(db, address, verifier=verifier, profiler=profiler)
+    install_profiling_signal(profiler)
     
     server.start()
     
-    print(f"✅ gRPC server started and listening on {port}")
+    logger.info("gRPC server started", extra={"address": address})
     
     try:
         server.wait_for_termination()
     except KeyboardInterrupt:
-        print("Stopping server...")
+        logger.info("Stopping server")
         server.stop(0)
+        verifier.close()
+        db.close()
+
+
+async def serve_aio(address=SERVER_ADDRESS, metrics_port=None):
+    """
+    Runs the same services on a grpc.aio server: every RPC is a coroutine on
+    one event loop, so concurrent streams are not capped by MAX_WORKERS.
+    """
+    _start_metrics_endpoint(metrics_port)
+    db = AsyncDatabase(Database(DATABASE_NAME, pool_size=DB_POOL_SIZE))
+    verifier = PasswordVerifier()
+    profiler = profiling.Profiler()
+    server = grpc.aio.server(interceptors=[metrics.AsyncMetricsInterceptor(), AsyncRequestLogInterceptor(),
+                                           tracing.AsyncTracingInterceptor(), AsyncAuthInterceptor(),
+                                           profiling.AsyncProfilingInterceptor(profiler)])
+
+    order_api_pb2_grpc.add_AuthServiceServicer_to_server(AsyncAuthServiceServicer(db, verifier), server)
+    order_api_pb2_grpc.add_ProductServiceServicer_to_server(AsyncProductServiceServicer(db), server)
+    order_api_pb2_grpc.add_OrderServiceServicer_to_server(AsyncOrderServiceServicer(db), server)
+    order_api_pb2_grpc.add_AdminServiceServicer_to_server(AsyncAdminServiceServicer(profiler), server)
+    install_profiling_signal(profiler, asyncio.get_running_loop())
+
+    server.add_insecure_port(address)
+    await server.start()
+
+    logger.info("gRPC aio server started", extra={"address": address})
+
+    try:
+        await server.wait_for_termination()
+    finally:
+        logger.info("Stopping server")
+        await server.stop(0)
+        verifier.close()
+        db.close()
 
 if __name__ == '__main__':
-    print("Starting gRPC server...")
-    serve()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Order API gRPC server")
+    parser.add_argument("--aio", action="store_true",
+                        help="Serve with grpc.aio (asyncio) instead of the thread-pool server")
+    parser.add_argument("--address", default=SERVER_ADDRESS)
+    parser.add_argument("--metrics-port", type=int, default=None,
+                        help="Serve Prometheus metrics on http://127.0.0.1:PORT/metrics")
+    parser.add_argument("--log-level", default=LOG_LEVEL, choices=["DEBUG", "INFO", "WARNING", "ERROR"])
+    parser.add_argument("--trace-file", default=tracing.TRACE_FILE,
+                        help="Append trace spans to this file (empty: no tracing)")
+    parser.add_argument("--trace-sample-rate", type=float, default=TRACE_SAMPLE_RATE,
+                        help="Fraction of untraced incoming calls that start a trace")
+    args = parser.parse_args()
+
+    logs.configure_logging(args.log_level)
+    tracing.configure_tracing("order-api", args.trace_file, args.trace_sample_rate)
+    logger.info("Starting gRPC server")
+    if args.aio:
+        try:
+            asyncio.run(serve_aio(args.address, args.metrics_port))
+        except KeyboardInterrupt:
+            pass
+    else:
+        serve(args.address, args.metrics_port)
@@ -0,0 +1,282 @@
+"""
+Multi-process supervisor for the Order API server.
+
+The servicers are GIL-bound (JWT decoding, protobuf construction), so one
+server process tops out at one core. The supervisor runs N worker processes,
+each a full thread-pool server bound to the same port with SO_REUSEPORT
+(Linux), and the kernel spreads incoming connections across them.
+
+Workers are started with the "spawn" method: gRPC's threads don't survive
+fork(). They share the SQLite database; each has its own reader pool, writer
+thread and product cache.
+
+    python supervisor.py --workers 4
+    kill -HUP <supervisor pid>    # rolling restart, one worker at a time
+    kill -TERM <supervisor pid>   # graceful shutdown
+
+Every worker reports its pool, writer and cache counters every
+--metrics-interval seconds. The supervisor writes them, with totals across
+the live workers, to --metrics-file as JSON. With --metrics-port PORT,
+worker N also serves its Prometheus metrics on 127.0.0.1:PORT+N/metrics.
+
+To profile one worker, send it SIGUSR2 (or call AdminService.StartProfiling,
+which profiles whichever worker the connection lands on).
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import queue
+import signal
+import time
+
+import logs
+import metrics
+import profiling
+import server
+import tracing
+
+DEFAULT_WORKERS = os.cpu_count() or 1
+WORKER_READY_TIMEOUT = 30.0  # seconds a new worker gets to bind its port
+WORKER_STOP_GRACE = 10.0  # seconds in-flight RPCs get to finish on shutdown
+METRICS_INTERVAL = 5.0  # seconds between worker metric reports
+METRICS_FILE = "supervisor_metrics.json"
+
+
+class _WorkerShutdown(Exception):
+    pass
+
+
+def _raise_worker_shutdown(signum, frame):
+    signal.signal(signal.SIGTERM, signal.SIG_IGN)
+    raise _WorkerShutdown()
+
+
+def _worker_snapshot(slot, db, cache, search_cache):
+    return {
+        "slot": slot,
+        "pid": os.getpid(),
+        "pool": db.pool.stats(),
+        "writer": db.writer.stats(),
+        "product_cache": cache.stats(),
+        "search_cache": search_cache.stats(),
+    }
+
+
+def _worker_main(slot, address, db_name, metrics_queue, ready, metrics_interval, metrics_port=None,
+                 log_level=server.LOG_LEVEL, trace_file=tracing.TRACE_FILE,
+                 trace_sample_rate=server.TRACE_SAMPLE_RATE):
+    """Entry point of one worker process: serves until SIGTERM, then drains and exits."""
+    logs.configure_logging(log_level)
+    tracing.configure_tracing("order-api", trace_file, trace_sample_rate)
+    # Ctrl-C reaches the whole process group; only the supervisor acts on it.
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, _raise_worker_shutdown)
+    # Don't hang on exit flushing metrics nobody will read.
+    metrics_queue.cancel_join_thread()
+
+    if metrics_port:
+        # A replacement binds the port while its predecessor still holds it.
+        metrics.start_http_server(metrics_port + slot, reuse_port=True)
+    db = server.Database(db_name, pool_size=server.DB_POOL_SIZE)
+    cache = server.ProductCache()
+    search_cache = server.SearchCache()
+    verifier = server.PasswordVerifier()
+    profiler = profiling.Profiler()
+    grpc_server = server.create_server(db, address, options=[("grpc.so_reuseport", 1)],
+                                       cache=cache, verifier=verifier, search_cache=search_cache,
+                                       profiler=profiler)
+    server.install_profiling_signal(profiler)
+    try:
+        grpc_server.start()
+        ready.set()
+        print(f"Worker {slot} (pid {os.getpid()}) listening on {address}")
+        while True:
+            time.sleep(metrics_interval)
+            metrics_queue.put(_worker_snapshot(slot, db, cache, search_cache))
+    except _WorkerShutdown:
+        pass
+    finally:
+        grpc_server.stop(WORKER_STOP_GRACE).wait()
+        verifier.close()
+        db.close()
+        print(f"Worker {slot} (pid {os.getpid()}) stopped")
+
+
+def _aggregate(snapshots):
+    """Sums every numeric counter across worker snapshots; high-water marks (max_*, *_max) take the max."""
+    total = {}
+    for snapshot in snapshots:
+        for section, counters in snapshot.items():
+            if not isinstance(counters, dict):
+                continue
+            merged = total.setdefault(section, {})
+            for key, value in counters.items():
+                if key.startswith("max_") or key.endswith("_max"):
+                    merged[key] = max(merged.get(key, value), value)
+                else:
+                    merged[key] = merged.get(key, 0) + value
+    return total
+
+
+class Supervisor:
+    def __init__(self, num_workers=DEFAULT_WORKERS, address=server.SERVER_ADDRESS,
+                 db_name=server.DATABASE_NAME, metrics_interval=METRICS_INTERVAL,
+                 metrics_file=METRICS_FILE, metrics_port=None, log_level=server.LOG_LEVEL,
+                 trace_file=tracing.TRACE_FILE, trace_sample_rate=server.TRACE_SAMPLE_RATE):
+        self.num_workers = num_workers
+        self.address = address
+        self.db_name = db_name
+        self.metrics_interval = metrics_interval
+        self.metrics_file = metrics_file
+        self.metrics_port = metrics_port
+        self.log_level = log_level
+        self.trace_file = trace_file
+        self.trace_sample_rate = trace_sample_rate
+        self._ctx = multiprocessing.get_context("spawn")
+        self._metrics_queue = self._ctx.Queue()
+        self._workers = {}  # slot -> Process
+        self._snapshots = {}  # slot -> latest snapshot from the worker in that slot
+        self._restarts = 0
+        self._stopping = False
+        self._restart_requested = False
+
+    def _spawn(self, slot):
+        """Starts a worker for `slot` and waits until it is serving; raises RuntimeError if it doesn't."""
+        ready = self._ctx.Event()
+        process = self._ctx.Process(
+            target=_worker_main, name=f"order-api-worker-{slot}",
+            args=(slot, self.address, self.db_name, self._metrics_queue, ready, self.metrics_interval,
+                  self.metrics_port, self.log_level, self.trace_file, self.trace_sample_rate))
+        process.start()
+        deadline = time.monotonic() + WORKER_READY_TIMEOUT
+        while not ready.wait(0.1):
+            if not process.is_alive() or time.monotonic() > deadline:
+                self._stop_worker(process)
+                raise RuntimeError(f"worker {slot} failed to start (exit code {process.exitcode})")
+        return process
+
+    def _stop_worker(self, process):
+        if process.is_alive():
+            process.terminate()  # SIGTERM: the worker drains in-flight RPCs and exits
+            process.join(WORKER_STOP_GRACE + 5)
+        if process.is_alive():
+            process.kill()
+            process.join()
+
+    def start(self):
+        # Create the schema once, before workers race to initialize it.
+        server.Database(self.db_name, pool_size=1).close()
+        for slot in range(self.num_workers):
+            self._workers[slot] = self._spawn(slot)
+        print(f"✅ Supervisor (pid {os.getpid()}) started {self.num_workers} workers on {self.address}")
+
+    def rolling_restart(self):
+        """
+        Replaces workers one at a time. Each replacement is serving on the
+        shared port before its predecessor stops, so the port never goes dark.
+        """
+        print("Rolling restart...")
+        for slot in sorted(self._workers):
+            try:
+                replacement = self._spawn(slot)
+            except RuntimeError as e:
+                print(f"Rolling restart aborted, keeping the running workers: {e}")
+                return
+            previous, self._workers[slot] = self._workers[slot], replacement
+            self._stop_worker(previous)
+            self._snapshots.pop(slot, None)
+            self._restarts += 1
+        print("Rolling restart finished")
+
+    def _respawn_dead_workers(self):
+        for slot, process in list(self._workers.items()):
+            if process.is_alive():
+                continue
+            print(f"Worker {slot} (pid {process.pid}) exited with code {process.exitcode}, restarting")
+            self._snapshots.pop(slot, None)
+            try:
+                self._workers[slot] = self._spawn(slot)
+                self._restarts += 1
+            except RuntimeError as e:
+                print(f"Restart failed, will retry: {e}")
+
+    def _collect_metrics(self, timeout):
+        try:
+            snapshot = self._metrics_queue.get(timeout=timeout)
+        except queue.Empty:
+            return
+        process = self._workers.get(snapshot["slot"])
+        # Drop late reports from a worker that has since been replaced.
+        if process is not None and process.pid == snapshot["pid"]:
+            self._snapshots[snapshot["slot"]] = snapshot
+
+    def metrics(self):
+        return {
+            "updated_at": time.time(),
+            "workers": len(self._workers),
+            "worker_restarts": self._restarts,
+            "total": _aggregate(self._snapshots.values()),
+            "per_worker": {str(slot): self._snapshots[slot] for slot in sorted(self._snapshots)},
+        }
+
+    def _write_metrics(self):
+        tmp_path = self.metrics_file + ".part"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.metrics(), f, indent=2)
+        os.replace(tmp_path, self.metrics_file)
+
+    def _request_stop(self, signum, frame):
+        self._stopping = True
+
+    def _request_restart(self, signum, frame):
+        self._restart_requested = True
+
+    def run(self):
+        signal.signal(signal.SIGTERM, self._request_stop)
+        signal.signal(signal.SIGINT, self._request_stop)
+        signal.signal(signal.SIGHUP, self._request_restart)
+        self.start()
+        next_write = time.monotonic() + self.metrics_interval
+        try:
+            while not self._stopping:
+                self._collect_metrics(timeout=0.5)
+                if self._restart_requested:
+                    self._restart_requested = False
+                    self.rolling_restart()
+                self._respawn_dead_workers()
+                if self.metrics_file and time.monotonic() >= next_write:
+                    self._write_metrics()
+                    next_write = time.monotonic() + self.metrics_interval
+        finally:
+            self.stop()
+
+    def stop(self):
+        print("Stopping workers...")
+        for process in self._workers.values():
+            if process.is_alive():
+                process.terminate()
+        for process in self._workers.values():
+            self._stop_worker(process)
+        self._workers.clear()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Run the Order API server as several SO_REUSEPORT worker processes")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS, help="Worker processes (default: CPU count)")
+    parser.add_argument("--address", default=server.SERVER_ADDRESS)
+    parser.add_argument("--db", default=server.DATABASE_NAME, help="SQLite database file")
+    parser.add_argument("--metrics-interval", type=float, default=METRICS_INTERVAL)
+    parser.add_argument("--metrics-file", default=METRICS_FILE, help="Where to write aggregated worker metrics")
+    parser.add_argument("--metrics-port", type=int, default=None,
+                        help="Base port for per-worker Prometheus endpoints (worker N uses PORT+N)")
+    parser.add_argument("--log-level", default=server.LOG_LEVEL, choices=["DEBUG", "INFO", "WARNING", "ERROR"],
+                        help="Log level of the workers' server logs")
+    parser.add_argument("--trace-file", default=tracing.TRACE_FILE,
+                        help="File every worker appends its trace spans to (empty: no tracing)")
+    parser.add_argument("--trace-sample-rate", type=float, default=server.TRACE_SAMPLE_RATE,
+                        help="Fraction of untraced incoming calls that start a trace")
+    args = parser.parse_args()
+
+    Supervisor(args.workers, args.address, args.db, args.metrics_interval, args.metrics_file,
+               args.metrics_port, args.log_level, args.trace_file, args.trace_sample_rate).run()
@@ -0,0 +1,475 @@
+"""
+Distributed tracing across the AI agent, the gRPC gateway and SQLite.
+
+A trace is a tree of spans sharing a trace ID. Its context crosses the wire
+as a W3C `traceparent` gRPC metadata entry ("00-<trace id>-<span id>-01"),
+so a client's spans (an agent turn, its Ollama calls, each RPC it makes) and
+the server's (each RPC and each Database operation it runs) join into one
+trace. Spans are appended as JSON lines to a file, the local stand-in for a
+collector; several processes may share the file.
+
+    python server.py                          # server spans for traced calls
+    python Ai_agent/run_qwen.py               # one trace per chat turn
+    python tracing.py traces.jsonl --last 1   # latency breakdown per trace
+
+    trace 4bf92f3577b34da6a3ce929d0e0e4736  1843.2 ms
+      agent.turn                                 1843.2 ms  order-agent  internal
+        ollama.chat                              1210.4 ms  order-agent  client
+        tool create_order                          21.7 ms  order-agent  internal
+          my_api.v1.OrderService/CreateOrder       21.1 ms  order-agent  client
+            my_api.v1.OrderService/CreateOrder     17.9 ms  order-api    server
+              db find_order_by_idempotency_key      0.3 ms  order-api    client
+              db insert_order                      16.8 ms  order-api    client
+        ollama.chat                               604.9 ms  order-agent  client
+
+Spans are written by a background thread through a bounded queue; when it
+falls behind, finished spans are dropped and counted in
+metrics.TRACE_SPANS_DROPPED rather than blocking the caller. Until
+configure_tracing() is called, and for traces that aren't sampled, spans
+record nothing.
+"""
+import argparse
+import atexit
+import contextvars
+import json
+import os
+import queue
+import random
+import re
+import sys
+import threading
+import time
+from collections import defaultdict, namedtuple
+
+import grpc
+
+import handlers
+import metrics
+
+TRACE_FILE = "traces.jsonl"
+TRACE_QUEUE_SIZE = 10000  # finished spans waiting for the exporter before new ones are dropped
+EXPORT_BATCH_SPANS = 512  # spans appended to the file per write
+TRACEPARENT_KEY = "traceparent"
+
+INTERNAL, SERVER, CLIENT = "internal", "server", "client"
+
+SpanContext = namedtuple("SpanContext", "trace_id span_id sampled")
+_TRACEPARENT = re.compile(r"^00-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})$")
+_current_span = contextvars.ContextVar("current_span", default=None)
+
+
+class _NoopSpan:
+    """Stands in for a span that isn't recorded; while current, its children aren't either."""
+
+    __slots__ = ("_token",)
+    recording = False
+
+    def set_attribute(self, key, value):
+        pass
+
+    def set_status(self, status):
+        pass
+
+    def end(self, status=None):
+        pass
+
+    def __enter__(self):
+        self._token = _current_span.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        _restore(self._token)
+
+
+class Span:
+    """
+    One timed operation. end() records it; used as a context manager it is
+    also the current span (the parent of spans started inside it) until the
+    block exits, and ends then.
+    """
+
+    recording = True
+
+    def __init__(self, tracer, name, kind, trace_id, parent_id, attributes=None):
+        self.tracer = tracer
+        self.name = name
+        self.kind = kind
+        self.trace_id = trace_id
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent_id
+        self.attributes = dict(attributes) if attributes else {}
+        self.status = None
+        self.start_time = time.time_ns()
+        self._started = time.perf_counter_ns()
+        self._ended = False
+        self._token = None
+
+    def set_attribute(self, key, value):
+        self.attributes[key] = value
+
+    def set_status(self, status):
+        """"OK" or "ERROR"; a span ended without one is OK."""
+        self.status = status
+
+    def traceparent(self):
+        return f"00-{self.trace_id}-{self.span_id}-01"
+
+    def end(self, status=None):
+        if self._ended:
+            return
+        self._ended = True
+        if status is not None:
+            self.status = status
+        self.tracer.export(self, time.perf_counter_ns() - self._started)
+
+    def __enter__(self):
+        self._token = _current_span.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        _restore(self._token)
+        # GeneratorExit is a generator closed early (a paged read, a stream the client stopped reading), not a failure.
+        if exc_type is not None and not issubclass(exc_type, GeneratorExit) and self.status is None:
+            self.status = "ERROR"
+            self.attributes.setdefault("error", f"{exc_type.__name__}: {exc}")
+        self.end()
+
+
+def _restore(token):
+    try:
+        _current_span.reset(token)
+    except ValueError:
+        pass  # a generator closed from another context; that context never saw the span
+
+
+class FileExporter:
+    """Appends finished spans to `path` as JSON lines from a background thread."""
+
+    def __init__(self, path, queue_size=TRACE_QUEUE_SIZE):
+        self.path = path
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._thread = threading.Thread(target=self._run, name="trace-exporter", daemon=True)
+        self._thread.start()
+
+    def export(self, record):
+        try:
+            self._queue.put_nowait(record)
+        except queue.Full:
+            metrics.TRACE_SPANS_DROPPED.inc()
+
+    def _run(self):
+        fd = None
+        running = True
+        while running:
+            batch = []
+            record = self._queue.get()
+            while record is not None:
+                batch.append(record)
+                if len(batch) >= EXPORT_BATCH_SPANS:
+                    break
+                try:
+                    record = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+            running = record is not None
+            if not batch:
+                continue
+            data = "".join(json.dumps(span, default=str, ensure_ascii=False) + "\n" for span in batch)
+            try:
+                if fd is None:
+                    fd = os.open(self.path, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+                # One O_APPEND write per batch, so batches from other processes don't interleave with it.
+                os.write(fd, data.encode("utf-8"))
+            except OSError:
+                metrics.TRACE_SPANS_DROPPED.inc(amount=len(batch))
+        if fd is not None:
+            os.close(fd)
+
+    def shutdown(self):
+        """Writes out the queued spans and stops the exporter thread."""
+        self._queue.put(None)  # blocking: a full queue still drains
+        self._thread.join()
+
+
+class Tracer:
+    """Starts spans for one service and hands the finished ones to `exporter`."""
+
+    def __init__(self, service, exporter, sample_rate=1.0):
+        self.service = service
+        self.exporter = exporter
+        self.sample_rate = sample_rate
+
+    def start_span(self, name, kind=INTERNAL, attributes=None, parent=None):
+        """
+        A new span under `parent` (a Span or a remote SpanContext); without one
+        it starts a new trace, recorded at sample_rate.
+        """
+        if parent is None:
+            if self.sample_rate < 1.0 and random.random() >= self.sample_rate:
+                return _NoopSpan()
+            return Span(self, name, kind, os.urandom(16).hex(), None, attributes)
+        if isinstance(parent, Span):
+            return Span(self, name, kind, parent.trace_id, parent.span_id, attributes)
+        if isinstance(parent, SpanContext) and parent.sampled:
+            return Span(self, name, kind, parent.trace_id, parent.span_id, attributes)
+        return _NoopSpan()
+
+    def export(self, span, duration_ns):
+        self.exporter.export({
+            "trace_id": span.trace_id,
+            "span_id": span.span_id,
+            "parent_span_id": span.parent_id,
+            "name": span.name,
+            "kind": span.kind,
+            "service": self.service,
+            "pid": os.getpid(),
+            "start_time_unix_nano": span.start_time,
+            "duration_ms": round(duration_ns / 1e6, 3),
+            "status": span.status or "OK",
+            "attributes": span.attributes,
+        })
+
+
+_tracer = None
+_CURRENT = object()
+
+
+def configure_tracing(service, path=TRACE_FILE, sample_rate=1.0):
+    """
+    Exports this process's spans, as `service`, to `path` (appending); an
+    empty path turns tracing off. New traces are started for `sample_rate`
+    of the root operations; a call that arrives with a sampled traceparent is
+    always traced. Safe to call again.
+    """
+    global _tracer
+    shutdown_tracing()
+    if path:
+        _tracer = Tracer(service, FileExporter(path), sample_rate)
+    return _tracer
+
+
+def shutdown_tracing():
+    """Writes out the finished spans and stops the exporter."""
+    global _tracer
+    tracer, _tracer = _tracer, None
+    if tracer is not None:
+        tracer.exporter.shutdown()
+
+
+atexit.register(shutdown_tracing)
+
+
+def current_span():
+    """The span the current call (thread or task) is in, or None."""
+    return _current_span.get()
+
+
+def start_span(name, kind=INTERNAL, attributes=None, parent=_CURRENT):
+    """
+    A new span, by default a child of the current span; with no current span
+    (or parent=None) it may start a new trace. Use it in a `with` block to
+    make it current, or call end() on it.
+    """
+    tracer = _tracer
+    if tracer is None:
+        return _NoopSpan()
+    if parent is _CURRENT:
+        parent = _current_span.get()
+    return tracer.start_span(name, kind, attributes, parent)
+
+
+def child_span(name, kind=INTERNAL, attributes=None):
+    """Like start_span(), but only within a recorded span: never starts a trace on its own."""
+    parent = _current_span.get()
+    if not isinstance(parent, Span):
+        return _NoopSpan()
+    return parent.tracer.start_span(name, kind, attributes, parent)
+
+
+def extract(metadata):
+    """The SpanContext in gRPC `metadata`'s traceparent entry, or None if it has none (or a malformed one)."""
+    for key, value in metadata or ():
+        if key == TRACEPARENT_KEY and isinstance(value, str):
+            match = _TRACEPARENT.match(value)
+            if match is None or match.group(1) == "0" * 32 or match.group(2) == "0" * 16:
+                return None
+            return SpanContext(match.group(1), match.group(2), bool(int(match.group(3), 16) & 1))
+    return None
+
+
+def _rpc_attributes(method):
+    service, _, name = method.lstrip("/").rpartition("/")
+    return {"rpc.system": "grpc", "rpc.service": service, "rpc.method": name}
+
+
+# --- Client side ---
+
+class _ClientCallDetails(namedtuple("_ClientCallDetails",
+                                    "method timeout metadata credentials wait_for_ready compression"),
+                         grpc.ClientCallDetails):
+    pass
+
+
+class ClientTracingInterceptor(grpc.UnaryUnaryClientInterceptor, grpc.UnaryStreamClientInterceptor,
+                               grpc.StreamUnaryClientInterceptor, grpc.StreamStreamClientInterceptor):
+    """
+    Records a client span for every RPC on the channel and sends its context
+    to the server as traceparent metadata. Streaming calls end their span
+    when the stream does.
+
+        channel = grpc.intercept_channel(grpc.insecure_channel(address), ClientTracingInterceptor())
+    """
+
+    def _intercept(self, continuation, client_call_details, request_or_iterator):
+        method = client_call_details.method
+        span = start_span(method.lstrip("/"), CLIENT, _rpc_attributes(method))
+        if not span.recording:
+            return continuation(client_call_details, request_or_iterator)
+        metadata = list(client_call_details.metadata or ())
+        metadata.append((TRACEPARENT_KEY, span.traceparent()))
+        client_call_details = _ClientCallDetails(
+            method, client_call_details.timeout, metadata, client_call_details.credentials,
+            getattr(client_call_details, "wait_for_ready", None), getattr(client_call_details, "compression", None))
+        try:
+            call = continuation(client_call_details, request_or_iterator)
+        except BaseException as e:
+            span.set_attribute("error", f"{type(e).__name__}: {e}")
+            span.end("ERROR")
+            raise
+
+        def finish(call):
+            code = call.code()
+            name = code.name if isinstance(code, grpc.StatusCode) else grpc.StatusCode.UNKNOWN.name
+            span.set_attribute("rpc.grpc.status_code", name)
+            span.end("OK" if name == "OK" else "ERROR")
+
+        call.add_done_callback(finish)
+        return call
+
+    intercept_unary_unary = _intercept
+    intercept_unary_stream = _intercept
+    intercept_stream_unary = _intercept
+    intercept_stream_stream = _intercept
+
+
+# --- Server side ---
+
+def _finish_rpc(span, context, error=None):
+    code = metrics.status_name(context, error)
+    span.set_attribute("rpc.grpc.status_code", code)
+    # A response stream closed early (GeneratorExit) is recorded as CANCELLED but isn't a failure.
+    span.set_status("OK" if code == "OK" or isinstance(error, GeneratorExit) else "ERROR")
+
+
+class _ServerCall:
+    """The server span of one RPC, current from start() to finish()."""
+
+    __slots__ = ("span",)
+
+    def __init__(self, span):
+        self.span = span.__enter__()
+
+    def on_sent(self, response):
+        pass
+
+    def finish(self, context, error=None):
+        _finish_rpc(self.span, context, error)
+        self.span.__exit__(None, None, None)
+
+
+def _instrument(handler, method, metadata):
+    """Returns `handler` with its behavior run inside a server span continuing the caller's trace."""
+    name = method.lstrip("/")
+    attributes = _rpc_attributes(method)
+
+    def start(request_or_iterator, context, is_async):
+        return _ServerCall(start_span(name, SERVER, attributes, parent=extract(metadata))), request_or_iterator
+
+    return handlers.wrap_handler(handler, start)
+
+
+class TracingInterceptor(grpc.ServerInterceptor):
+    """
+    Runs every RPC in a server span, continuing the trace in its traceparent
+    metadata. Calls without one start a new trace at the configured sample
+    rate. Install it before the AuthInterceptor so rejected calls are traced.
+    """
+
+    def intercept_service(self, continuation, handler_call_details):
+        handler = continuation(handler_call_details)
+        if handler is None or _tracer is None:
+            return handler
+        return _instrument(handler, handler_call_details.method, handler_call_details.invocation_metadata)
+
+
+class AsyncTracingInterceptor(grpc.aio.ServerInterceptor):
+    """grpc.aio counterpart of TracingInterceptor."""
+
+    async def intercept_service(self, continuation, handler_call_details):
+        handler = await continuation(handler_call_details)
+        if handler is None or _tracer is None:
+            return handler
+        return _instrument(handler, handler_call_details.method, handler_call_details.invocation_metadata)
+
+
+# --- Reading traces back ---
+
+def load_traces(path):
+    """Reads an exported file into {trace_id: [span record, ...]}, in file order."""
+    traces = defaultdict(list)
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue  # a line cut short by a crash
+            traces[record["trace_id"]].append(record)
+    return traces
+
+
+def format_trace(spans):
+    """One trace as an indented tree: each span's name, duration, service and kind, children by start time."""
+    by_id = {span["span_id"]: span for span in spans}
+    children = defaultdict(list)
+    for span in spans:
+        parent_id = span["parent_span_id"] if span["parent_span_id"] in by_id else None
+        children[parent_id].append(span)
+    for siblings in children.values():
+        siblings.sort(key=lambda span: span["start_time_unix_nano"])
+
+    start = min(span["start_time_unix_nano"] for span in spans)
+    end = max(span["start_time_unix_nano"] + span["duration_ms"] * 1e6 for span in spans)
+    lines = [f"trace {spans[0]['trace_id']}  {(end - start) / 1e6:.1f} ms"]
+
+    def add(span, depth):
+        label = "  " * depth + span["name"]
+        error = "  ERROR" if span["status"] != "OK" else ""
+        lines.append(f"{label:<56} {span['duration_ms']:>10.1f} ms  {span['service']:<12} {span['kind']}{error}")
+        for child in children[span["span_id"]]:
+            add(child, depth + 1)
+
+    for root in children[None]:
+        add(root, 1)
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Print the traces in an exported span file as latency trees.")
+    parser.add_argument("path", nargs="?", default=TRACE_FILE)
+    parser.add_argument("--trace", help="Only the trace with this ID")
+    parser.add_argument("--last", type=int, default=10, help="How many of the most recent traces to print")
+    args = parser.parse_args()
+
+    traces = load_traces(args.path)
+    if args.trace:
+        if args.trace not in traces:
+            sys.exit(f"No trace {args.trace} in {args.path}")
+        selected = [traces[args.trace]]
+    else:
+        selected = sorted(traces.values(), key=lambda spans: min(s["start_time_unix_nano"] for s in spans))
+        selected = selected[-args.last:] if args.last > 0 else selected
+    print("\n\n".join(format_trace(spans) for spans in selected))
+
+
+if __name__ == '__main__':
+    main()
@@ -2,11 +2,13 @@ import streamlit as st
 import grpc
 import order_api_pb2
 import order_api_pb2_grpc
+import tracing
 from google.protobuf import empty_pb2
 from google.protobuf.json_format import MessageToDict
 import pandas as pd
 import requests  
 import json      
+import uuid
 import os        
 import sys       
 
@@ -20,6 +22,7 @@ print(f"DEBUG: Added root directory to import path: {root_dir}")
 # --- Configuration (For AI) ---
 OLLAMA_API_URL = "http://localhost:11434/api/chat"
 GRPC_SERVER_ADDRESS = 'localhost:50051'
+TRACE_FILE = os.path.join(root_dir, tracing.TRACE_FILE)  # shared with server.py run from the repo root
 
 
 TOOLS_DEFINITION = [
@@ -172,6 +175,12 @@ TOOLS_DEFINITION = [
     }
 ]
 
+# --- Tracing ---
+@st.cache_resource
+def start_tracing():
+    """Exports this UI's trace spans; once per Streamlit process, not on every rerun."""
+    return tracing.configure_tracing("order-web-ui", TRACE_FILE)
+
 # --- gRPC Connection ---
 # 6. [แก้ไข] เราจะปรับปรุงฟังก์ชัน gRPC ของคุณเล็กน้อย
 #    เราจะ "แคช" stubs แยกกัน เพื่อให้ APIClient นำไปใช้ได้
@@ -179,7 +188,9 @@ TOOLS_DEFINITION = [
 def get_grpc_channel():
     """สร้างและคืนค่า Channel (ท่อเชื่อมต่อ)"""
     try:
-        channel = grpc.insecure_channel(GRPC_SERVER_ADDRESS)
+        # Every RPC gets a client span, and the server continues its trace.
+        channel = grpc.intercept_channel(grpc.insecure_channel(GRPC_SERVER_ADDRESS),
+                                         tracing.ClientTracingInterceptor())
         grpc.channel_ready_future(channel).result(timeout=5)
         return channel
     except grpc.FutureTimeoutError:
@@ -207,6 +218,7 @@ class APIClient:
         self.product_stub = product_stub
         self.order_stub = order_stub
         self.jwt_token = None
+        self.pending_orders = {}  # (user_id, items) -> idempotency key, until the server confirms the order
         
 
    
@@ -242,15 +254,12 @@ class APIClient:
         
     # --- Product Methods ---
     def list_products(self):
-        response_stream = self.product_stub.ListProducts(empty_pb2.Empty())
-        products_list = []
-        count = 0
         limit_for_ai = 20
         try:
-            for product in response_stream:
-                if count < limit_for_ai:
-                    products_list.append(self._message_to_dict(product))
-                count += 1
+            request = order_api_pb2.ListProductsRequest(page_size=limit_for_ai)
+            batches = self.product_stub.ListProductsBatched(request)
+            products_list = [self._message_to_dict(p) for batch in batches for p in batch.products]
+            count = self.product_stub.CountProducts(empty_pb2.Empty()).count
             if count > limit_for_ai:
                 summary_message = f"Found {count} total products, but only showing the first {limit_for_ai}."
                 return {"summary": summary_message, "products": products_list}
@@ -269,11 +278,8 @@ class APIClient:
                 search_query=search_query,
                 limit=int(limit)
             )
-            response_stream = self.product_stub.SearchProducts(request)
-            products_list = []
-            for product in response_stream:
-                products_list.append(self._message_to_dict(product))
-            return products_list
+            batches = self.product_stub.SearchProductsBatched(request)
+            return [self._message_to_dict(p) for batch in batches for p in batch.products]
         except grpc.RpcError as e:
             st.error(f"Search Error: {e.details()}")
             return f"Error: {e.details()}"
@@ -328,25 +334,37 @@ class APIClient:
         response = self.order_stub.CountOrders(empty_pb2.Empty())
         return self._message_to_dict(response)
 
+    def _pending_order_key(self, user_id, order_items):
+        """
+        The idempotency key for this order. It is kept until CreateOrder
+        succeeds, so retrying an order whose response was lost (even in a
+        later turn) returns it instead of ordering twice.
+        """
+        order = (user_id, tuple(sorted((item.product_id, item.quantity) for item in order_items)))
+        return order, self.pending_orders.setdefault(order, uuid.uuid4().hex)
+
     def create_order(self, user_id, items):
         order_items = []
         for item in items:
             try:
-                product = self.get_product(item['product_id'])
-                if product.product_id:
-                    order_items.append(order_api_pb2.Order.Item(
-                        product_id=item['product_id'],
-                        quantity=int(item['quantity']),
-                        price_per_item=product.price
-                    ))
-            except (grpc.RpcError, KeyError, TypeError) as e:
+                # The server prices each item and rejects unknown product IDs.
+                order_items.append(order_api_pb2.Order.Item(
+                    product_id=item['product_id'], quantity=int(item['quantity'])
+                ))
+            except (KeyError, TypeError, ValueError):
                 st.warning(f"Warning: Malformed/Invalid item {item}. Skipping.")
         
         if not order_items:
-            return "Error: No valid products were found."
+            return "Error: No valid items were given."
             
-        request = order_api_pb2.CreateOrderRequest(user_id=user_id, items=order_items)
-        response = self.order_stub.CreateOrder(request, metadata=self._get_auth_metadata())
+        order, idempotency_key = self._pending_order_key(user_id, order_items)
+        request = order_api_pb2.CreateOrderRequest(
+            user_id=user_id, items=order_items, idempotency_key=idempotency_key)
+        try:
+            response = self.order_stub.CreateOrder(request, metadata=self._get_auth_metadata())
+        except grpc.RpcError as e:
+            return f"Error: {e.details()}"
+        del self.pending_orders[order]
         return self._message_to_dict(response)
 
 
@@ -455,7 +473,8 @@ Now, begin the conversation.
             
         func = self.tool_functions[func_name]
         try:
-            result = func(**args)
+            with tracing.start_span(f"tool {func_name}"):
+                result = func(**args)
             
             if func_name == "login" and isinstance(result, dict) and "role" in result:
                 self.current_user_role = result["role"]
@@ -483,6 +502,11 @@ Now, begin the conversation.
 
    
     def get_response(self, user_prompt, chat_history):
+        # One trace per turn: both Ollama calls, the tool and the RPCs it makes.
+        with tracing.start_span("agent.turn", attributes={"model": self.model_name}):
+            return self._get_response(user_prompt, chat_history)
+
+    def _get_response(self, user_prompt, chat_history):
         messages_to_send = [{"role": "system", "content": self.system_prompt}]
         
         for msg in chat_history:
@@ -494,7 +518,8 @@ Now, begin the conversation.
             
             with st.spinner("🤖 AI is thinking..."):
                 payload = {"model": self.model_name, "messages": messages_to_send, "stream": False, "format": "json"}
-                response = requests.post(OLLAMA_API_URL, json=payload, timeout=60)
+                with tracing.start_span("ollama.chat", tracing.CLIENT, {"model": self.model_name}):
+                    response = requests.post(OLLAMA_API_URL, json=payload, timeout=60)
                 response.raise_for_status()
             
             response_json_str = response.json()['message']['content']
@@ -526,7 +551,8 @@ Now, begin the conversation.
                 
                 with st.spinner("🤖 AI is summarizing..."):
                     summary_payload = {"model": self.model_name, "messages": messages_to_send, "stream": False, "format": "json"}
-                    summary_response = requests.post(OLLAMA_API_URL, json=summary_payload, timeout=60)
+                    with tracing.start_span("ollama.chat", tracing.CLIENT, {"model": self.model_name}):
+                        summary_response = requests.post(OLLAMA_API_URL, json=summary_payload, timeout=60)
                     summary_json_str = summary_response.json()['message']['content']
                 
                 try:
@@ -559,6 +585,7 @@ st.set_page_config(layout="wide")
 st.title("📦 gRPC API Dashboard (Web UI)")
 
 
+start_tracing()
 channel = get_grpc_channel()
 auth_stub, product_stub, order_stub = get_stubs(channel)
 
@@ -618,26 +645,41 @@ if page == "Product Management":
 
     # --- Column 2: List Products ---
     with col2:
-        st.subheader("📋 List All Products")
-        if st.button("🔄 Refresh Product List"):
-            try:
-                
-                products_response_stream = product_stub.ListProducts(empty_pb2.Empty())
-                
-               
-                with st.spinner("Loading products from stream..."):
-                    products_list = [MessageToDict(p) for p in products_response_stream]
-                
-                if not products_list:
-                    st.warning("No products found in the database.")
-                else:
-                    df = pd.DataFrame(products_list)
-                    st.dataframe(df) # แสดงผล
+        st.subheader("📋 List Products")
+        page_size = st.selectbox("Products per page", [25, 50, 100, 250], index=1)
+        if "product_page_tokens" not in st.session_state:
+            st.session_state.product_page_tokens = [""]  # token of every page visited so far
+
+        nav_prev, nav_refresh, nav_next = st.columns(3)
+        if nav_prev.button("⬅️ Previous", disabled=len(st.session_state.product_page_tokens) < 2):
+            st.session_state.product_page_tokens.pop()
+        nav_refresh.button("🔄 Refresh Product List")
+        next_clicked = nav_next.button("Next ➡️", disabled=not st.session_state.get("product_next_page_token"))
+        if next_clicked:
+            st.session_state.product_page_tokens.append(st.session_state.product_next_page_token)
+
+        try:
+            req = order_api_pb2.ListProductsRequest(
+                page_size=page_size,
+                page_token=st.session_state.product_page_tokens[-1]
+            )
+            call = product_stub.ListProductsBatched(req)
+
+            with st.spinner("Loading products from stream..."):
+                products_list = [MessageToDict(p) for batch in call for p in batch.products]
+            st.session_state.product_next_page_token = dict(call.trailing_metadata() or ()).get("x-next-page-token", "")
 
-            except grpc.RpcError as e:
-                st.error(f"Error listing products: {e.details()}")
-            except Exception as e:
-                st.error(f"An unexpected error occurred: {e}")
+            st.caption(f"Page {len(st.session_state.product_page_tokens)}")
+            if not products_list:
+                st.warning("No products found in the database.")
+            else:
+                df = pd.DataFrame(products_list)
+                st.dataframe(df) # แสดงผล
+
+        except grpc.RpcError as e:
+            st.error(f"Error listing products: {e.details()}")
+        except Exception as e:
+            st.error(f"An unexpected error occurred: {e}")
 
 # ==================================
 #       PAGE: Order Management